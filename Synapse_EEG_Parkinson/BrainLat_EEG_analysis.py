@@ -11,7 +11,8 @@ Prints a report similar in spirit/structure to your earlier BrainLat script:
 - validation checks (ranges, unexpected values)
 - final summary + recommendations
 
-Expected files in same folder:
+Expected files in same folder (loaded through brainlat_tables.py, which
+caches the typed frames):
   cognition_hc_eeg_data.csv
   Cognition_PD_EEG_data.csv
   demographics_hc_eeg_data.csv
@@ -20,11 +21,15 @@ Expected files in same folder:
   Records_PD_EEG_data.csv
 """
 
-import os
-import re
-import pandas as pd
-import numpy as np
+import sys
 from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from brainlat_tables import load_table
+from eeg_subject_table import build_subject_table
 
 # Display settings
 pd.set_option("display.max_columns", None)
@@ -41,59 +46,8 @@ def print_subsection(title):
     print("-" * len(title))
 
 # -----------------------------------------------------------------------------
-# Helpers: robust loading + normalization
+# Helpers
 # -----------------------------------------------------------------------------
-def normalize_colname(c: str) -> str:
-    c = str(c).strip().replace("\ufeff", "")
-    c = re.sub(r"\s+", "_", c)          # spaces -> _
-    c = c.replace("/", "_")
-    c = re.sub(r"[^0-9a-zA-Z_]+", "", c)
-    c = c.strip("_").lower()
-
-    # normalize a few known variants
-    if c in {"ideeg", "id_eeg", "id__eeg", "id_eeg_"}:
-        return "id_eeg"
-    if c in {"id_mri", "mri_id"}:
-        return "id_mri"
-    return c
-
-def normalize_id(x):
-    if pd.isna(x):
-        return np.nan
-    s = str(x).strip()
-    # remove internal whitespace to fix " sub-40005  "
-    s = re.sub(r"\s+", "", s)
-    return s
-
-def safe_read_csv(path):
-    try:
-        return pd.read_csv(path)
-    except UnicodeDecodeError:
-        return pd.read_csv(path, encoding="latin1")
-
-def coerce_numeric(df, cols):
-    for c in cols:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-    return df
-
-def add_country_from_path(df, path_col="path"):
-    """Extract country/site code from path like '5_HC/AR' or '3_PD/CL'."""
-    if path_col not in df.columns:
-        df["country"] = np.nan
-        return df
-
-    def _extract(p):
-        if pd.isna(p):
-            return np.nan
-        p = str(p).strip()
-        last = p.split("/")[-1]
-        last = re.sub(r"[^A-Za-z]+", "", last)
-        return last.upper() if last else np.nan
-
-    df["country"] = df[path_col].apply(_extract)
-    return df
-
 def print_basic_profile(df, keycol=None):
     print(f"   Rows: {len(df):,}")
     print(f"   Columns: {len(df.columns)}")
@@ -119,47 +73,23 @@ def print_basic_profile(df, keycol=None):
 print_section("EEG DATASET - COMPREHENSIVE CSV ANALYSIS", 100)
 print(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
+# Typed frames (canonical column names, ids, diagnosis/country/sex as
+# categoricals, numeric scores) from the shared table cache
 FILES = {
-    "cog_hc": "cognition_hc_eeg_data.csv",
-    "cog_pd": "Cognition_PD_EEG_data.csv",
-    "demo_hc": "demographics_hc_eeg_data.csv",
-    "demo_pd": "Demographics_PD_EEG_data.csv",
-    "rec_hc": "records_hc_eeg_data.csv",
-    "rec_pd": "Records_PD_EEG_data.csv",
+    "cog_hc": "eeg_cog_hc",
+    "cog_pd": "eeg_cog_pd",
+    "demo_hc": "eeg_demo_hc",
+    "demo_pd": "eeg_demo_pd",
+    "rec_hc": "eeg_rec_hc",
+    "rec_pd": "eeg_rec_pd",
 }
 
 dfs = {}
-for k, f in FILES.items():
-    if not os.path.exists(f):
-        raise FileNotFoundError(f"ERROR: Missing file '{f}' in current folder.")
-    df = safe_read_csv(f)
-    df.columns = [normalize_colname(c) for c in df.columns]
-
-    # standardize id_eeg where possible
-    if "id_eeg" in df.columns:
-        df["id_eeg"] = df["id_eeg"].apply(normalize_id)
-    elif "id" in df.columns:
-        # in your cognition/demographics files, "id EEG" becomes id_eeg already,
-        # but as fallback, if there's only "id" and it looks like sub-xxxxx, use it.
-        df["id_eeg"] = df["id"].apply(normalize_id)
-
-    # standardize diagnosis
-    if "diagnosis" in df.columns:
-        df["diagnosis"] = df["diagnosis"].astype(str).str.strip().str.upper().replace({"NAN": np.nan})
-
-    df = add_country_from_path(df, "path")
-
-    # numeric coercions (if present)
-    df = coerce_numeric(
-        df,
-        cols=[
-            "age", "years_education", "sex", "laterality",
-            "moca_total", "ifs_total_score", "mmse",
-            "t1", "rest", "dwi", "mf", "eeg"
-        ],
-    )
-
-    dfs[k] = df
+for k, table in FILES.items():
+    try:
+        dfs[k] = load_table(table)
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"ERROR: {e}") from None
 
 print("\nSuccessfully loaded all 6 CSV files")
 
@@ -220,46 +150,10 @@ demo = pd.concat([dfs["demo_hc"], dfs["demo_pd"]], ignore_index=True, sort=False
 cog  = pd.concat([dfs["cog_hc"],  dfs["cog_pd"]],  ignore_index=True, sort=False)
 rec  = pd.concat([dfs["rec_hc"],  dfs["rec_pd"]],  ignore_index=True, sort=False)
 
-# Collapse duplicates by id_eeg: keep first non-null per column
-def first_nonnull(s):
-    s = s.dropna()
-    return s.iloc[0] if len(s) else np.nan
-
-def collapse_by_id(df, name):
-    if "id_eeg" not in df.columns:
-        raise ValueError(f"{name}: missing id_eeg")
-    df = df.copy()
-    df["id_eeg"] = df["id_eeg"].apply(normalize_id)
-    agg = {c: first_nonnull for c in df.columns if c != "id_eeg"}
-    out = df.groupby("id_eeg", as_index=False).agg(agg)
-    return out
-
-demo_u = collapse_by_id(demo, "demographics")
-cog_u  = collapse_by_id(cog,  "cognition")
-rec_u  = collapse_by_id(rec,  "records")
-
-# Merge
-merged = demo_u.merge(cog_u, on="id_eeg", how="outer", suffixes=("_demo", "_cog"))
-merged = merged.merge(rec_u, on="id_eeg", how="outer", suffixes=("", "_rec"))
-
-# Unify diagnosis across possible columns (diagnosis, diagnosis_demo, diagnosis_cog, etc.)
-diag_cols = [c for c in merged.columns if c.startswith("diagnosis")]
-def unify_diagnosis(row):
-    vals = []
-    for c in diag_cols:
-        v = row.get(c, np.nan)
-        if pd.notna(v):
-            vv = str(v).strip().upper()
-            if vv and vv != "NAN":
-                vals.append(vv)
-    vals = list(dict.fromkeys(vals))
-    if len(vals) == 0:
-        return np.nan
-    if len(vals) == 1:
-        return vals[0]
-    return "MISMATCH:" + "|".join(vals)
-
-merged["diagnosis_unified"] = merged.apply(unify_diagnosis, axis=1)
+# Collapse duplicates by id_eeg (first non-null per column), outer-merge the
+# three tables and unify the diagnosis columns into diagnosis_unified
+# ("MISMATCH:a|b" when they disagree); see eeg_subject_table.py
+merged, (demo_u, cog_u, rec_u) = build_subject_table(demo, cog, rec)
 
 # Focus PD/CN only
 pd_cn = merged[merged["diagnosis_unified"].isin(["PD", "CN"])].copy()
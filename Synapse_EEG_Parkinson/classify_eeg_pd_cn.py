@@ -1,7 +1,14 @@
-import shutil
 import csv
+import sys
+from collections import Counter
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from classified_view import format_methods, materialize_tree, prune_view
+from copy_pipeline import run_copy_jobs, write_manifest
+from eeglab_header import pair_audit
+from subject_master import open_master
+
 # =========================
 # CONFIG
 # =========================
@@ -9,6 +16,14 @@ BASE_DIR = Path(r"D:\Datasets\Synapse\Synapse_EEG_Parkinson").resolve()
 EEG_ROOT = BASE_DIR / "EEG_data"
 OUT_ROOT = BASE_DIR / "EEG_CLASSIFIED"
 OUT_CSV  = OUT_ROOT / "eeg_paired_subjects.csv"
+COPY_MANIFEST_CSV = OUT_ROOT / "eeg_copy_manifest.csv"
+
+# "auto" = reflink -> hardlink -> symlink -> copy per file (no extra disk when links work)
+# "copy" = parallel, checksummed physical copy, renamed into place atomically
+# "copytree" = plain serial copy as before
+VIEW_MODE = "auto"
+COPY_WORKERS = 4
+PRUNE_STALE = False  # drop link views of subject folders that are no longer paired/labelled
 
 # Map source folder name -> diagnosis label and region key
 MAP = {
@@ -19,23 +34,29 @@ MAP = {
 # ── Helpers ──────────────────────────────────────────────────────────────────
 
 def has_paired_eeg(subj_dir: Path) -> tuple[bool, str, str]:
-    """Return (paired, set_file, fdt_file) for a subject folder."""
-    set_files = {}
-    fdt_files = {}
-    for f in subj_dir.rglob("*.set"):
-        set_files[f.stem.lower()] = f
-    for f in subj_dir.rglob("*.fdt"):
-        fdt_files[f.stem.lower()] = f
-    common = set(set_files) & set(fdt_files)
-    if common:
-        stem = sorted(common)[0]
-        return True, set_files[stem].name, fdt_files[stem].name
+    """Return (paired, set_file, fdt_file) for a subject folder.
+
+    The .set header names its .fdt and fixes its size (nbchan*pnts*trials*4
+    bytes), so truncated or mismatched .fdt files do not count as a pair.
+    Headers that cannot be parsed fall back to matching file stems.
+    """
+    for set_path in sorted(subj_dir.rglob("*.set")):
+        audit = pair_audit(set_path)
+        if audit["status"] == "ok":
+            return True, set_path.name, Path(audit["fdt"]).name
+        if audit["status"] == "unreadable":
+            fdt = set_path.with_suffix(".fdt")
+            if fdt.exists():
+                return True, set_path.name, fdt.name
     return False, "", ""
 
 
 def load_csv_index(path: Path, key_col: str = "id EEG") -> dict:
     """Load a CSV keyed by (country_code, id_eeg) using the 'path' column.
     e.g. path='3_PD/AR' -> country='AR', combined key ('AR', 'sub-40001').
+
+    Only for the raw demographic/cognition values copied into the paired CSV;
+    IDs across modalities come from the subject master index.
     """
     index = {}
     with open(path, newline="", encoding="utf-8") as f:
@@ -79,6 +100,7 @@ def main():
         return
 
     dem_hc, dem_pd, cog_hc, cog_pd = load_csvs()
+    master = open_master()   # (site, id_eeg) -> master_id / id_mri crosswalk
 
     OUT_ROOT.mkdir(parents=True, exist_ok=True)
 
@@ -87,6 +109,9 @@ def main():
     copied_cn     = 0
     skipped_no_pair = 0
     skipped_exists  = 0
+    methods         = Counter()
+    expected        = {}     # (label, condition) -> subject folders that belong there
+    copy_jobs       = []     # (label, src, dest) for VIEW_MODE == "copy"
 
     for src_group, label in MAP.items():
         group_dir = EEG_ROOT / src_group
@@ -112,13 +137,15 @@ def main():
                     skipped_no_pair += 1
                     continue
 
-                # ── Copy to EEG_CLASSIFIED ────────────────────────────────
+                # ── Materialize in EEG_CLASSIFIED ─────────────────────────
                 dest = OUT_ROOT / label / condition / subject
+                expected.setdefault((label, condition), set()).add(subject)
                 if dest.exists():
                     skipped_exists += 1
+                elif VIEW_MODE == "copy":
+                    copy_jobs.append((label, subj_dir, dest))
                 else:
-                    dest.parent.mkdir(parents=True, exist_ok=True)
-                    shutil.copytree(subj_dir, dest)
+                    methods += materialize_tree(subj_dir, dest, mode=VIEW_MODE)
                     if label == "PD":
                         copied_pd += 1
                     else:
@@ -134,6 +161,8 @@ def main():
                 lat_raw = safe(demo, "laterality")
                 lat_str = "Right" if lat_raw == "1" else ("Left" if lat_raw == "0" else lat_raw)
 
+                xwalk = master.by_eeg(condition, subject) or {}
+
                 records.append({
                     # Identification
                     "subject_id"                  : subject,
@@ -141,6 +170,8 @@ def main():
                     "country"                     : condition,
                     "set_file"                    : set_file,
                     "fdt_file"                    : fdt_file,
+                    "master_id"                   : xwalk.get("master_id") or "",
+                    "id_mri"                      : xwalk.get("id_mri") or "",
                     # Demographics
                     "sex"                         : sex_str,
                     "age"                         : safe(demo, "Age"),
@@ -173,6 +204,32 @@ def main():
                     "mmse"                        : safe(cog, "MMSE"),
                 })
 
+    # ── Physical copies: worker pool, streaming checksum, atomic rename ───────
+    copy_failed = 0
+    if copy_jobs:
+        print(f"Copying {len(copy_jobs)} subjects ({COPY_WORKERS} workers) ...")
+        results = run_copy_jobs([(src, dest) for _, src, dest in copy_jobs], max_workers=COPY_WORKERS)
+        for (label, _, _), res in zip(copy_jobs, results):
+            if not res.ok:
+                copy_failed += 1
+                continue
+            if label == "PD":
+                copied_pd += 1
+            else:
+                copied_cn += 1
+            methods["copy"] += len(res.files)
+        write_manifest(results, COPY_MANIFEST_CSV)
+
+    pruned = 0
+    if PRUNE_STALE:
+        for label in MAP.values():
+            label_dir = OUT_ROOT / label
+            if not label_dir.exists():
+                continue
+            for cond_dir in label_dir.iterdir():
+                if cond_dir.is_dir():
+                    pruned += prune_view(cond_dir, expected.get((label, cond_dir.name), set()))
+
     # ── Write CSV ─────────────────────────────────────────────────────────────
     fieldnames = list(records[0].keys()) if records else []
     with open(OUT_CSV, "w", newline="", encoding="utf-8") as f:
@@ -198,6 +255,10 @@ def main():
     print(f"  Copied  PD : {copied_pd}   |   Copied  CN : {copied_cn}")
     print(f"  Skipped (no pair)        : {skipped_no_pair}")
     print(f"  Skipped (already exists) : {skipped_exists}")
+    print(f"  Removed stale            : {pruned}")
+    if copy_jobs:
+        print(f"  Copy failures            : {copy_failed}   (manifest: {COPY_MANIFEST_CSV.name})")
+    print(f"  Files placed via         : {format_methods(methods)}")
     print("=" * 90)
     print(f"\nCSV saved -> {OUT_CSV}")
 
@@ -1,12 +1,26 @@
 import os
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_inventory import open_inventory
+from eeglab_header import pair_audit
 
 root = r"D:\Datasets\Synapse\Synapse_EEG_Parkinson\EEG_data"
+INVENTORY_MODE = "incremental"   # how to refresh the EEG_data index: "reuse" | "incremental" | "full"
 counts = {'.fdt': 0, '.set': 0}
 
 paired_folders = []
 unpaired_folders = []
 
-for dirpath, _, filenames in os.walk(root):
+# .set/.fdt names per folder, straight from the inventory index (no os.walk)
+inv = open_inventory(root, mode=INVENTORY_MODE)
+by_folder = defaultdict(list)
+for row in inv.files(kinds=("eeg_set", "eeg_fdt")):
+    by_folder[row["parent"]].append(row["name"])
+inv.close()
+
+for parent, filenames in sorted(by_folder.items()):
     set_files  = {os.path.splitext(f)[0] for f in filenames if f.lower().endswith('.set')}
     fdt_files  = {os.path.splitext(f)[0] for f in filenames if f.lower().endswith('.fdt')}
 
@@ -17,7 +31,7 @@ for dirpath, _, filenames in os.walk(root):
     only_set = set_files - fdt_files          # .set without .fdt
     only_fdt = fdt_files - set_files          # .fdt without .set
 
-    rel = os.path.relpath(dirpath, root)
+    rel = os.path.normpath(parent) if parent else "."
 
     if paired:
         for name in sorted(paired):
@@ -52,3 +66,19 @@ if unpaired_folders:
         print(f"  {folder}  ->  {fname}  ({reason})")
 else:
     print("  None — all files are paired!")
+
+# ── Size check of paired files (from the .set headers) ───────────────────────
+size_issues = []
+for folder, name in paired_folders:
+    audit = pair_audit(os.path.join(root, folder, name + '.set'))
+    if audit['status'] not in ('ok', 'embedded'):
+        size_issues.append((folder, name, audit))
+
+print(f"\n[SIZE CHECK]  ({len(size_issues)} of {len(paired_folders)} pairs with a bad .fdt)")
+print("-" * 60)
+if size_issues:
+    for folder, name, audit in size_issues:
+        detail = audit['error'] or f"expected {audit['expected_bytes']} B, found {audit['actual_bytes']} B"
+        print(f"  {folder}  ->  {name}  ({audit['status']}: {detail})")
+else:
+    print("  None — every .fdt matches its header!")
@@ -0,0 +1,289 @@
+"""
+Streaming PD vs CN epoch loader
+===============================
+Turns the paired recordings in EEG_CLASSIFIED/eeg_paired_subjects.csv into
+a stream of (x, y, subject) batches without loading any recording whole:
+
+    x        float32 (batch, channels, times)
+    y        int64   (batch,)  CN=0, PD=1
+    subject  int64   (batch,)  row in loader.items (subject-level evaluation)
+
+Each recording is a memory-mapped epoch source. Preprocessed epochs come from
+eeg_preprocess.py (epochs_index.csv). With RAW=True, the source is fixed
+EPOCH_S windows cut straight from the .fdt memmaps (eeg_memmap.py). Every pass
+shuffles each recording's epoch indices, cuts them into CHUNK-sized runs and
+shuffles the runs across recordings. A background thread reads one run per
+memmap access, with sorted indices in a single fancy-index read. The epochs go
+into a preallocated shuffle buffer of SHUFFLE_BUFFER slots. Batches are drawn
+from random slots, and the freed slots are refilled by moving the buffer tail,
+so the per-batch work is a few numpy copies. A bounded queue of PREFETCH
+batches decouples reading from training.
+
+subject_split() holds out whole subjects, keyed by (country, subject_id)
+because EEG ids repeat across sites, and stratified by diagnosis x country.
+"""
+
+import queue
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from eeg_memmap import CLASSIFIED_ROOT, open_recording
+from eeg_preprocess import EPOCH_S, INDEX_CSV, KEY_COLUMNS, open_epochs
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+PAIRED_CSV = CLASSIFIED_ROOT / "eeg_paired_subjects.csv"
+RAW = False              # True: cut windows from the raw .fdt instead of preprocessed epochs
+CHANNELS = None          # channel names common to all recordings; None = all (must match)
+BATCH_SIZE = 64
+SHUFFLE_BUFFER = 2048    # epochs held for shuffling
+CHUNK = 16               # epochs read per memmap access
+PREFETCH = 8             # batches queued ahead of the consumer
+TEST_FRACTION = 0.2
+SEED = 0
+BENCH_BATCHES = 200
+
+LABEL_CODES = {"CN": 0, "PD": 1}
+_END = object()
+
+# ── Items and splits ─────────────────────────────────────────────────────────
+
+def load_items(paired_csv: Path = PAIRED_CSV, index_csv: Path = INDEX_CSV, raw: bool = RAW) -> pd.DataFrame:
+    """Paired PD/CN subjects, with the preprocessed epoch path unless `raw`."""
+    items = pd.read_csv(paired_csv, dtype=str)
+    items = items[items["diagnosis"].isin(LABEL_CODES)]
+    if raw:
+        items = items.assign(path=[str(CLASSIFIED_ROOT / r.diagnosis / r.country / r.subject_id / r.set_file)
+                                   for r in items.itertuples()])
+    else:
+        index = pd.read_csv(index_csv, dtype={c: str for c in KEY_COLUMNS})
+        items = items.merge(index[KEY_COLUMNS + ["path"]], on=KEY_COLUMNS, how="inner")
+    return items.sort_values(["diagnosis", "country", "subject_id"]).reset_index(drop=True)
+
+
+def subject_split(items: pd.DataFrame, test_fraction: float = TEST_FRACTION, seed: int = SEED):
+    """(train, test) with every (country, subject_id) on one side only."""
+    rng = np.random.default_rng(seed)
+    subjects = items[["country", "subject_id", "diagnosis"]].drop_duplicates(["country", "subject_id"])
+    test = set()
+    for _, g in subjects.groupby(["diagnosis", "country"], sort=True):
+        keys = list(zip(g["country"], g["subject_id"]))
+        n_test = int(round(len(keys) * test_fraction))
+        if len(keys) > 1:
+            n_test = min(max(n_test, 1), len(keys) - 1)
+        test.update(keys[i] for i in rng.permutation(len(keys))[:n_test])
+    in_test = np.array([k in test for k in zip(items["country"], items["subject_id"])], dtype=bool)
+    return items[~in_test].reset_index(drop=True), items[in_test].reset_index(drop=True)
+
+# ── Epoch sources ────────────────────────────────────────────────────────────
+
+def _picks(ch_names, channels):
+    if channels is None:
+        return None
+    index = {n.lower(): i for i, n in enumerate(ch_names)}
+    missing = [c for c in channels if c.lower() not in index]
+    if missing:
+        raise KeyError(f"channels not in recording: {missing}")
+    return np.array([index[c.lower()] for c in channels])
+
+
+class NpyEpochs:
+    """Preprocessed epochs (eeg_preprocess.py) as a read-only memmap."""
+
+    def __init__(self, path, channels=None):
+        self.mm, self.meta = open_epochs(path)
+        self.srate = self.meta["srate"]
+        self.picks = _picks(self.meta["ch_names"], channels)
+
+    @property
+    def n_epochs(self) -> int:
+        return self.mm.shape[0]
+
+    @property
+    def epoch_shape(self) -> tuple:
+        n_ch = self.mm.shape[1] if self.picks is None else len(self.picks)
+        return n_ch, self.mm.shape[2]
+
+    def read(self, idx: np.ndarray) -> np.ndarray:
+        x = self.mm[np.sort(idx)]
+        return x if self.picks is None else x[:, self.picks]
+
+
+class RawWindows:
+    """Consecutive EPOCH_S windows of an unprocessed recording's .fdt memmap."""
+
+    def __init__(self, set_path, channels=None, epoch_s: float = EPOCH_S):
+        self.rec = open_recording(set_path)
+        self.srate = self.rec.srate
+        self.n_times = int(round(epoch_s * self.srate))
+        self.picks = _picks(self.rec.ch_names, channels)
+
+    @property
+    def n_epochs(self) -> int:
+        return self.rec.n_samples // self.n_times
+
+    @property
+    def epoch_shape(self) -> tuple:
+        n_ch = self.rec.n_channels if self.picks is None else len(self.picks)
+        return n_ch, self.n_times
+
+    def read(self, idx: np.ndarray) -> np.ndarray:
+        # (samples, channels) on disk: each window is one contiguous byte range
+        mm = self.rec.data.T
+        nt = self.n_times
+        x = np.stack([mm[i * nt:(i + 1) * nt] for i in np.sort(idx)]).transpose(0, 2, 1)
+        return np.ascontiguousarray(x if self.picks is None else x[:, self.picks], dtype=np.float32)
+
+# ── Loader ───────────────────────────────────────────────────────────────────
+
+class EpochLoader:
+    """Iterable over shuffled (x, y, subject) batches; each iteration is one pass."""
+
+    def __init__(self, items: pd.DataFrame, raw: bool = RAW, channels=CHANNELS,
+                 batch_size: int = BATCH_SIZE, shuffle_buffer: int = SHUFFLE_BUFFER,
+                 chunk: int = CHUNK, prefetch: int = PREFETCH, seed: int = SEED,
+                 drop_last: bool = False):
+        self.items = items.reset_index(drop=True)
+        make = RawWindows if raw else NpyEpochs
+        self.sources = [make(p, channels) for p in self.items["path"]]
+        self.labels = self.items["diagnosis"].map(LABEL_CODES).to_numpy(np.int64)
+        shapes = {s.epoch_shape for s in self.sources}
+        if len(shapes) > 1:
+            raise ValueError(f"recordings differ in (channels, times): {sorted(shapes)}; "
+                             f"set CHANNELS to a common subset")
+        self.epoch_shape = shapes.pop() if shapes else (0, 0)
+        self.batch_size = batch_size
+        self.shuffle_buffer = max(shuffle_buffer, batch_size + chunk)
+        self.chunk = chunk
+        self.prefetch = prefetch
+        self.seed = seed
+        self.drop_last = drop_last
+        self._pass = 0
+
+    @property
+    def n_epochs(self) -> int:
+        return sum(s.n_epochs for s in self.sources)
+
+    def __len__(self):
+        n = self.n_epochs
+        return n // self.batch_size if self.drop_last else -(-n // self.batch_size)
+
+    def _plan(self, rng) -> list:
+        """Shuffled (source, epoch indices) runs covering every epoch once."""
+        runs = []
+        for i, s in enumerate(self.sources):
+            order = rng.permutation(s.n_epochs)
+            runs.extend((i, order[j:j + self.chunk]) for j in range(0, len(order), self.chunk))
+        return [runs[k] for k in rng.permutation(len(runs))]
+
+    def _batches(self, rng):
+        cap, bs = self.shuffle_buffer, self.batch_size
+        buf_x = np.empty((cap,) + self.epoch_shape, dtype=np.float32)
+        buf_y = np.empty(cap, dtype=np.int64)
+        buf_s = np.empty(cap, dtype=np.int64)
+        fill = 0
+
+        def take(n):
+            nonlocal fill
+            sel = rng.choice(fill, n, replace=False)
+            out = buf_x[sel], buf_y[sel], buf_s[sel]
+            # move the unselected tail into the freed slots
+            keep = np.ones(fill, dtype=bool)
+            keep[sel] = False
+            holes = sel[sel < fill - n]
+            tail = np.arange(fill - n, fill)
+            movers = tail[keep[tail]]
+            buf_x[holes], buf_y[holes], buf_s[holes] = buf_x[movers], buf_y[movers], buf_s[movers]
+            fill -= n
+            return out
+
+        for src, idx in self._plan(rng):
+            x = self.sources[src].read(idx)
+            while fill + len(x) > cap:
+                yield take(bs)
+            buf_x[fill:fill + len(x)] = x
+            buf_y[fill:fill + len(x)] = self.labels[src]
+            buf_s[fill:fill + len(x)] = src
+            fill += len(x)
+        while fill >= bs:
+            yield take(bs)
+        if fill and not self.drop_last:
+            yield take(fill)
+
+    def __iter__(self):
+        rng = np.random.default_rng([self.seed, self._pass])
+        self._pass += 1
+        q = queue.Queue(maxsize=max(1, self.prefetch))
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for batch in self._batches(rng):
+                    if not put(batch):
+                        return
+                put(_END)
+            except BaseException as e:   # re-raised in the consumer
+                put(e)
+
+        worker = threading.Thread(target=produce, name="epoch-prefetch", daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = q.get()
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            worker.join()
+
+# ── Benchmark ────────────────────────────────────────────────────────────────
+
+def main():
+    if not PAIRED_CSV.exists() or (not RAW and not INDEX_CSV.exists()):
+        print("ERROR: paired CSV or epochs index not found:", PAIRED_CSV, INDEX_CSV)
+        return
+
+    items = load_items()
+    train, test = subject_split(items)
+    loader = EpochLoader(train)
+    print("=" * 90)
+    print(f"EEG EPOCH LOADER ({'raw windows' if RAW else 'preprocessed epochs'})")
+    print("=" * 90)
+    for name, part in (("train", train), ("test", test)):
+        counts = part.groupby(["diagnosis", "country"]).size().to_dict()
+        print(f"{name:<6}: {len(part)} subjects {counts}")
+    print(f"Epochs: {loader.n_epochs} x {loader.epoch_shape}, {len(loader)} batches of {BATCH_SIZE}")
+
+    n, n_bytes, pd_frac = 0, 0, []
+    t0 = time.perf_counter()
+    for x, y, _ in loader:
+        n += 1
+        n_bytes += x.nbytes
+        pd_frac.append(y.mean())
+        if n >= BENCH_BATCHES:
+            break
+    elapsed = time.perf_counter() - t0
+    print(f"\n{n} batches in {elapsed:.2f}s: {n * BATCH_SIZE / elapsed:.0f} epochs/s, "
+          f"{n_bytes / 1e6 / elapsed:.0f} MB/s, PD fraction per batch "
+          f"{np.mean(pd_frac):.2f} +- {np.std(pd_frac):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Memory-mapped EEG signal access
+===============================
+An EEGLAB .fdt file is the raw float32 data matrix written column by column,
+i.e. sample after sample with all channels of one sample next to each other.
+Mapping it as a (samples, nbchan) numpy.memmap and transposing gives a
+channels x samples view without reading anything; only the pages a slice
+touches are ever loaded, so features can be computed over all recordings with
+constant memory (unlike MNE's preload, which copies the whole recording).
+
+Channel names, sampling rate and shape come from the .set header
+(eeglab_header.py), so neither MNE nor the MATLAB struct loader is needed.
+
+Time windows are contiguous on disk and cheap; a channel subset still reads
+every page of the window it spans, because channels are interleaved.
+
+    python eeg_memmap.py      # list every classified recording + a streamed RMS
+"""
+
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from eeglab_header import read_set_header
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+CLASSIFIED_ROOT = Path(r"D:\Datasets\Synapse\Synapse_EEG_Parkinson\EEG_CLASSIFIED")
+LABELS = ("PD", "CN")
+COUNTRIES = ("AR", "CL")
+BLOCK_S = 10.0   # window length for streamed statistics
+
+
+class EEGAccessError(ValueError):
+    pass
+
+
+@dataclass
+class EEGRecording:
+    """One recording as a channels x samples memmap plus its metadata."""
+    set_path: Path
+    fdt_path: Path
+    srate: float
+    ch_names: list
+    data: np.ndarray            # (n_channels, n_samples) view of the memmap
+    trials: int = 1
+    subject: str = ""
+    diagnosis: str = ""
+    country: str = ""
+    _index: dict = field(default=None, repr=False)
+
+    @property
+    def n_channels(self) -> int:
+        return self.data.shape[0]
+
+    @property
+    def n_samples(self) -> int:
+        return self.data.shape[1]
+
+    @property
+    def duration_s(self) -> float:
+        return self.n_samples / self.srate if self.srate else 0.0
+
+    def picks(self, channels) -> list:
+        """Row indices for channel names (case-insensitive) or indices."""
+        if channels is None:
+            return list(range(self.n_channels))
+        if self._index is None:
+            self._index = {n.lower(): i for i, n in enumerate(self.ch_names)}
+        out = []
+        for ch in channels:
+            if isinstance(ch, (int, np.integer)):
+                out.append(int(ch))
+            elif ch.lower() in self._index:
+                out.append(self._index[ch.lower()])
+            else:
+                raise KeyError(f"{self.subject or self.set_path.name}: no channel {ch!r}")
+        return out
+
+    def window(self, t0: float = 0.0, t1: float = None, channels=None) -> np.ndarray:
+        """Copy of [t0, t1) seconds for the given channels as float32 (channels x samples)."""
+        s0 = max(int(round(t0 * self.srate)), 0)
+        s1 = self.n_samples if t1 is None else min(int(round(t1 * self.srate)), self.n_samples)
+        block = self.data[:, s0:s1]
+        if channels is not None:
+            block = block[self.picks(channels)]
+        return np.array(block, dtype=np.float32)
+
+    def blocks(self, block_s: float = BLOCK_S, channels=None):
+        """Yield (start sample, channels x samples array) over the whole recording."""
+        step = max(int(block_s * self.srate), 1)
+        for s0 in range(0, self.n_samples, step):
+            yield s0, self.window(s0 / self.srate, (s0 + step) / self.srate, channels)
+
+    def close(self):
+        """Drop the mapping (the file stays open until the memmap is collected)."""
+        self.data = np.empty((self.n_channels, 0), dtype=np.float32)
+
+
+def open_recording(set_path, subject: str = "", diagnosis: str = "", country: str = "") -> EEGRecording:
+    """Map the .fdt that belongs to `set_path`; raises EEGAccessError if it cannot."""
+    hdr = read_set_header(set_path)
+    if not hdr.ok:
+        raise EEGAccessError(f"{set_path}: {hdr.error}")
+    if hdr.embedded:
+        raise EEGAccessError(f"{set_path}: data is embedded in the .set, nothing to map")
+    fdt = hdr.fdt_path()
+    if fdt is None:
+        raise EEGAccessError(f"{set_path}: .fdt not found ({hdr.data_file or 'no name in header'})")
+    actual = fdt.stat().st_size
+    if hdr.nbchan <= 0 or actual != hdr.expected_fdt_bytes:
+        raise EEGAccessError(f"{fdt}: {actual} bytes, header expects {hdr.expected_fdt_bytes}")
+
+    n_samples = hdr.pnts * hdr.trials
+    mm = np.memmap(fdt, dtype="<f4", mode="r", shape=(n_samples, hdr.nbchan))
+    ch_names = hdr.chan_labels if len(hdr.chan_labels) == hdr.nbchan else \
+        [f"E{i + 1}" for i in range(hdr.nbchan)]
+    return EEGRecording(
+        set_path=Path(set_path), fdt_path=fdt, srate=hdr.srate, ch_names=ch_names,
+        data=mm.T, trials=hdr.trials, subject=subject, diagnosis=diagnosis, country=country,
+    )
+
+
+def classified_sets(root: Path = CLASSIFIED_ROOT, labels=LABELS, countries=COUNTRIES):
+    """Yield (diagnosis, country, subject, .set path) for EEG_CLASSIFIED/{PD,CN}/{AR,CL}."""
+    for label in labels:
+        for country in countries:
+            cdir = Path(root) / label / country
+            if not cdir.is_dir():
+                continue
+            for subj_dir in sorted(p for p in cdir.iterdir() if p.is_dir()):
+                if subj_dir.name.endswith(".partial"):
+                    continue
+                sets = sorted(subj_dir.rglob("*.set"))
+                if sets:
+                    yield label, country, subj_dir.name, sets[0]
+
+
+def iter_recordings(root: Path = CLASSIFIED_ROOT, labels=LABELS, countries=COUNTRIES, log=print):
+    """Yield an EEGRecording per classified subject; unmappable ones are logged and skipped."""
+    for label, country, subject, set_path in classified_sets(root, labels, countries):
+        try:
+            yield open_recording(set_path, subject, label, country)
+        except (EEGAccessError, OSError) as e:
+            log(f"  [SKIP] {label}/{country}/{subject}: {e}")
+
+
+def main():
+    print("=" * 90)
+    print("EEG MEMMAP ACCESS (EEG_CLASSIFIED)")
+    print("=" * 90)
+    n, total_s, total_bytes = 0, 0.0, 0
+    t0 = time.perf_counter()
+    for rec in iter_recordings():
+        # streamed per-channel RMS: one BLOCK_S window in memory at a time
+        sq = np.zeros(rec.n_channels, dtype=np.float64)
+        for _, block in rec.blocks():
+            sq += np.einsum("ij,ij->i", block, block, dtype=np.float64)
+        rms = np.sqrt(sq / max(rec.n_samples, 1))
+        print(f"  {rec.diagnosis}/{rec.country}/{rec.subject:<12} {rec.n_channels:>3} ch x "
+              f"{rec.n_samples:>8} @ {rec.srate:g} Hz ({rec.duration_s / 60:5.1f} min) "
+              f"median RMS {np.median(rms):8.2f}")
+        n += 1
+        total_s += rec.duration_s
+        total_bytes += rec.fdt_path.stat().st_size
+        rec.close()
+    elapsed = time.perf_counter() - t0
+    rate = total_bytes / 1e6 / elapsed if elapsed else 0.0
+    print(f"\n{n} recordings, {total_s / 3600:.1f} h of signal, "
+          f"{total_bytes / 1e9:.2f} GB streamed in {elapsed:.1f}s ({rate:.0f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
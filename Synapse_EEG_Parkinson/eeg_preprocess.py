@@ -0,0 +1,297 @@
+"""
+Batch EEG preprocessing into memory-mappable epoch tensors
+==========================================================
+For each recording in EEG_CLASSIFIED/{PD,CN}/{AR,CL}:
+
+  1. zero-phase band-pass (Butterworth SOS through sosfiltfilt, or a
+     windowed-sinc FIR through filtfilt) plus an optional IIR notch, applied
+     along time to CHANNEL_BLOCK channels at once
+  2. average reference (mean over channels subtracted per sample)
+  3. fixed-length epochs of EPOCH_S seconds (EPOCH_STEP_S apart)
+
+The filters are linear and identical on every channel, so referencing after
+filtering gives the same result as referencing first. This lets the
+recording be filtered one channel block at a time straight from the .fdt
+memmap (eeg_memmap.py) instead of loading it whole: memory holds one block
+of CHANNEL_BLOCK x n_samples float64 (plus the filter's temporaries of the
+same size) and a running channel sum of n_samples, so it still grows with
+the recording length, just CHANNEL_BLOCK / n_channels as fast. The .fdt
+stores channels interleaved per sample, so every block reads the whole file:
+a recording is read n_channels / CHANNEL_BLOCK times (mostly from the page
+cache once it fits there). A larger CHANNEL_BLOCK means fewer passes and
+more memory; CHANNEL_BLOCK >= n_channels is a single pass.
+
+Each recording becomes one .npy of float32 epochs (n_epochs, n_channels,
+n_times), written through numpy's open_memmap, with a .json sidecar that holds
+the channel names, sampling rate, parameters and source stamp. Training code
+maps it with open_epochs() and reads only the epochs it draws. Recordings whose
+sidecar matches the current parameters and source files are skipped, so a
+rerun only processes new or changed data. epochs_index.csv lists everything
+written, with the same key columns as eeg_paired_subjects.csv.
+
+Subjects are spread over a process pool.
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+from scipy import signal
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from eeg_memmap import CLASSIFIED_ROOT, EEGAccessError, classified_sets, open_recording
+from feature_cache import fingerprint
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+EPOCHS_ROOT = CLASSIFIED_ROOT / "epochs"
+INDEX_CSV = EPOCHS_ROOT / "epochs_index.csv"
+WORKERS = max(1, (os.cpu_count() or 2) - 1)
+PREPROCESS_VERSION = 1   # bump when the processing code changes
+
+FILTER = {
+    "design": "iir",      # "iir": Butterworth SOS, "fir": windowed-sinc (Hamming)
+    "band": (1.0, 45.0),  # Hz; None on either side = no high-/low-pass
+    "iir_order": 4,       # doubled by the forward-backward pass
+    "fir_taps_s": 1.0,    # FIR length in seconds (odd number of taps)
+    "notch": 50.0,        # mains (AR/CL); None = no notch
+    "notch_q": 30.0,
+}
+REFERENCE = "average"     # "average" | None (keep the recording reference)
+EPOCH_S = 2.0
+EPOCH_STEP_S = 2.0        # < EPOCH_S for overlapping epochs
+CHANNEL_BLOCK = 16        # channels per pass: memory ~ CHANNEL_BLOCK x n_samples x 8 B x ~3,
+                          # and the .fdt is read n_channels / CHANNEL_BLOCK times
+
+KEY_COLUMNS = ["subject_id", "diagnosis", "country", "set_file"]
+
+# ── Filters ──────────────────────────────────────────────────────────────────
+
+def design_filter(srate: float, spec: dict = FILTER):
+    """("sos", sos) or ("fir", taps) for the band-pass, plus the notch as SOS (or None)."""
+    lo, hi = spec["band"]
+    nyq = srate / 2.0
+    hi = hi if hi is not None and hi < nyq else None
+    if lo is None and hi is None:
+        band = None
+    elif spec["design"] == "iir":
+        if lo is None:
+            sos = signal.butter(spec["iir_order"], hi, btype="lowpass", fs=srate, output="sos")
+        elif hi is None:
+            sos = signal.butter(spec["iir_order"], lo, btype="highpass", fs=srate, output="sos")
+        else:
+            sos = signal.butter(spec["iir_order"], (lo, hi), btype="bandpass", fs=srate, output="sos")
+        band = ("sos", sos)
+    elif spec["design"] == "fir":
+        numtaps = int(round(spec["fir_taps_s"] * srate)) | 1
+        cutoff = [f for f in (lo, hi) if f is not None]
+        pass_zero = {(True, True): False, (True, False): False, (False, True): True}[
+            (lo is not None, hi is not None)]
+        band = ("fir", signal.firwin(numtaps, cutoff, pass_zero=pass_zero, fs=srate))
+    else:
+        raise ValueError(f"unknown filter design {spec['design']!r}")
+
+    notch = None
+    if spec.get("notch") and spec["notch"] < nyq:
+        b, a = signal.iirnotch(spec["notch"], spec["notch_q"], fs=srate)
+        notch = signal.tf2sos(b, a)
+    return band, notch
+
+
+def apply_filter(x: np.ndarray, band, notch) -> np.ndarray:
+    """Zero-phase filtering of a channels x samples float64 block along time."""
+    if band is not None:
+        kind, coefs = band
+        if kind == "sos":
+            x = signal.sosfiltfilt(coefs, x, axis=-1)
+        else:
+            x = signal.filtfilt(coefs, [1.0], x, axis=-1, padlen=min(3 * len(coefs), x.shape[-1] - 1))
+    if notch is not None:
+        x = signal.sosfiltfilt(notch, x, axis=-1)
+    return x
+
+
+def epoch_starts(n_samples: int, srate: float, epoch_s: float = EPOCH_S,
+                 step_s: float = EPOCH_STEP_S) -> np.ndarray:
+    """First sample of every complete epoch."""
+    n_times = int(round(epoch_s * srate))
+    step = max(int(round(step_s * srate)), 1)
+    if n_times < 1 or n_samples < n_times:
+        return np.empty(0, dtype=np.int64)
+    return np.arange(0, n_samples - n_times + 1, step, dtype=np.int64)
+
+# ── One recording ────────────────────────────────────────────────────────────
+
+def preprocess_params() -> dict:
+    """Everything that changes the epochs; stored in every sidecar."""
+    return {"version": PREPROCESS_VERSION, "filter": FILTER, "reference": REFERENCE,
+            "epoch_s": EPOCH_S, "epoch_step_s": EPOCH_STEP_S}
+
+
+def source_stamp(set_path) -> dict:
+    """Size/mtime of the .set and its .fdt; a change means the epochs are stale."""
+    set_path = Path(set_path)
+    out = {}
+    for p in (set_path, set_path.with_suffix(".fdt")):
+        st = p.stat() if p.exists() else None
+        out[p.name] = [st.st_size, st.st_mtime_ns] if st else None
+    return out
+
+
+def epochs_path(root: Path, diagnosis: str, country: str, subject: str) -> Path:
+    return Path(root) / diagnosis / country / f"{subject}.npy"
+
+
+def preprocess_recording(rec, out_path: Path, params: dict = None,
+                         channel_block: int = CHANNEL_BLOCK) -> dict:
+    """Filter, re-reference and epoch one EEGRecording into `out_path` (.npy + .json)."""
+    params = params or preprocess_params()
+    n_ch, n = rec.n_channels, rec.n_samples
+    n_times = int(round(params["epoch_s"] * rec.srate))
+    starts = epoch_starts(n, rec.srate, params["epoch_s"], params["epoch_step_s"])
+    if not len(starts):
+        raise EEGAccessError(f"{rec.set_path}: shorter than one {params['epoch_s']}s epoch")
+    band, notch = design_filter(rec.srate, params["filter"])
+    # samples covered by some epoch; everything else is dropped after filtering
+    idx = (starts[:, None] + np.arange(n_times)[None, :])          # epochs x times
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.stem + ".partial.npy")
+    out = open_memmap(tmp, mode="w+", dtype=np.float32, shape=(len(starts), n_ch, n_times))
+    try:
+        ch_sum = np.zeros(n, dtype=np.float64)
+        for c0 in range(0, n_ch, channel_block):
+            c1 = min(n_ch, c0 + channel_block)
+            x = apply_filter(np.asarray(rec.data[c0:c1], dtype=np.float64), band, notch)
+            ch_sum += x.sum(axis=0)
+            out[:, c0:c1, :] = x[:, idx].transpose(1, 0, 2)
+        if params["reference"] == "average":
+            mean = (ch_sum / n_ch)[idx].astype(np.float32)           # epochs x times
+            for e0 in range(0, len(starts), 256):
+                out[e0:e0 + 256] -= mean[e0:e0 + 256, None, :]
+        out.flush()
+    finally:
+        del out
+    os.replace(tmp, out_path)
+
+    meta = {
+        "subject_id": rec.subject, "diagnosis": rec.diagnosis, "country": rec.country,
+        "set_file": rec.set_path.name, "srate": rec.srate, "ch_names": list(rec.ch_names),
+        "n_epochs": int(len(starts)), "n_channels": n_ch, "n_times": n_times,
+        "epoch_starts": starts.tolist(), "params": params,
+        "params_key": fingerprint(params), "source": source_stamp(rec.set_path),
+    }
+    with open(out_path.with_suffix(".json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+def is_current(out_path: Path, set_path, params: dict) -> bool:
+    """True if `out_path` was written from the current source with these parameters."""
+    meta_path = Path(out_path).with_suffix(".json")
+    if not Path(out_path).exists() or not meta_path.exists():
+        return False
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    return meta.get("params_key") == fingerprint(params) and meta.get("source") == source_stamp(set_path)
+
+
+def preprocess_subject(set_path, subject: str, diagnosis: str, country: str,
+                       out_root: Path = EPOCHS_ROOT, params: dict = None) -> dict:
+    """Index row for one subject (runs in a worker process)."""
+    out_path = epochs_path(out_root, diagnosis, country, subject)
+    rec = open_recording(set_path, subject, diagnosis, country)
+    try:
+        meta = preprocess_recording(rec, out_path, params)
+    finally:
+        rec.close()
+    return index_row(out_path, meta)
+
+
+def index_row(out_path: Path, meta: dict) -> dict:
+    row = {k: meta[k] for k in KEY_COLUMNS}
+    row.update({"path": str(out_path), "n_epochs": meta["n_epochs"], "n_channels": meta["n_channels"],
+                "n_times": meta["n_times"], "srate": meta["srate"], "params_key": meta["params_key"]})
+    return row
+
+# ── Reading ──────────────────────────────────────────────────────────────────
+
+def open_epochs(path) -> tuple:
+    """(read-only memmap of shape (n_epochs, n_channels, n_times), sidecar metadata)."""
+    path = Path(path)
+    with open(path.with_suffix(".json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    return np.load(path, mmap_mode="r"), meta
+
+
+def load_index(index_csv: Path = INDEX_CSV) -> pd.DataFrame:
+    return pd.read_csv(index_csv, dtype={c: str for c in KEY_COLUMNS})
+
+# ── Batch ────────────────────────────────────────────────────────────────────
+
+def run_batch(jobs, out_root: Path = EPOCHS_ROOT, workers: int = WORKERS, log=print):
+    """jobs: (diagnosis, country, subject, set path); returns (rows, skipped, failures)."""
+    params = preprocess_params()
+    rows, todo, failures, skipped = [], [], [], 0
+    for job in jobs:
+        label, country, subject, set_path = job
+        out_path = epochs_path(out_root, label, country, subject)
+        if is_current(out_path, set_path, params):
+            rows.append(index_row(out_path, open_epochs(out_path)[1]))
+            skipped += 1
+        else:
+            todo.append(job)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(preprocess_subject, set_path, subject, label, country, out_root, params):
+                   (label, country, subject) for label, country, subject, set_path in todo}
+        for fut in as_completed(futures):
+            label, country, subject = futures[fut]
+            try:
+                rows.append(fut.result())
+                log(f"  Done: {label}/{country}/{subject}")
+            except Exception as e:
+                failures.append((label, country, subject, str(e)))
+                log(f"  [FAIL] {label}/{country}/{subject}: {e}")
+    return rows, skipped, failures
+
+
+def main():
+    if not CLASSIFIED_ROOT.exists():
+        print("ERROR: EEG_CLASSIFIED not found:", CLASSIFIED_ROOT)
+        return
+
+    jobs = list(classified_sets())
+    print("=" * 90)
+    print(f"EEG PREPROCESSING ({len(jobs)} recordings, {WORKERS} workers)")
+    print("=" * 90)
+    print(f"Filter   : {FILTER}")
+    print(f"Epochs   : {EPOCH_S}s every {EPOCH_STEP_S}s, reference={REFERENCE}")
+    t0 = time.perf_counter()
+    rows, skipped, failures = run_batch(jobs)
+    elapsed = time.perf_counter() - t0
+
+    index = pd.DataFrame(rows)
+    if not index.empty:
+        index = index.sort_values(["diagnosis", "country", "subject_id"]).reset_index(drop=True)
+        EPOCHS_ROOT.mkdir(parents=True, exist_ok=True)
+        index.to_csv(INDEX_CSV, index=False)
+
+    print(f"\nSubjects : {len(rows) - skipped} processed, {skipped} up to date, "
+          f"{len(failures)} failed, {elapsed:.1f}s")
+    if not index.empty:
+        n_bytes = (index["n_epochs"] * index["n_channels"] * index["n_times"] * 4).sum()
+        print(f"Epochs   : {index['n_epochs'].sum()} ({n_bytes / 1e9:.2f} GB float32)")
+        print(index.groupby("diagnosis")["n_epochs"].agg(["count", "sum", "median"]).to_string())
+        print(f"\nIndex    -> {INDEX_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Resting-state spectral features for every paired EEG subject
+============================================================
+For each recording in EEG_CLASSIFIED/{PD,CN}/{AR,CL}:
+
+  - Welch PSD (Hann window, 50 % overlap, mean removed per segment),
+    computed with one rfft over a (channels, segments, samples) block
+  - absolute band power, delta .. gamma (mean over channels)
+  - relative band power (band / total power in TOTAL_RANGE)
+  - peak alpha frequency of the channel-averaged PSD
+
+Signals are read through the .fdt memmaps (eeg_memmap.py) a block of
+segments at a time, so memory stays flat whatever the recording length.
+Subjects are spread over a process pool. Results are cached by recording
+content and feature parameters (feature_cache.py), so a rerun only computes
+new or changed recordings.
+
+The output table is keyed by subject_id / diagnosis / country / set_file,
+the same columns as EEG_CLASSIFIED/eeg_paired_subjects.csv, and a joined
+copy with the demographics/cognition columns is written next to it.
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from eeg_memmap import CLASSIFIED_ROOT, EEGAccessError, classified_sets, open_recording
+from feature_cache import FeatureCache, subject_files
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+PAIRED_CSV   = CLASSIFIED_ROOT / "eeg_paired_subjects.csv"
+FEATURES_OUT = CLASSIFIED_ROOT / "eeg_spectral_features.csv"
+JOINED_OUT   = CLASSIFIED_ROOT / "eeg_paired_subjects_features.csv"
+WORKERS = max(1, (os.cpu_count() or 2) - 1)
+CACHE_DIR = CLASSIFIED_ROOT / ".feature_cache"
+CACHE_MAX_BYTES = 512 * 1024 ** 2
+CACHE_NAMESPACE = "eeg_spectral"
+FEATURE_VERSION = 1   # bump when the feature code changes
+
+BANDS = {
+    "delta": (1.0, 4.0),
+    "theta": (4.0, 8.0),
+    "alpha": (8.0, 13.0),
+    "beta":  (13.0, 30.0),
+    "gamma": (30.0, 45.0),
+}
+TOTAL_RANGE = (1.0, 45.0)
+ALPHA_SEARCH = (7.0, 13.0)   # peak alpha frequency search range
+WELCH = {"seg_s": 2.0, "overlap": 0.5}
+SEG_BLOCK = 64               # segments per FFT block (bounds memory)
+
+KEY_COLUMNS = ["subject_id", "diagnosis", "country", "set_file"]
+
+# ── Spectra ──────────────────────────────────────────────────────────────────
+
+def welch_psd(rec, seg_s: float = WELCH["seg_s"], overlap: float = WELCH["overlap"],
+              seg_block: int = SEG_BLOCK):
+    """One-sided Welch PSD per channel; returns (freqs, psd[channels, freqs], n_segments)."""
+    fs = rec.srate
+    nper = int(round(seg_s * fs))
+    step = max(int(round(nper * (1.0 - overlap))), 1)
+    if nper < 2 or rec.n_samples < nper:
+        raise EEGAccessError(f"{rec.set_path}: recording shorter than one {seg_s}s segment")
+    n_seg = 1 + (rec.n_samples - nper) // step
+
+    win = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(nper) / nper)   # periodic Hann
+    acc = np.zeros((rec.n_channels, nper // 2 + 1))
+    for b0 in range(0, n_seg, seg_block):
+        b1 = min(n_seg, b0 + seg_block)
+        x = np.asarray(rec.data[:, b0 * step:(b1 - 1) * step + nper], dtype=np.float64)
+        segs = sliding_window_view(x, nper, axis=1)[:, ::step]          # ch x seg x nper
+        segs = (segs - segs.mean(axis=-1, keepdims=True)) * win
+        spec = np.fft.rfft(segs, axis=-1)
+        acc += (spec.real ** 2 + spec.imag ** 2).sum(axis=1)
+
+    psd = acc / (n_seg * fs * (win ** 2).sum())
+    if nper % 2:
+        psd[:, 1:] *= 2
+    else:
+        psd[:, 1:-1] *= 2   # DC and Nyquist appear once
+    return np.fft.rfftfreq(nper, 1.0 / fs), psd, n_seg
+
+
+def band_features(freqs, psd, bands=BANDS, total_range=TOTAL_RANGE,
+                  alpha_search=ALPHA_SEARCH) -> dict:
+    """Absolute/relative band power (channel mean) and peak alpha frequency."""
+    df = freqs[1] - freqs[0]
+    lo, hi = total_range
+    total = psd[:, (freqs >= lo) & (freqs < hi)].sum(axis=1) * df
+    out = {}
+    for name, (lo, hi) in bands.items():
+        power = psd[:, (freqs >= lo) & (freqs < hi)].sum(axis=1) * df
+        out[f"abs_{name}"] = float(power.mean())
+        out[f"rel_{name}"] = float(np.mean(power / np.where(total > 0, total, np.nan)))
+    out["total_power"] = float(total.mean())
+
+    mask = (freqs >= alpha_search[0]) & (freqs <= alpha_search[1])
+    mean_psd = psd[:, mask].mean(axis=0)
+    out["peak_alpha_hz"] = float(freqs[mask][np.argmax(mean_psd)]) if mask.any() else np.nan
+    return out
+
+
+def extract_subject(set_path, subject: str, diagnosis: str, country: str,
+                    welch: dict = WELCH, bands: dict = BANDS) -> dict:
+    """All features of one recording (runs in a worker process)."""
+    rec = open_recording(set_path, subject, diagnosis, country)
+    try:
+        freqs, psd, n_seg = welch_psd(rec, **welch)
+        row = {
+            "subject_id": subject, "diagnosis": diagnosis, "country": country,
+            "set_file": Path(set_path).name,
+            "n_channels": rec.n_channels, "srate": rec.srate,
+            "duration_s": round(rec.duration_s, 3), "n_segments": n_seg,
+        }
+        row.update(band_features(freqs, psd, bands))
+        return row
+    finally:
+        rec.close()
+
+# ── Batch ────────────────────────────────────────────────────────────────────
+
+def run_batch(jobs, workers: int = WORKERS, log=print):
+    """jobs: (diagnosis, country, subject, set path); returns (rows, failures)."""
+    rows, failures = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(extract_subject, set_path, subject, label, country):
+                   (label, country, subject) for label, country, subject, set_path in jobs}
+        for fut in as_completed(futures):
+            label, country, subject = futures[fut]
+            try:
+                rows.append(fut.result())
+                log(f"  Done: {label}/{country}/{subject}")
+            except Exception as e:
+                failures.append((label, country, subject, str(e)))
+                log(f"  [FAIL] {label}/{country}/{subject}: {e}")
+    return rows, failures
+
+
+def feature_params() -> dict:
+    """Everything that changes the numbers; part of the cache key."""
+    return {"version": FEATURE_VERSION, "welch": WELCH, "bands": BANDS,
+            "total_range": TOTAL_RANGE, "alpha_search": ALPHA_SEARCH}
+
+
+def run_cached(jobs, cache: FeatureCache, workers: int = WORKERS, log=print):
+    """run_batch() for the cache misses only; returns (rows, failures)."""
+    params = feature_params()
+    rows, todo, keys = [], [], {}
+    for job in jobs:
+        label, country, subject, set_path = job
+        inputs = subject_files(Path(set_path).parent, ("eeg_set", "eeg_fdt"))
+        key = cache.key(CACHE_NAMESPACE, inputs, params)
+        features = cache.get(key)
+        if features is None:
+            todo.append(job)
+            keys[(label, country, subject)] = key
+        else:
+            rows.append({"subject_id": subject, "diagnosis": label, "country": country,
+                         "set_file": Path(set_path).name, **features})
+
+    new_rows, failures = run_batch(todo, workers, log) if todo else ([], [])
+    for row in new_rows:
+        key = keys[(row["diagnosis"], row["country"], row["subject_id"])]
+        cache.put(key, {k: v for k, v in row.items() if k not in KEY_COLUMNS}, CACHE_NAMESPACE)
+    return rows + new_rows, failures
+
+
+def save_table(df: pd.DataFrame, out_csv: Path):
+    """CSV always; a Parquet copy as well when pyarrow/fastparquet is available."""
+    df.to_csv(out_csv, index=False)
+    try:
+        df.to_parquet(out_csv.with_suffix(".parquet"), index=False)
+    except ImportError:
+        pass
+
+
+def main():
+    if not CLASSIFIED_ROOT.exists():
+        print("ERROR: EEG_CLASSIFIED not found:", CLASSIFIED_ROOT)
+        return
+
+    jobs = list(classified_sets())
+    print("=" * 90)
+    print(f"EEG SPECTRAL FEATURES ({len(jobs)} recordings, {WORKERS} workers)")
+    print("=" * 90)
+    t0 = time.perf_counter()
+    cache = FeatureCache(CACHE_DIR, CACHE_MAX_BYTES)
+    rows, failures = run_cached(jobs, cache)
+    cache.close()
+    elapsed = time.perf_counter() - t0
+
+    features = pd.DataFrame(rows)
+    if not features.empty:
+        features = features.sort_values(["diagnosis", "country", "subject_id"]).reset_index(drop=True)
+        save_table(features, FEATURES_OUT)
+        if PAIRED_CSV.exists():
+            paired = pd.read_csv(PAIRED_CSV, dtype=str)
+            joined = paired.merge(features.astype({c: str for c in KEY_COLUMNS}),
+                                  on=KEY_COLUMNS, how="left")
+            save_table(joined, JOINED_OUT)
+
+    print(f"\nSubjects : {len(rows)} ok, {len(failures)} failed, "
+          f"{elapsed:.1f}s ({len(rows) / elapsed if elapsed else 0:.2f} subjects/s)")
+    print(f"Cache    : {cache.summary()}")
+    if not features.empty:
+        summary = features.groupby("diagnosis")[
+            [f"rel_{b}" for b in BANDS] + ["peak_alpha_hz"]].mean().round(3)
+        print("\nMean relative power / peak alpha by diagnosis:")
+        print(summary.to_string())
+        print(f"\nFeatures -> {FEATURES_OUT}")
+        if PAIRED_CSV.exists():
+            print(f"Joined   -> {JOINED_OUT}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,492 @@
+"""
+Header-only EEGLAB .set reader
+==============================
+Reads just the metadata of an EEGLAB .set file (a MATLAB v5 MAT-file)
+without MNE and without touching the signal:
+
+    nbchan, pnts, trials, srate, channel labels, event count,
+    and whether `data` is embedded or names an external .fdt file.
+
+Both layouts EEGLAB writes are understood: one `EEG` struct variable, or
+the struct fields saved as separate variables (`save -struct EEG`).
+Compressed (v7) variables are inflated as a stream and abandoned as soon as
+the wanted fields are found, and large numeric arrays (times, embedded data,
+ICA matrices) are skipped rather than decoded. MATLAB v7.3 files are HDF5
+and are reported as unsupported.
+
+The .fdt next to a .set is raw float32, channels x samples, so its expected
+size is nbchan * pnts * trials * 4 bytes. `pair_audit()` compares that with
+the file on disk.
+
+    python eeglab_header.py      # audit every .set under EEG_data
+"""
+
+import csv
+import os
+import struct
+import sys
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+EEG_ROOT = Path(r"D:\Datasets\Synapse\Synapse_EEG_Parkinson\EEG_data")
+OUT_CSV = EEG_ROOT.parent / "eeg_set_audit.csv"
+INVENTORY_MODE = "incremental"   # how to refresh the EEG_data index: "reuse" | "incremental" | "full"
+
+FDT_BYTES_PER_SAMPLE = 4   # float32
+INLINE_LIMIT = 64          # numeric arrays with more elements are skipped, not decoded
+
+# Which EEG fields to read. True = decode, False = dimensions only,
+# dict = struct array of which only these sub-fields are decoded.
+FIELDS = {
+    "setname": True, "filename": True, "datfile": True,
+    "nbchan": True, "pnts": True, "trials": True, "srate": True, "xmin": True,
+    "data": True,
+    "chanlocs": {"labels": True},
+    "event": False,
+}
+
+# MAT v5 data types and array classes
+MI_INT8, MI_UINT8, MI_INT16, MI_UINT16, MI_INT32, MI_UINT32 = 1, 2, 3, 4, 5, 6
+MI_SINGLE, MI_DOUBLE, MI_INT64, MI_UINT64 = 7, 9, 12, 13
+MI_MATRIX, MI_COMPRESSED, MI_UTF8, MI_UTF16, MI_UTF32 = 14, 15, 16, 17, 18
+_MI_FORMAT = {
+    MI_INT8: "b", MI_UINT8: "B", MI_INT16: "h", MI_UINT16: "H", MI_INT32: "i",
+    MI_UINT32: "I", MI_SINGLE: "f", MI_DOUBLE: "d", MI_INT64: "q", MI_UINT64: "Q",
+}
+MX_CELL, MX_STRUCT, MX_OBJECT, MX_CHAR = 1, 2, 3, 4
+MX_NUMERIC = set(range(6, 16))   # double, single, int8 ... uint64
+
+HDF5_SIGNATURE = b"\x89HDF\r\n\x1a\n"
+
+
+class MatFormatError(ValueError):
+    pass
+
+
+@dataclass
+class Skipped:
+    """A matrix that was not decoded; only its class and shape are known."""
+    mx_class: int
+    dims: tuple
+
+    @property
+    def size(self) -> int:
+        n = 1
+        for d in self.dims:
+            n *= d
+        return n
+
+
+@dataclass
+class SetHeader:
+    path: Path
+    format: str = ""            # "mat5" | "hdf5" | "unknown"
+    setname: str = ""
+    nbchan: int = 0
+    pnts: int = 0
+    trials: int = 1
+    srate: float = 0.0
+    xmin: float = 0.0
+    data_file: str = ""         # external .fdt named in the header ("" if embedded)
+    embedded: bool = False
+    embedded_shape: tuple = ()
+    n_events: int = 0
+    chan_labels: list = field(default_factory=list)
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+    @property
+    def expected_fdt_bytes(self) -> int:
+        return self.nbchan * self.pnts * self.trials * FDT_BYTES_PER_SAMPLE
+
+    @property
+    def duration_s(self) -> float:
+        return self.pnts / self.srate if self.srate else 0.0
+
+    def fdt_path(self):
+        """The .fdt this header refers to, or None.
+
+        Like EEGLAB/MNE: the name stored in the header first, then a file with
+        the same stem as the .set (names in headers go stale after renames).
+        """
+        if self.embedded:
+            return None
+        folder = Path(self.path).parent
+        candidates = []
+        if self.data_file:
+            candidates.append(folder / Path(self.data_file.replace("\\", "/")).name)
+        candidates.append(Path(self.path).with_suffix(".fdt"))
+        for c in candidates:
+            if c.exists():
+                return c
+        # case-insensitive match (files copied from Windows)
+        names = {c.name.lower() for c in candidates}
+        for entry in os.scandir(folder):
+            if entry.name.lower() in names:
+                return Path(entry.path)
+        return None
+
+# ── Byte streams ─────────────────────────────────────────────────────────────
+
+class _FileStream:
+    def __init__(self, f):
+        self.f = f
+        self.pos = f.tell()
+
+    def read(self, n: int) -> bytes:
+        b = self.f.read(n)
+        if len(b) != n:
+            raise MatFormatError("unexpected end of file")
+        self.pos += n
+        return b
+
+    def skip(self, n: int):
+        self.f.seek(n, os.SEEK_CUR)
+        self.pos += n
+
+
+class _InflateStream:
+    """Reads the inflated bytes of one miCOMPRESSED element on demand."""
+
+    def __init__(self, f, nbytes: int, chunk: int = 64 * 1024):
+        self.f = f
+        self.left = nbytes
+        self.chunk = chunk
+        self.z = zlib.decompressobj()
+        self.buf = b""
+        self.pos = 0
+
+    def _fill(self, need: int):
+        while len(self.buf) < need:
+            if self.z.unconsumed_tail:
+                raw = self.z.unconsumed_tail
+            elif self.left > 0:
+                raw = self.f.read(min(self.chunk, self.left))
+                self.left -= len(raw)
+                if not raw:
+                    raise MatFormatError("unexpected end of compressed variable")
+            else:
+                raise MatFormatError("unexpected end of compressed variable")
+            self.buf += self.z.decompress(raw, max(need - len(self.buf), self.chunk))
+
+    def read(self, n: int) -> bytes:
+        self._fill(n)
+        out, self.buf = self.buf[:n], self.buf[n:]
+        self.pos += n
+        return out
+
+    def skip(self, n: int):
+        # inflate and drop, one chunk at a time
+        while n > 0:
+            step = min(n, 1 << 20)
+            self.read(step)
+            n -= step
+
+# ── MAT v5 elements ──────────────────────────────────────────────────────────
+
+def _tag(s):
+    """(type, nbytes, inline data or None) of the next data element."""
+    head = s.read(8)
+    mtype, nbytes = struct.unpack("<II", head)
+    if mtype >> 16:
+        # small data element: 2-byte size, 2-byte type, then 4 bytes of data
+        return mtype & 0xFFFF, mtype >> 16, head[4:]
+    return mtype, nbytes, None
+
+
+def _pad8(n: int) -> int:
+    return (8 - n % 8) % 8
+
+
+def _subelement(s):
+    """(type, bytes) of a sub-element, padding consumed."""
+    mtype, nbytes, small = _tag(s)
+    if small is not None:
+        return mtype, small[:nbytes]
+    data = s.read(nbytes)
+    s.skip(_pad8(nbytes))
+    return mtype, data
+
+
+def _numbers(mtype: int, data: bytes):
+    fmt = _MI_FORMAT.get(mtype)
+    if fmt is None:
+        raise MatFormatError(f"unexpected numeric data type {mtype}")
+    n = len(data) // struct.calcsize(fmt)
+    return struct.unpack(f"<{n}{fmt}", data[: n * struct.calcsize(fmt)])
+
+
+def _text(mtype: int, data: bytes) -> str:
+    if mtype in (MI_UTF16, MI_UINT16):
+        return data.decode("utf-16-le", "replace")
+    if mtype == MI_UTF32:
+        return data.decode("utf-32-le", "replace")
+    if mtype == MI_UTF8:
+        return data.decode("utf-8", "replace")
+    return data.decode("latin-1")
+
+
+def _matrix_header(s, nbytes: int):
+    """Array flags, dims and name of a miMATRIX body; returns (class, dims, name, end)."""
+    end = s.pos + nbytes
+    if nbytes == 0:
+        return 0, (0, 0), "", end
+    _, flags = _subelement(s)
+    mx_class = struct.unpack("<I", flags[:4])[0] & 0xFF
+    _, dims = _subelement(s)
+    _, name = _subelement(s)
+    return mx_class, tuple(_numbers(MI_INT32, dims)), name.decode("latin-1"), end
+
+
+def _matrix(s, nbytes: int, spec=True):
+    """Decode one miMATRIX body of `nbytes` according to `spec` (see FIELDS).
+
+    Returns (name, value). Structs become a list of dicts (one per element),
+    char arrays a str, small numeric arrays a tuple (a scalar if 1 element),
+    anything else a Skipped.
+    """
+    mx_class, dims, name, end = _matrix_header(s, nbytes)
+    return name, _matrix_body(s, end, mx_class, dims, spec)
+
+
+def _matrix_body(s, end: int, mx_class: int, dims: tuple, spec):
+    value = Skipped(mx_class, dims)
+    if spec is False or s.pos >= end:
+        pass
+    elif mx_class == MX_CHAR:
+        mtype, data = _subelement(s)
+        text = _text(mtype, data)
+        rows = dims[0] if dims else 1
+        if rows > 1:
+            # column-major char matrix -> one string per row
+            cols = len(text) // rows
+            text = "\n".join(text[r::rows][:cols].rstrip() for r in range(rows))
+        value = text
+    elif mx_class in MX_NUMERIC and value.size <= INLINE_LIMIT:
+        mtype, data = _subelement(s)
+        nums = _numbers(mtype, data)
+        value = nums[0] if len(nums) == 1 else nums
+    elif mx_class in (MX_STRUCT, MX_OBJECT):
+        if mx_class == MX_OBJECT:
+            _subelement(s)   # class name
+        _, flen = _subelement(s)
+        flen = _numbers(MI_INT32, flen)[0]
+        _, names = _subelement(s)
+        fields = [names[i:i + flen].split(b"\0", 1)[0].decode("latin-1")
+                  for i in range(0, len(names), flen)]
+        subspec = spec if isinstance(spec, dict) else None
+        elements = []
+        for _ in range(value.size):
+            elem = {}
+            for fname in fields:
+                mtype, fbytes, _ = _tag(s)
+                if mtype != MI_MATRIX:
+                    raise MatFormatError(f"struct field {fname!r} is not a matrix")
+                want = True if subspec is None else subspec.get(fname)
+                if want is None:
+                    s.skip(fbytes)
+                    continue
+                elem[fname] = _matrix(s, fbytes, want)[1]
+            elements.append(elem)
+        value = elements
+    elif mx_class == MX_CELL and value.size <= INLINE_LIMIT:
+        cells = []
+        for _ in range(value.size):
+            _, cbytes, _ = _tag(s)
+            cells.append(_matrix(s, cbytes, spec)[1])
+        value = cells
+
+    if s.pos > end:
+        raise MatFormatError("matrix overran its element")
+    s.skip(end - s.pos)
+    return value
+
+
+def _variables(f, wanted):
+    """Yield (name, value) for top-level variables; `wanted` maps name -> spec.
+
+    Variables not in `wanted` yield (name, None) without being decoded.
+    """
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            return
+        mtype, nbytes = struct.unpack("<II", head)
+        start = f.tell()
+        if mtype == MI_COMPRESSED:
+            s = _InflateStream(f, nbytes)
+            itype, ibytes, _ = _tag(s)
+            if itype == MI_MATRIX:
+                yield _variable(s, ibytes, wanted)
+            f.seek(start + nbytes)   # the rest of the variable is never inflated
+        elif mtype == MI_MATRIX:
+            yield _variable(_FileStream(f), nbytes, wanted)
+            f.seek(start + nbytes + _pad8(nbytes))
+        else:
+            f.seek(start + nbytes + _pad8(nbytes))
+
+
+def _variable(s, nbytes: int, wanted):
+    mx_class, dims, name, end = _matrix_header(s, nbytes)
+    spec = wanted.get(name)
+    if spec is None:
+        return name, None
+    return name, _matrix_body(s, end, mx_class, dims, spec)
+
+# ── Public API ───────────────────────────────────────────────────────────────
+
+def _as_int(v, default=0) -> int:
+    if isinstance(v, tuple):
+        v = v[0] if v else default
+    return int(v) if isinstance(v, (int, float)) else default
+
+
+def read_set_header(path) -> SetHeader:
+    """Parse the metadata of one EEGLAB .set file; errors end up in `.error`."""
+    path = Path(path)
+    hdr = SetHeader(path)
+    try:
+        with open(path, "rb") as f:
+            head = f.read(128)
+            f.seek(512)   # HDF5 superblock behind the 512-byte MAT user block
+            if head.startswith(b"MATLAB 7.3") or f.read(8) == HDF5_SIGNATURE:
+                hdr.format = "hdf5"
+                hdr.error = "MATLAB v7.3 (HDF5) .set files are not supported"
+                return hdr
+            if len(head) < 128 or not head.startswith(b"MATLAB 5.0"):
+                hdr.format = "unknown"
+                hdr.error = "not a MATLAB 5.0 MAT-file"
+                return hdr
+            if head[126:128] != b"IM":
+                hdr.format = "mat5"
+                hdr.error = "big-endian MAT-files are not supported"
+                return hdr
+            hdr.format = "mat5"
+            f.seek(128)
+
+            fields = {}
+            for name, value in _variables(f, {"EEG": FIELDS, **FIELDS}):
+                if name == "EEG" and isinstance(value, list) and value:
+                    fields.update(value[0])
+                    break
+                if value is not None:
+                    fields[name] = value
+                    if FIELDS.keys() <= fields.keys():
+                        break
+    except (OSError, MatFormatError, struct.error, zlib.error) as e:
+        hdr.error = str(e) or type(e).__name__
+        return hdr
+
+    if not fields:
+        hdr.error = "no EEG fields found"
+        return hdr
+    hdr.setname = fields.get("setname", "") if isinstance(fields.get("setname"), str) else ""
+    hdr.nbchan = _as_int(fields.get("nbchan"))
+    hdr.pnts = _as_int(fields.get("pnts"))
+    hdr.trials = _as_int(fields.get("trials"), 1) or 1
+    srate = fields.get("srate", 0.0)
+    hdr.srate = float(srate[0] if isinstance(srate, tuple) else srate) if srate else 0.0
+    xmin = fields.get("xmin", 0.0)
+    hdr.xmin = float(xmin) if isinstance(xmin, (int, float)) else 0.0
+
+    data = fields.get("data")
+    if isinstance(data, str):
+        hdr.data_file = data
+    elif data is not None and not (isinstance(data, Skipped) and data.size == 0):
+        hdr.embedded = True
+        hdr.embedded_shape = data.dims if isinstance(data, Skipped) else ()
+    elif isinstance(fields.get("datfile"), str) and fields["datfile"]:
+        hdr.data_file = fields["datfile"]
+
+    event = fields.get("event")
+    if isinstance(event, Skipped):
+        hdr.n_events = event.size
+    elif isinstance(event, list):
+        hdr.n_events = len(event)
+
+    chanlocs = fields.get("chanlocs")
+    if isinstance(chanlocs, list):
+        hdr.chan_labels = [c.get("labels", "") if isinstance(c.get("labels"), str) else ""
+                           for c in chanlocs]
+    return hdr
+
+
+def pair_audit(set_path) -> dict:
+    """Header + .fdt check for one .set file.
+
+    status: "ok" | "embedded" | "missing_fdt" | "truncated" | "oversized" | "unreadable"
+    """
+    hdr = read_set_header(set_path)
+    row = {
+        "set": str(set_path), "fdt": "", "status": "", "nbchan": hdr.nbchan,
+        "pnts": hdr.pnts, "trials": hdr.trials, "srate": hdr.srate,
+        "n_events": hdr.n_events, "expected_bytes": 0, "actual_bytes": 0, "error": hdr.error,
+    }
+    if not hdr.ok:
+        row["status"] = "unreadable"
+        return row
+    if hdr.embedded:
+        row["status"] = "embedded"
+        return row
+    row["expected_bytes"] = hdr.expected_fdt_bytes
+    fdt = hdr.fdt_path()
+    if fdt is None:
+        row["status"] = "missing_fdt"
+        return row
+    row["fdt"] = str(fdt)
+    row["actual_bytes"] = fdt.stat().st_size
+    if row["actual_bytes"] == row["expected_bytes"]:
+        row["status"] = "ok"
+    elif row["actual_bytes"] < row["expected_bytes"]:
+        row["status"] = "truncated"
+    else:
+        row["status"] = "oversized"
+    return row
+
+
+def main():
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from dataset_inventory import open_inventory
+
+    inv = open_inventory(EEG_ROOT, mode=INVENTORY_MODE)
+    set_files = [EEG_ROOT / r["path"] for r in inv.files(kinds=("eeg_set",))]
+    inv.close()
+
+    print("=" * 90)
+    print("EEGLAB .set HEADER AUDIT")
+    print("=" * 90)
+    t0 = time.perf_counter()
+    rows = [pair_audit(p) for p in set_files]
+    elapsed = time.perf_counter() - t0
+
+    for r in rows:
+        if r["status"] != "ok":
+            detail = r["error"] or f"expected {r['expected_bytes']} B, found {r['actual_bytes']} B"
+            print(f"  [{r['status'].upper()}] {Path(r['set']).relative_to(EEG_ROOT)}  ({detail})")
+
+    counts = Counter(r["status"] for r in rows)
+    print("\nSummary:")
+    for status, n in counts.most_common():
+        print(f"  {status:<12} {n:>4}")
+    per_file = elapsed / len(rows) * 1000 if rows else 0.0
+    print(f"\n{len(rows)} headers in {elapsed:.2f}s ({per_file:.1f} ms per file)")
+
+    OUT_CSV.parent.mkdir(parents=True, exist_ok=True)
+    with open(OUT_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["set"])
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Saved: {OUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
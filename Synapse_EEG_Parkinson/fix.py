@@ -1,5 +1,6 @@
 import os
-import mne
+
+from eeglab_header import read_set_header
 
 # Base directory for the EEG data (accounting for the EEG_data subfolder)
 base_dir = r"D:\Datasets\Synapse\Synapse_EEG_Parkinson\EEG_data"
@@ -30,23 +31,30 @@ unpaired_hc_subjects = [
 ]
 
 embedded_count = 0
+external_count = 0
 missing_count = 0
 
 for sub in unpaired_hc_subjects:
     set_file = os.path.join(hc_cl_dir, sub, "eeg", f"s6_{sub}_rs_eeg.set")
     
     if os.path.exists(set_file):
-        try:
-            # verbose='error' keeps the console clean from MNE warnings
-            raw = mne.io.read_raw_eeglab(set_file, preload=False, verbose='error')
-            print(f" {sub}: SUCCESS (Data is embedded)")
+        # header only: no MNE, no signal read
+        hdr = read_set_header(set_file)
+        if not hdr.ok:
+            print(f" {sub}: FAILED - {hdr.error}")
+            missing_count += 1
+        elif hdr.embedded:
+            print(f" {sub}: SUCCESS (Data is embedded, {hdr.nbchan} ch x {hdr.pnts} samples @ {hdr.srate:g} Hz)")
             embedded_count += 1
-        except Exception as e:
-            print(f" {sub}: FAILED - {e}")
+        elif hdr.fdt_path() is not None:
+            print(f" {sub}: External data found ({hdr.fdt_path().name})")
+            external_count += 1
+        else:
+            print(f" {sub}: FAILED - data is in missing file '{hdr.data_file}'")
             missing_count += 1
     else:
         print(f" {sub}: File not found at {set_file}")
 
 print("\n============================================================")
-print(f"RESULTS: {embedded_count} Embedded | {missing_count} Genuinely Missing")
+print(f"RESULTS: {embedded_count} Embedded | {external_count} External .fdt | {missing_count} Genuinely Missing")
 print("============================================================")
\ No newline at end of file
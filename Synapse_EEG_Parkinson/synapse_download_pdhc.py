@@ -1,20 +1,19 @@
-import pandas as pd
+import sys
+import warnings
+from pathlib import Path
+
 import synapseclient
 import synapseutils
-import warnings
-warnings.filterwarnings('ignore', category=DeprecationWarning)
 
-# Load EEG subject lists (PD and CN)
-pd_records = pd.read_csv('Records_PD_EEG_data.csv')
-cn_records = pd.read_csv('records_hc_eeg_data.csv')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from brainlat_tables import load_table
 
-# Clean subject IDs
-pd_records['id_EEG'] = pd_records['id_EEG'].astype(str).str.strip()
-cn_records['id_EEG'] = cn_records['id_EEG'].astype(str).str.strip()
+warnings.filterwarnings('ignore', category=DeprecationWarning)
 
-# Extract country from path (e.g. 3_PD/AR → AR, 5_HC/CL → CL)
-pd_records['country'] = pd_records['path'].astype(str).str.replace("\\", "/").str.split("/").str[-1]
-cn_records['country'] = cn_records['path'].astype(str).str.replace("\\", "/").str.split("/").str[-1]
+# Load EEG subject lists (PD and CN): typed and cached, ids already stripped,
+# country already taken from path (e.g. 3_PD/AR → AR, 5_HC/CL → CL)
+pd_records = load_table('eeg_rec_pd')
+cn_records = load_table('eeg_rec_hc')
 
 # Keep only PD/CN subjects with EEG available
 pd_list = pd_records[(pd_records['diagnosis'] == 'PD') & (pd_records['eeg'] == 1)]
@@ -53,9 +52,9 @@ for (group, country), folder_id in folder_ids.items():
 
     # Get expected subjects from CSV
     if group == 'PD':
-        expected = pd_list[pd_list['country'] == country]['id_EEG'].tolist()
+        expected = pd_list[pd_list['country'] == country]['id_eeg'].tolist()
     else:
-        expected = cn_list[cn_list['country'] == country]['id_EEG'].tolist()
+        expected = cn_list[cn_list['country'] == country]['id_eeg'].tolist()
 
     if len(expected) == 0:
         print(f"No subjects in {group}/{country}, skipping...")
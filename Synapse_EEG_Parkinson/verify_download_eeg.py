@@ -1,6 +1,11 @@
 import os
+import sys
 import pandas as pd
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_inventory import open_inventory
+from synapse_listing import load_listing
+
 print("="*90)
 print("EEG DOWNLOAD VERIFICATION: CSV vs SYNAPSE WEBSITE vs LOCAL DATA (FILES CHECK)")
 print("="*90)
@@ -63,15 +68,10 @@ def build_master_from_demographics(demo_df):
         out["diagnosis"] = None
     return out[["subject_id", "diagnosis", "site", "group_folder"]].drop_duplicates()
 
-def has_eeg_files(subject_folder):
+def subjects_with_eeg_files(inv):
     # Consider "downloaded" only if we find at least one EEG file
-    # (edit extensions if your dataset uses different ones)
-    for root, _, files in os.walk(subject_folder):
-        for f in files:
-            fl = f.lower()
-            if fl.endswith(".set") or fl.endswith(".fdt"):
-                return True
-    return False
+    # (edit kinds if your dataset uses different ones)
+    return inv.subjects_with(("eeg_set", "eeg_fdt"))
 
 # ----------------------------
 # MASTER CSV UNIVERSE (DEMOGRAPHICS = truth for folder/site + diagnosis)
@@ -86,30 +86,24 @@ csv_ids_cog  = ids_in_df(cog_hc) | ids_in_df(cog_pd)
 csv_ids_rec  = ids_in_df(rec_hc) | ids_in_df(rec_pd)
 
 # ----------------------------
-# 2) SYNAPSE WEBSITE SUBJECTS (PASTE FROM YOUR WEBSITE LIST)
+# 2) SYNAPSE WEBSITE SUBJECTS (cached listing snapshot, see synapse_listing.py)
 # ----------------------------
-synapse_subjects = {
-    ("3_PD", "AR"): [
-        "sub-40001","sub-40006","sub-40008","sub-40010","sub-40011","sub-40012","sub-40013"
-    ],
-    ("3_PD", "CL"): [
-        "sub-40001","sub-40004","sub-40005","sub-40006","sub-40007","sub-40008","sub-40009",
-        "sub-40010","sub-40011","sub-40012","sub-40015","sub-40016","sub-40017","sub-40018",
-        "sub-40019","sub-40020","sub-40021","sub-40022","sub-40023","sub-40024","sub-40025","sub-40026"
-    ],
-    ("5_HC", "AR"): [
-        "sub-100012","sub-100015","sub-100018","sub-10002","sub-100020","sub-100022","sub-100024",
-        "sub-100026","sub-100028","sub-10003","sub-100030","sub-100031","sub-100033","sub-100035",
-        "sub-100038","sub-10004","sub-10006","sub-10007","sub-10009"
-    ],
-    ("5_HC", "CL"): [
-        "sub-10001","sub-100010","sub-100011","sub-100013","sub-100014","sub-100016","sub-100017",
-        "sub-100019","sub-100021","sub-100023","sub-100025","sub-100027","sub-100029","sub-100032",
-        "sub-100034","sub-100036","sub-100037","sub-100039","sub-100040","sub-100041","sub-100042",
-        "sub-100043","sub-100044","sub-100045","sub-100046","sub-10005","sub-10008"
-    ],
+# REFRESH_LISTING=True re-lists the folders whose etag changed (needs a Synapse login,
+# or FAKE_SYNAPSE_ROOT for a local fake tree); otherwise the snapshot is used offline.
+LISTING_SNAPSHOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "synapse_listing_eeg.json")
+REFRESH_LISTING = False
+FAKE_SYNAPSE_ROOT = None
+FOLDER_IDS = {
+    ("3_PD", "AR"): "syn53622405",
+    ("3_PD", "CL"): "syn53619554",
+    ("5_HC", "AR"): "syn53497914",
+    ("5_HC", "CL"): "syn53497784",
 }
 
+listing = load_listing(LISTING_SNAPSHOT, {"/".join(k): v for k, v in FOLDER_IDS.items()},
+                       refresh=REFRESH_LISTING, fake_root=FAKE_SYNAPSE_ROOT)
+synapse_subjects = {key: listing.names("/".join(key)) for key in FOLDER_IDS}
+
 # ----------------------------
 # 3) LOCAL ROOT (EDIT IF NEEDED)
 # ----------------------------
@@ -117,6 +111,13 @@ synapse_subjects = {
 #   ./EEG_data/3_PD/AR/sub-40001/...
 #   ./EEG_data/5_HC/CL/sub-10001/...
 LOCAL_EEG_ROOT = "./EEG_data"
+INVENTORY_MODE = "incremental"   # how to refresh the EEG_data index: "reuse" | "incremental" | "full"
+
+# One scandir walk of the local tree; per-subject checks below are set lookups
+inv = open_inventory(LOCAL_EEG_ROOT, mode=INVENTORY_MODE)
+local_subject_dirs = {d["path"] for d in inv.subject_dirs()}
+local_with_eeg = subjects_with_eeg_files(inv)
+inv.close()
 
 # ----------------------------
 # 4) VERIFICATION PER FOLDER
@@ -181,9 +182,9 @@ for (group_folder, site), subjects in synapse_subjects.items():
     empty_or_no_eeg_files = []
 
     for s in subjects:
-        p = os.path.join(local_folder, s)
-        if os.path.isdir(p):
-            if has_eeg_files(p):
+        p = f"{group_folder}/{site}/{s}"
+        if p in local_subject_dirs:
+            if p in local_with_eeg:
                 downloaded.append(s)
             else:
                 empty_or_no_eeg_files.append(s)
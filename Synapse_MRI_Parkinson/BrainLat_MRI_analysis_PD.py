@@ -5,9 +5,14 @@ Robust analysis script for BrainLat MRI demographic and cognitive data.
 Focuses on PD vs CN classification with complete data validation.
 """
 
-import pandas as pd
-import numpy as np
+import sys
 from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from brainlat_tables import load_table
 
 # Display settings
 pd.set_option('display.max_columns', None)
@@ -31,17 +36,20 @@ def print_subsection(title):
 print_section("BRAINLAT DATASET - COMPREHENSIVE CSV ANALYSIS", 100)
 print(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
+# Typed frames from the shared table cache: canonical column names (id_mri,
+# age, ...), diagnosis/country/sex as categoricals, country from the MRI id.
+# Compared with reading the raw CSVs, Part 1 therefore lists the canonical
+# names (MRI_ID -> id_mri, EEG_ID -> id_eeg, Age -> age), the cognition table
+# has a derived country column too (23 -> 24 columns), and blank-only ids
+# count as missing (EEG_ID missing 656 -> 657 for one ' ' cell).
 try:
-    demographic = pd.read_csv('BrainLat_Demographic_MRI.csv')
-    cognition = pd.read_csv('BrainLat_Cognition_MRI.csv')
+    demographic = load_table('mri_demographic')
+    cognition = load_table('mri_cognition')
     print("\nSuccessfully loaded both CSV files")
 except FileNotFoundError as e:
     print(f"\nERROR: {e}")
     exit(1)
 
-# Extract country code from MRI_ID
-demographic['country'] = demographic['MRI_ID'].str.extract(r'sub-([A-Z]+)')[0]
-
 # ============================================================================
 # PART 1: FILE STRUCTURE & DATA INTEGRITY
 # ============================================================================
@@ -61,8 +69,8 @@ for col, count in missing_demo.items():
     pct = (count / len(demographic) * 100)
     print(f"      {col:<20} {count:>4} ({pct:>5.1f}%)")
 
-print(f"\n   Duplicate MRI_IDs: {demographic['MRI_ID'].duplicated().sum()}")
-print(f"   Unique subjects: {demographic['MRI_ID'].nunique()}")
+print(f"\n   Duplicate MRI_IDs: {demographic['id_mri'].duplicated().sum()}")
+print(f"   Unique subjects: {demographic['id_mri'].nunique()}")
 
 print_subsection("1.2 Cognition File (BrainLat_Cognition_MRI.csv)")
 print(f"   Rows: {len(cognition):,}")
@@ -80,8 +88,8 @@ print(f"      • Mini-SEA (Social-Emotional Assessment)")
 print(f"        - FER, ToM, Emotion Recognition")
 print(f"        - Missing: {cognition['mini_sea_fer'].isnull().sum()} / {len(cognition)} ({cognition['mini_sea_fer'].isnull().sum()/len(cognition)*100:.1f}%)")
 
-print(f"\n   Duplicate MRI_IDs: {cognition['MRI_ID'].duplicated().sum()}")
-print(f"   Unique subjects: {cognition['MRI_ID'].nunique()}")
+print(f"\n   Duplicate MRI_IDs: {cognition['id_mri'].duplicated().sum()}")
+print(f"   Unique subjects: {cognition['id_mri'].nunique()}")
 
 # ============================================================================
 # PART 2: DIAGNOSIS DISTRIBUTION
@@ -96,11 +104,12 @@ for dx, count in diag_counts.items():
     print(f"   {dx:<6} {count:>3} subjects ({pct:>5.1f}%)")
 
 print_subsection("2.2 Age Distribution by Diagnosis")
-age_by_dx = demographic.groupby('diagnosis')['Age'].describe()
+age_by_dx = demographic.groupby('diagnosis', observed=True)['age'].describe()
 print(age_by_dx)
 
 print_subsection("2.3 Sex Distribution by Diagnosis")
-sex_by_dx = demographic.groupby('diagnosis')['sex'].agg(['count', 'sum', 'mean'])
+sex_by_dx = demographic['sex'].astype(float).groupby(demographic['diagnosis'], observed=True).agg(['count', 'sum', 'mean'])
+sex_by_dx = sex_by_dx.astype({'count': int, 'sum': int})
 sex_by_dx.columns = ['Total', 'N_Male', 'Pct_Male']
 sex_by_dx['Pct_Male'] = sex_by_dx['Pct_Male'] * 100
 sex_by_dx['N_Female'] = sex_by_dx['Total'] - sex_by_dx['N_Male']
@@ -124,9 +133,9 @@ print(f"   - Class ratio: 1:{n_cn/n_pd:.1f} (PD:CN)")
 print_subsection("3.1 Demographics Comparison")
 for dx in ['PD', 'CN']:
     dx_data = pd_cn[pd_cn['diagnosis'] == dx]
-    age_data = dx_data['Age'].dropna()
+    age_data = dx_data['age'].dropna()
     edu_data = dx_data['years_education'].dropna()
-    n_male = dx_data['sex'].sum()
+    n_male = int((dx_data['sex'] == 1).sum())
     n_total = len(dx_data)
     
     print(f"\n   {dx}:")
@@ -137,8 +146,8 @@ for dx in ['PD', 'CN']:
 
 print_subsection("3.2 Cognitive Scores (PD vs CN)")
 # Merge with cognition data
-pd_cn_merged = pd.merge(pd_cn, cognition[['MRI_ID', 'moca_total', 'ifs_total_score']], 
-                         on='MRI_ID', how='left')
+pd_cn_merged = pd.merge(pd_cn, cognition[['id_mri', 'moca_total', 'ifs_total_score']], 
+                         on='id_mri', how='left')
 
 print("\n   MoCA Scores (Max: 30, Cutoff: <26 indicates impairment):")
 for dx in ['PD', 'CN']:
@@ -159,7 +168,7 @@ for dx in ['PD', 'CN']:
         print(f"      {dx}: No data available")
 
 print_subsection("3.3 Recruitment Sites (PD+CN)")
-site_dist = pd_cn.groupby(['country', 'diagnosis']).size().unstack(fill_value=0)
+site_dist = pd_cn.astype({'country': object, 'diagnosis': object}).groupby(['country', 'diagnosis']).size().unstack(fill_value=0)
 site_dist['Total'] = site_dist.sum(axis=1)
 site_dist.loc['TOTAL'] = site_dist.sum()
 print("\n" + str(site_dist))
@@ -181,11 +190,11 @@ print_subsection("4.1 Available Data for PD+CN Subjects")
 print(f"\n   Total PD+CN subjects: {len(pd_cn_merged)}")
 
 # Check completeness
-has_demo = pd_cn_merged[['Age', 'sex', 'years_education']].notna().all(axis=1).sum()
+has_demo = pd_cn_merged[['age', 'sex', 'years_education']].notna().all(axis=1).sum()
 has_moca = pd_cn_merged['moca_total'].notna().sum()
 has_ifs = pd_cn_merged['ifs_total_score'].notna().sum()
 has_both_cog = (pd_cn_merged[['moca_total', 'ifs_total_score']].notna().all(axis=1)).sum()
-has_all = pd_cn_merged[['Age', 'sex', 'years_education', 'moca_total', 'ifs_total_score']].notna().all(axis=1).sum()
+has_all = pd_cn_merged[['age', 'sex', 'years_education', 'moca_total', 'ifs_total_score']].notna().all(axis=1).sum()
 
 print(f"\n   Demographics only:")
 print(f"      Complete (Age, Sex, Education): {has_demo} / {len(pd_cn_merged)} ({has_demo/len(pd_cn_merged)*100:.1f}%)")
@@ -201,7 +210,7 @@ print(f"      All data (Demo + MoCA + IFS): {has_all} / {len(pd_cn_merged)} ({ha
 print_subsection("4.2 Completeness by Diagnosis")
 for dx in ['PD', 'CN']:
     dx_data = pd_cn_merged[pd_cn_merged['diagnosis'] == dx]
-    dx_complete = dx_data[['Age', 'sex', 'years_education', 'moca_total', 'ifs_total_score']].notna().all(axis=1).sum()
+    dx_complete = dx_data[['age', 'sex', 'years_education', 'moca_total', 'ifs_total_score']].notna().all(axis=1).sum()
     print(f"\n   {dx}:")
     print(f"      Total: {len(dx_data)}")
     print(f"      Complete: {dx_complete} ({dx_complete/len(dx_data)*100:.1f}%)")
@@ -215,15 +224,15 @@ print_section("PART 5: DATA VALIDATION")
 print_subsection("5.1 Quality Checks")
 
 # Check 1: Age range validity
-age_issues = demographic[(demographic['Age'] < 20) | (demographic['Age'] > 100)]
+age_issues = demographic[(demographic['age'] < 20) | (demographic['age'] > 100)]
 print(f"   -> Suspicious age values (< 20 or > 100): {len(age_issues)}")
 if len(age_issues) > 0:
     print(f"     Warning: Found {len(age_issues)} subjects with unusual ages")
 
 # Check 2: Sex values
-sex_values = demographic['sex'].unique()
+sex_values = demographic['sex'].dropna().unique().tolist()
 print(f"   -> Sex values: {sorted(sex_values)} (0=Female, 1=Male)")
-if not set(sex_values).issubset({0, 1, np.nan}):
+if not set(sex_values).issubset({0, 1}):
     print(f"     Warning: Unexpected sex values found")
 
 # Check 3: Education range
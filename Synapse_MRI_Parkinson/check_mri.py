@@ -1,7 +1,14 @@
+import os
 import sys
-import pandas as pd
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from dataset_inventory import RACY_WINDOW_S, open_inventory
+
 # =========================
 # CONFIG (no arguments)
 # =========================
@@ -11,18 +18,125 @@ DEMO_CSV = BASE_DIR / "BrainLat_Demographic_MRI.csv"
 
 OUT_CSV = BASE_DIR / "mri_modality_availability.csv"
 
+SCAN_MODE = "inventory"   # "inventory" = query the shared index, "probe" = direct parallel probe
+INVENTORY_MODE = "incremental"   # how to refresh the MRI_data index: "reuse" | "incremental" | "full"
+PROBE_WORKERS = 16   # threads for the probe; I/O bound, so more than cores helps on network storage
+
+MODALITIES = ("anat", "dwi", "func")
+TABLE_COLUMNS = ["site", "subject"] + [f"has_{m}_dir" for m in MODALITIES] + [f"has_{m}_nifti" for m in MODALITIES]
+
 # Detect NIfTI files: .nii or .nii.gz
-def has_nifti(folder: Path) -> bool:
-    if not folder.exists() or not folder.is_dir():
-        return False
-    for p in folder.rglob("*"):
-        if not p.is_file():
+def has_nifti(folder) -> bool:
+    """True at the first NIfTI under `folder`.
+
+    Walks with os.scandir and decides from the DirEntry name and type, so no
+    per-file stat is issued and the walk stops at the first match.
+    """
+    stack = [folder]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
             continue
-        name = p.name.lower()
-        if name.endswith(".nii") or name.endswith(".nii.gz"):
-            return True
+        with it:
+            for entry in it:
+                name = entry.name.lower()
+                if (name.endswith(".nii") or name.endswith(".nii.gz")) and entry.is_file():
+                    return True
+                # symlinked dirs are not followed (like rglob), so link cycles cannot loop
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
     return False
 
+def probe_subject(site: str, subj_path: str, subject: str):
+    """Modality flags for one subject dir; returns (row, start, end) timestamps."""
+    t0 = time.perf_counter()
+    with os.scandir(subj_path) as it:
+        present = {e.name: e.path for e in it if e.is_dir()}
+    row = {"site": site, "subject": subject}
+    for m in MODALITIES:
+        row[f"has_{m}_dir"] = m in present
+    for m in MODALITIES:
+        row[f"has_{m}_nifti"] = m in present and has_nifti(present[m])
+    return row, t0, time.perf_counter()
+
+def probe_rows(mri_root: Path, workers: int = PROBE_WORKERS):
+    """Probe every MRI_data/<SITE>/<SUBJECT>/ concurrently; returns (rows, per-site timings)."""
+    jobs = []
+    with os.scandir(mri_root) as sites:
+        for site_entry in sites:
+            if not site_entry.is_dir():
+                continue
+            with os.scandir(site_entry.path) as subjects:
+                for e in subjects:
+                    if e.is_dir() and e.name.lower().startswith("sub-"):
+                        jobs.append((site_entry.name, e.path, e.name))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda j: probe_subject(*j), jobs))
+
+    timings = {}
+    for row, t0, t1 in results:
+        t = timings.setdefault(row["site"], {"subjects": 0, "start": t0, "end": t1, "busy": 0.0})
+        t["subjects"] += 1
+        t["start"] = min(t["start"], t0)
+        t["end"] = max(t["end"], t1)
+        t["busy"] += t1 - t0
+    rows = sorted((r for r, _, _ in results), key=lambda r: (r["site"], r["subject"]))
+    return rows, timings
+
+def availability_rows(inv, only=None):
+    """Per-subject modality flags from the inventory (optionally only for `only` subject dirs)."""
+    mod_dirs = inv.modality_dirs()
+    with_nifti = {m: inv.subjects_with(("nifti",), modality=m) for m in MODALITIES}
+
+    rows = []
+    for d in inv.subject_dirs():
+        if d["depth"] != 2:
+            continue
+        if only is not None and d["path"] not in only:
+            continue
+        row = {"site": d["site"], "subject": d["subject"]}
+        for m in MODALITIES:
+            row[f"has_{m}_dir"] = (d["path"], m) in mod_dirs
+        for m in MODALITIES:
+            row[f"has_{m}_nifti"] = d["path"] in with_nifti[m]
+        rows.append(row)
+    return rows
+
+def table_from_inventory():
+    """Availability table from the inventory; returns (df, scan note)."""
+    inv = open_inventory(MRI_ROOT, mode=INVENTORY_MODE)
+    upd = inv.last_update
+
+    if upd is not None and not upd["full"] and OUT_CSV.exists():
+        # Incremental: recompute only the subjects that may differ from the
+        # previously saved table and merge them in. The index is shared with
+        # other scripts, so this run's rescan alone is not enough: also take
+        # subjects added/removed since the CSV was written, and subjects with
+        # a directory modified after it (minus the racy window).
+        prev = pd.read_csv(OUT_CSV, dtype={"site": str, "subject": str})[TABLE_COLUMNS]
+        prev_keys = set(prev["site"] + "/" + prev["subject"])
+        current = {d["path"] for d in inv.subject_dirs() if d["depth"] == 2}
+        since_ns = int((OUT_CSV.stat().st_mtime - RACY_WINDOW_S) * 1e9)
+        touched = {r["subject_dir"] for r in inv.query(
+            "SELECT DISTINCT subject_dir FROM dirs WHERE subject_dir != '' AND mtime_ns >= ?", (since_ns,))}
+        affected = inv.changed_subjects() | (prev_keys ^ current) | touched
+        keep = prev[~(prev["site"] + "/" + prev["subject"]).isin(affected)]
+        fresh = pd.DataFrame(availability_rows(inv, only=affected), columns=TABLE_COLUMNS)
+        df = pd.concat([keep, fresh], ignore_index=True)
+        df = df.sort_values(["site", "subject"], ignore_index=True)
+        scan_note = (f"incremental ({len(upd['changed'])} dirs re-listed, "
+                     f"{len(affected)} subjects refreshed, {upd['elapsed']:.2f}s)")
+    else:
+        df = pd.DataFrame(availability_rows(inv), columns=TABLE_COLUMNS)
+        if upd is None:
+            scan_note = "index reused (no rescan)"
+        else:
+            scan_note = "full" if upd["full"] else "full table (no previous CSV)"
+    inv.close()
+    return df, scan_note
+
 def main():
     if not MRI_ROOT.exists():
         print("ERROR: MRI_data not found at:", MRI_ROOT)
@@ -41,43 +155,17 @@ def main():
     demo["diagnosis"] = demo["diagnosis"].astype(str).str.strip()
 
     # Collect subject dirs that match pattern MRI_data/<SITE>/<SUBJECT>/
-    rows = []
-    seen = set()
-
-    # site folders are immediate children of MRI_data (AR, CLB, COA, ...)
-    for site_dir in MRI_ROOT.iterdir():
-        if not site_dir.is_dir():
-            continue
-        site = site_dir.name
+    # from the inventory index (one scandir walk, shared with the other checks)
+    # or, in probe mode, by probing subjects concurrently
+    timings = None
+    if SCAN_MODE == "probe":
+        t0 = time.perf_counter()
+        rows, timings = probe_rows(MRI_ROOT)
+        df = pd.DataFrame(rows, columns=TABLE_COLUMNS)
+        scan_note = f"parallel probe ({PROBE_WORKERS} threads, {time.perf_counter() - t0:.2f}s)"
+    else:
+        df, scan_note = table_from_inventory()
 
-        for subj_dir in site_dir.iterdir():
-            if not subj_dir.is_dir():
-                continue
-            subject = subj_dir.name
-            if not subject.lower().startswith("sub-"):
-                continue
-
-            key = (site, subject)
-            if key in seen:
-                continue
-            seen.add(key)
-
-            anat_dir = subj_dir / "anat"
-            dwi_dir = subj_dir / "dwi"
-            func_dir = subj_dir / "func"
-
-            rows.append({
-                "site": site,
-                "subject": subject,
-                "has_anat_dir": anat_dir.exists(),
-                "has_dwi_dir": dwi_dir.exists(),
-                "has_func_dir": func_dir.exists(),
-                "has_anat_nifti": has_nifti(anat_dir),
-                "has_dwi_nifti": has_nifti(dwi_dir),
-                "has_func_nifti": has_nifti(func_dir),
-            })
-
-    df = pd.DataFrame(rows)
     df = df.merge(demo[["MRI_ID", "diagnosis"]], left_on="subject", right_on="MRI_ID", how="left")
 
     # Save full table
@@ -97,6 +185,12 @@ def main():
     print("Base dir :", BASE_DIR)
     print("MRI root :", MRI_ROOT)
     print("Demo CSV :", DEMO_CSV)
+    print("Scan     :", scan_note)
+    if timings:
+        for site, t in sorted(timings.items()):
+            wall = t["end"] - t["start"]
+            print(f"  {site:<6} subjects={t['subjects']:>4}  wall={wall:6.2f}s  "
+                  f"serial-equivalent={t['busy']:6.2f}s")
     print("=" * 90)
 
     # Use nifti-based availability as the meaningful metric
@@ -1,23 +1,17 @@
 import os
-from collections import Counter
+import sys
 
-BASE_DIR = os.path.join(os.path.dirname(__file__), "MRI_data")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_inventory import open_inventory
 
-def ext_key(filename: str) -> str:
-    name = filename.lower()
-    if name.endswith(".nii.gz"):
-        return ".nii.gz"
-    ext = os.path.splitext(name)[1].lower()
-    return ext if ext else "[no extension]"
+BASE_DIR = os.path.join(os.path.dirname(__file__), "MRI_data")
+INVENTORY_MODE = "incremental"   # how to refresh the MRI_data index: "reuse" | "incremental" | "full"
 
 def main():
-    counts = Counter()
-    total_files = 0
-
-    for root, _, files in os.walk(BASE_DIR):
-        for fn in files:
-            counts[ext_key(fn)] += 1
-            total_files += 1
+    inv = open_inventory(BASE_DIR, mode=INVENTORY_MODE)
+    counts = inv.ext_counts()
+    total_files = sum(counts.values())
+    inv.close()
 
     print(f"Scanning: {BASE_DIR}\n")
     print(f"Total files: {total_files}\n")
@@ -1,7 +1,11 @@
-import shutil
+import sys
+from collections import Counter
 from pathlib import Path
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from classified_view import format_methods, materialize_tree, prune_view
+
 # =========================
 # CONFIG (no arguments)
 # =========================
@@ -10,6 +14,11 @@ ANAT_ROOT = BASE_DIR / "MRI_ANAT"
 DEMO_CSV  = BASE_DIR / "BrainLat_Demographic_MRI.csv"
 OUT_ROOT  = BASE_DIR / "MRI_ANAT_CLASSIFIED"
 
+# "auto" = reflink -> hardlink -> symlink -> copy per file (no extra disk when links work)
+# "copytree" = full physical copy as before
+VIEW_MODE = "auto"
+PRUNE_STALE = False  # drop link views of subjects whose label changed or who left PD/CN
+
 def main():
     if not ANAT_ROOT.exists():
         print("ERROR: MRI_ANAT not found:", ANAT_ROOT)
@@ -36,6 +45,8 @@ def main():
     copied_cn = 0
     skipped_no_label = 0
     skipped_not_found = 0
+    methods = Counter()
+    expected = {"PD": set(), "CN": set()}
 
     for site_dir in ANAT_ROOT.iterdir():
         if not site_dir.is_dir():
@@ -61,19 +72,23 @@ def main():
 
             dest_subject_name = f"{site}_{subject}"  # avoid collisions across sites
             dest = OUT_ROOT / label / dest_subject_name / "anat"
+            expected[label].add(dest_subject_name)
 
             if dest.exists():
                 # already copied
                 continue
 
-            dest.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copytree(anat_dir, dest)
+            methods += materialize_tree(anat_dir, dest, mode=VIEW_MODE)
 
             if label == "PD":
                 copied_pd += 1
             else:
                 copied_cn += 1
 
+    pruned = 0
+    if PRUNE_STALE:
+        pruned = sum(prune_view(OUT_ROOT / label, names) for label, names in expected.items())
+
     print("=" * 90)
     print("ANAT PD/CN CLASSIFICATION COPY COMPLETE")
     print("Source :", ANAT_ROOT)
@@ -83,6 +98,8 @@ def main():
     print("Copied CN:", copied_cn)
     print("Skipped (no label / not PD-CN):", skipped_no_label)
     print("Skipped (no anat folder found):", skipped_not_found)
+    print("Removed stale (reclassified):", pruned)
+    print("Files placed via:", format_methods(methods))
     print("=" * 90)
 
 if __name__ == "__main__":
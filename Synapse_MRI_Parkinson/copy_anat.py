@@ -1,6 +1,10 @@
-import shutil
+import sys
+from collections import Counter
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from classified_view import format_methods, materialize_tree
+
 # =========================
 # CONFIG (edit only if needed)
 # =========================
@@ -8,11 +12,16 @@ BASE_DIR = Path(r"D:\Datasets\Synapse\Synapse_MRI_Parkinson").resolve()
 MRI_ROOT = BASE_DIR / "MRI_data"
 OUT_ROOT = BASE_DIR / "MRI_ANAT"
 
+# "auto" = reflink -> hardlink -> symlink -> copy per file (no extra disk when links work)
+# "copytree" = full physical copy as before
+VIEW_MODE = "auto"
+
 def main():
     OUT_ROOT.mkdir(exist_ok=True)
 
     copied = 0
     skipped = 0
+    methods = Counter()
 
     for site_dir in MRI_ROOT.iterdir():
         if not site_dir.is_dir():
@@ -36,8 +45,7 @@ def main():
                 # already copied
                 continue
 
-            dest.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copytree(anat_dir, dest)
+            methods += materialize_tree(anat_dir, dest, mode=VIEW_MODE)
 
             copied += 1
 
@@ -47,6 +55,7 @@ def main():
     print("Target :", OUT_ROOT)
     print("Subjects copied :", copied)
     print("Subjects skipped (no anat) :", skipped)
+    print("Files placed via :", format_methods(methods))
     print("=" * 80)
 
 if __name__ == "__main__":
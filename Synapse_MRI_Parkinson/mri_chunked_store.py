@@ -0,0 +1,366 @@
+"""
+Chunked volume store for MRI_ANAT_CLASSIFIED
+============================================
+Rewrites every T1 under MRI_ANAT_CLASSIFIED/{PD,CN}/<SITE>_<subject>/anat
+into one chunked, compressed array store, so a slice or patch only
+decompresses the few chunks it overlaps instead of the whole .nii.gz.
+
+The store uses the Zarr v2 layout (a directory per array with .zarray and
+.zattrs, one file per chunk, and a consolidated .zmetadata index at the
+root). The zarr package can open it directly, but neither zarr nor anything
+else beyond numpy is needed to write or read it here. Chunks are compressed
+with Blosc/LZ4 when numcodecs is installed, and with zlib level 1 otherwise.
+Chunks that hold only background (fill value) are not written at all.
+
+The batch runs on a process pool and can be restarted. Each array is built
+in a ".partial" folder and renamed into place when complete. Arrays whose
+source size and mtime are unchanged are skipped.
+
+Reading:
+    store = ChunkedStore(STORE_ROOT)
+    vol = store["PD/AR_sub-AR00401/anat/sub-AR00401_T1w"]
+    axial = vol[:, :, 90]           # reads one z-layer of chunks
+    patch = vol[64:96, 64:96, 64:96]
+"""
+
+import json
+import math
+import os
+import shutil
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+
+from nifti_header_scan import read_volume
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from dataset_inventory import MRI_IMAGE_KINDS, open_inventory
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+MRI_ROOT = Path(r"D:\Datasets\Synapse\Synapse_MRI_Parkinson\MRI_ANAT_CLASSIFIED").resolve()
+STORE_ROOT = MRI_ROOT.parent / "MRI_ANAT_CLASSIFIED.zarr"
+INVENTORY_MODE = "incremental"   # how to refresh the index: "reuse" | "incremental" | "full"
+CHUNKS = (64, 64, 64)
+WORKERS = max(1, (os.cpu_count() or 2) - 1)
+PARTIAL_SUFFIX = ".partial"
+
+# ── Codecs ───────────────────────────────────────────────────────────────────
+
+def default_compressor() -> dict:
+    """Blosc/LZ4 with byte shuffle if numcodecs is available, else zlib level 1."""
+    try:
+        import numcodecs  # noqa: F401
+    except ImportError:
+        return {"id": "zlib", "level": 1}
+    return {"id": "blosc", "cname": "lz4", "clevel": 5, "shuffle": 1, "blocksize": 0}
+
+
+def _codec(config: dict):
+    if config is None:
+        return None
+    if config["id"] == "zlib":
+        return None   # handled inline, no dependency
+    from numcodecs import get_codec
+    return get_codec(config)
+
+
+def encode_chunk(buf: bytes, config: dict) -> bytes:
+    if config is None:
+        return buf
+    if config["id"] == "zlib":
+        return zlib.compress(buf, config.get("level", 1))
+    return _codec(config).encode(buf)
+
+
+def decode_chunk(buf: bytes, config: dict) -> bytes:
+    if config is None:
+        return buf
+    if config["id"] == "zlib":
+        return zlib.decompress(buf)
+    return bytes(_codec(config).decode(buf))
+
+# ── Writing ──────────────────────────────────────────────────────────────────
+
+def _read_json(path: Path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json(path: Path, obj):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2)
+
+
+def write_array(dest: Path, data: np.ndarray, chunks=CHUNKS, compressor=None,
+                attrs=None, fill_value=0) -> dict:
+    """Write `data` as a Zarr v2 array at `dest` (via a .partial folder); returns stats."""
+    dest = Path(dest)
+    compressor = compressor if compressor is not None else default_compressor()
+    chunks = tuple(min(c, s) for c, s in zip(chunks, data.shape)) + data.shape[len(chunks):]
+    tmp = dest.with_name(dest.name + PARTIAL_SUFFIX)
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    data = np.ascontiguousarray(data)
+    grid = [math.ceil(s / c) for s, c in zip(data.shape, chunks)]
+    written = raw = stored = 0
+    for idx in product(*(range(g) for g in grid)):
+        sl = tuple(slice(i * c, min((i + 1) * c, s)) for i, c, s in zip(idx, chunks, data.shape))
+        block = data[sl]
+        if (block == fill_value).all():
+            continue   # all background: left out, reads back as fill_value
+        if block.shape != chunks:
+            padded = np.full(chunks, fill_value, dtype=data.dtype)
+            padded[tuple(slice(0, n) for n in block.shape)] = block
+            block = padded
+        buf = np.ascontiguousarray(block).tobytes()
+        enc = encode_chunk(buf, compressor)
+        with open(tmp / ".".join(map(str, idx)), "wb") as f:
+            f.write(enc)
+        written += 1
+        raw += len(buf)
+        stored += len(enc)
+
+    _write_json(tmp / ".zarray", {
+        "zarr_format": 2, "shape": list(data.shape), "chunks": list(chunks),
+        "dtype": data.dtype.str, "compressor": compressor, "fill_value": fill_value,
+        "order": "C", "filters": None, "dimension_separator": ".",
+    })
+    _write_json(tmp / ".zattrs", attrs or {})
+    if dest.exists():
+        shutil.rmtree(dest)
+    os.replace(tmp, dest)
+    return {"chunks_total": math.prod(grid), "chunks_written": written,
+            "raw_bytes": raw, "stored_bytes": stored}
+
+
+def _ensure_groups(store_root: Path, name: str):
+    """Write .zgroup files for the store root and every parent group of `name`."""
+    path = store_root
+    for part in [""] + name.split("/")[:-1]:
+        path = path / part if part else path
+        path.mkdir(parents=True, exist_ok=True)
+        if not (path / ".zgroup").exists():
+            _write_json(path / ".zgroup", {"zarr_format": 2})
+
+
+def consolidate(store_root: Path) -> int:
+    """Rebuild the consolidated .zmetadata index; returns the number of arrays."""
+    store_root = Path(store_root)
+    meta, n_arrays = {}, 0
+    for root, dirs, files in os.walk(store_root):
+        dirs[:] = sorted(d for d in dirs if not d.endswith(PARTIAL_SUFFIX))
+        rel = Path(root).relative_to(store_root).as_posix()
+        for name in (".zgroup", ".zarray", ".zattrs"):
+            if name in files:
+                key = name if rel == "." else f"{rel}/{name}"
+                meta[key] = _read_json(Path(root) / name)
+        if ".zarray" in files:
+            n_arrays += 1
+            dirs[:] = []   # chunks only below an array
+    _write_json(store_root / ".zmetadata", {"zarr_consolidated_format": 1, "metadata": meta})
+    return n_arrays
+
+
+def array_name(rel: str) -> str:
+    """'PD/AR_sub-1/anat/sub-1_T1w.nii.gz' -> 'PD/AR_sub-1/anat/sub-1_T1w'"""
+    for ext in (".nii.gz", ".nii", ".gz"):
+        if rel.lower().endswith(ext):
+            return rel[: -len(ext)]
+    return rel
+
+
+def source_stamp(path: Path) -> dict:
+    st = Path(path).stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def is_converted(store_root: Path, name: str, src: Path) -> bool:
+    attrs = Path(store_root) / name / ".zattrs"
+    if not attrs.exists() or not (attrs.parent / ".zarray").exists():
+        return False
+    return _read_json(attrs).get("source_stamp") == source_stamp(src)
+
+
+def convert_scan(src: Path, rel: str, store_root: Path, chunks=CHUNKS) -> dict:
+    """Worker: NIfTI -> chunked array (runs in a separate process)."""
+    t0 = time.perf_counter()
+    hdr, data = read_volume(src)
+    parts = rel.split("/")
+    site, subject = parts[1].split("_", 1) if len(parts) > 1 and "_" in parts[1] else ("", "")
+    attrs = {
+        "source": rel, "source_stamp": source_stamp(src),
+        "label": parts[0], "site": site, "subject": subject,
+        "affine": hdr.affine, "pixdim": list(hdr.pixdim), "orientation": hdr.orientation,
+        "nifti_dtype": hdr.dtype_name, "axes": ["x", "y", "z", "t"][: data.ndim],
+    }
+    stats = write_array(Path(store_root) / array_name(rel), data, chunks, attrs=attrs)
+    stats["elapsed"] = time.perf_counter() - t0
+    return stats
+
+# ── Reading ──────────────────────────────────────────────────────────────────
+
+class ChunkedArray:
+    """Read-only view of one array; indexing decompresses only the chunks it touches."""
+
+    def __init__(self, path: Path, meta: dict = None, attrs: dict = None):
+        self.path = Path(path)
+        if meta is None:
+            meta = _read_json(self.path / ".zarray")
+        if attrs is None:
+            attrs = _read_json(self.path / ".zattrs") if (self.path / ".zattrs").exists() else {}
+        self.shape = tuple(meta["shape"])
+        self.chunks = tuple(meta["chunks"])
+        self.dtype = np.dtype(meta["dtype"])
+        self.compressor = meta.get("compressor")
+        self.fill_value = meta.get("fill_value") or 0
+        self.sep = meta.get("dimension_separator", ".")
+        self.attrs = attrs
+        self.chunks_read = 0
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    def read_chunk(self, idx) -> np.ndarray:
+        path = self.path / self.sep.join(map(str, idx))
+        try:
+            with open(path, "rb") as f:
+                buf = decode_chunk(f.read(), self.compressor)
+        except FileNotFoundError:
+            return np.full(self.chunks, self.fill_value, dtype=self.dtype)
+        self.chunks_read += 1
+        return np.frombuffer(buf, dtype=self.dtype).reshape(self.chunks)
+
+    def _normalize(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if Ellipsis in key:
+            i = key.index(Ellipsis)
+            key = key[:i] + (slice(None),) * (self.ndim - len(key) + 1) + key[i + 1:]
+        key = key + (slice(None),) * (self.ndim - len(key))
+        out, squeeze = [], []
+        for axis, (k, n) in enumerate(zip(key, self.shape)):
+            if isinstance(k, (int, np.integer)):
+                k = int(k) + n if k < 0 else int(k)
+                if not 0 <= k < n:
+                    raise IndexError(f"index {k} out of range for axis {axis} of size {n}")
+                out.append(slice(k, k + 1, 1))
+                squeeze.append(axis)
+            elif isinstance(k, slice):
+                out.append(slice(*k.indices(n)))
+            else:
+                raise TypeError("only integers and slices are supported")
+        return out, tuple(squeeze)
+
+    def __getitem__(self, key) -> np.ndarray:
+        sel, squeeze = self._normalize(key)
+        if any(s.step <= 0 for s in sel):
+            raise ValueError("only positive slice steps are supported")
+        # contiguous bounding box first, the step is applied at the end
+        starts = [s.start for s in sel]
+        stops = [max(s.start, s.stop) for s in sel]
+        out = np.full([b - a for a, b in zip(starts, stops)], self.fill_value, dtype=self.dtype)
+        ranges = [range(a // c, (b - 1) // c + 1) if b > a else range(0)
+                  for a, b, c in zip(starts, stops, self.chunks)]
+        for idx in product(*ranges):
+            block = self.read_chunk(idx)
+            src, dst = [], []
+            for i, c, a, b in zip(idx, self.chunks, starts, stops):
+                lo, hi = max(a, i * c), min(b, (i + 1) * c)
+                src.append(slice(lo - i * c, hi - i * c))
+                dst.append(slice(lo - a, hi - a))
+            out[tuple(dst)] = block[tuple(src)]
+        out = out[tuple(slice(None, None, s.step) for s in sel)]
+        return out.squeeze(axis=squeeze) if squeeze else out
+
+    def read(self) -> np.ndarray:
+        return self[...]
+
+
+class ChunkedStore:
+    """All arrays of a store, described by the consolidated .zmetadata index."""
+
+    def __init__(self, root: Path = STORE_ROOT):
+        self.root = Path(root)
+        self.meta = _read_json(self.root / ".zmetadata")["metadata"]
+        self.names = sorted(k[: -len("/.zarray")] for k in self.meta if k.endswith("/.zarray"))
+
+    def __contains__(self, name: str) -> bool:
+        return f"{name}/.zarray" in self.meta
+
+    def __getitem__(self, name: str) -> ChunkedArray:
+        if name not in self:
+            raise KeyError(name)
+        return ChunkedArray(self.root / name, self.meta[f"{name}/.zarray"],
+                            self.meta.get(f"{name}/.zattrs", {}))
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+# ── Batch ────────────────────────────────────────────────────────────────────
+
+def main():
+    if not MRI_ROOT.exists():
+        print("ERROR: MRI_ANAT_CLASSIFIED not found:", MRI_ROOT)
+        return
+
+    inv = open_inventory(MRI_ROOT, mode=INVENTORY_MODE)
+    rels = [r["path"] for r in inv.files(kinds=MRI_IMAGE_KINDS)]
+    inv.close()
+
+    STORE_ROOT.mkdir(parents=True, exist_ok=True)
+    todo, skipped = [], 0
+    for rel in rels:
+        name = array_name(rel)
+        if is_converted(STORE_ROOT, name, MRI_ROOT / rel):
+            skipped += 1
+        else:
+            _ensure_groups(STORE_ROOT, name)
+            todo.append(rel)
+
+    print("=" * 90)
+    print(f"CHUNKED STORE CONVERSION -> {STORE_ROOT}")
+    print(f"Scans: {len(rels)} | already converted: {skipped} | to convert: {len(todo)} "
+          f"| codec: {default_compressor()['id']} | chunks: {CHUNKS}")
+    print("=" * 90)
+
+    t0 = time.perf_counter()
+    raw = stored = failed = 0
+    with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+        futures = {pool.submit(convert_scan, MRI_ROOT / rel, rel, STORE_ROOT): rel for rel in todo}
+        for fut in as_completed(futures):
+            rel = futures[fut]
+            try:
+                st = fut.result()
+            except Exception as e:
+                failed += 1
+                print(f"  [FAIL] {rel}: {e}")
+                continue
+            raw += st["raw_bytes"]
+            stored += st["stored_bytes"]
+            print(f"  Done: {rel}  ({st['chunks_written']}/{st['chunks_total']} chunks, "
+                  f"{st['elapsed']:.1f}s)")
+    elapsed = time.perf_counter() - t0
+
+    n_arrays = consolidate(STORE_ROOT)
+    ratio = raw / stored if stored else 0.0
+    print("-" * 90)
+    print(f"Converted: {len(todo) - failed} | failed: {failed} | {elapsed:.1f}s")
+    print(f"Written chunks: {raw / 1e6:.0f} MB raw -> {stored / 1e6:.0f} MB stored ({ratio:.1f}x)")
+    print(f"Consolidated index: {n_arrays} arrays in {STORE_ROOT / '.zmetadata'}")
+
+
+if __name__ == "__main__":
+    main()
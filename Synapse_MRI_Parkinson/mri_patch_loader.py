@@ -0,0 +1,301 @@
+"""
+Patch-sampling T1 loader for MRI_ANAT_CLASSIFIED/{PD,CN}
+========================================================
+Yields batches of random 3-D patches (MODE="patch") or 2-D slices
+(MODE="slice") from the PD/CN T1 scans without inflating every .nii.gz on
+every pass:
+
+  - each .nii.gz is decompressed once into VOLUME_CACHE as a plain .npy with
+    a .json stamp of its source; later reads map that file (np.load
+    mmap_mode="r"), so a patch only touches the pages it covers.
+    Uncompressed, unscaled .nii files are mapped in place.
+  - opened volumes sit in an LRU bounded by MAX_RESIDENT_MB; the least
+    recently used mapping is dropped when the budget is exceeded, which
+    caps resident memory whatever the cohort size
+  - batches are assembled by a thread pool, PREFETCH batches ahead of the
+    consumer (inflating and page faults release the GIL)
+
+Labels come from the PD/CN parent folder and site/subject from the
+<SITE>_<subject> folder name. Batches are (x float32, y int64 CN=0/PD=1,
+index into loader.items); loader.stats reports samples per second and cache
+hits. BALANCED draws PD and CN subjects equally often.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from nifti_header_scan import DATATYPES, read_header, read_volume
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from dataset_inventory import MRI_IMAGE_KINDS, open_inventory
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+MRI_ROOT = Path(r"D:\Datasets\Synapse\Synapse_MRI_Parkinson\MRI_ANAT_CLASSIFIED").resolve()
+VOLUME_CACHE = MRI_ROOT.parent / "MRI_ANAT_CLASSIFIED.volcache"
+INVENTORY_MODE = "incremental"   # how to refresh the index: "reuse" | "incremental" | "full"
+T1_PATTERN = "t1w"               # case-insensitive substring of the file name
+MODE = "patch"                   # "patch" (3-D) | "slice" (2-D, along SLICE_AXIS)
+PATCH = (64, 64, 64)
+SLICE_AXIS = 2
+BATCH_SIZE = 8
+BALANCED = True                  # draw PD and CN subjects equally often
+MAX_RESIDENT_MB = 2048           # LRU budget for opened volumes
+WORKERS = 4
+PREFETCH = 8
+SEED = 0
+BENCH_BATCHES = 100
+
+LABEL_CODES = {"CN": 0, "PD": 1}
+
+# ── Items ────────────────────────────────────────────────────────────────────
+
+def parse_item(rel: str) -> dict:
+    """PD/AR_sub-AR00401/anat/..._T1w.nii.gz -> label, site, subject."""
+    parts = rel.split("/")
+    site, subject = parts[1].split("_", 1) if len(parts) > 1 and "_" in parts[1] else ("", "")
+    return {"path": rel, "diagnosis": parts[0], "site": site, "subject": subject}
+
+
+def t1_items(root: Path = MRI_ROOT, mode: str = INVENTORY_MODE) -> list:
+    """One item per PD/CN subject (its first T1 by path)."""
+    inv = open_inventory(root, mode=mode)
+    rels = sorted(r["path"] for r in inv.files(kinds=MRI_IMAGE_KINDS)
+                  if r["grp"] in LABEL_CODES and T1_PATTERN in r["name"].lower())
+    inv.close()
+    items, seen = [], set()
+    for rel in rels:
+        item = parse_item(rel)
+        if (item["diagnosis"], item["site"], item["subject"]) not in seen:
+            seen.add((item["diagnosis"], item["site"], item["subject"]))
+            items.append(item)
+    return items
+
+# ── Decompressed volume cache ────────────────────────────────────────────────
+
+def _stamp(path: Path) -> dict:
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def cache_paths(cache_dir: Path, rel: str):
+    base = str(Path(cache_dir) / rel.replace("/", "__"))
+    return Path(base + ".npy"), Path(base + ".json")
+
+
+def map_in_place(path: Path):
+    """Memmap of a plain .nii (None if it is compressed, scaled or unusual)."""
+    hdr = read_header(path)
+    if (hdr.compressed or hdr.datatype not in DATATYPES or hdr.datatype == 128
+            or hdr.scl_slope not in (0.0, 1.0) or hdr.scl_inter):
+        return None
+    dtype = np.dtype(DATATYPES[hdr.datatype][0]).newbyteorder(hdr.endian)
+    return np.memmap(path, dtype=dtype, mode="r", offset=hdr.vox_offset, shape=hdr.dims, order="F")
+
+
+def decompressed(src: Path, rel: str, cache_dir: Path = VOLUME_CACHE):
+    """(volume memmap, was it (re)built) for one scan, inflating it at most once per change."""
+    vol = map_in_place(src)
+    if vol is None:
+        npy, meta = cache_paths(cache_dir, rel)
+        fresh = False
+        if npy.exists() and meta.exists():
+            with open(meta, encoding="utf-8") as f:
+                fresh = json.load(f).get("source_stamp") == _stamp(src)
+        if not fresh:
+            npy.parent.mkdir(parents=True, exist_ok=True)
+            data = read_volume(src)[1]
+            tmp = npy.with_name(f"{npy.stem}.{threading.get_ident()}.tmp.npy")
+            np.save(tmp, np.asarray(data))
+            os.replace(tmp, npy)
+            with open(meta, "w", encoding="utf-8") as f:
+                json.dump({"source": rel, "source_stamp": _stamp(src),
+                           "shape": list(data.shape), "dtype": str(data.dtype)}, f)
+        vol = np.load(npy, mmap_mode="r")
+        built = not fresh
+    else:
+        built = False
+    if vol.ndim > 3:
+        vol = vol[..., 0]   # first frame of 4-D scans
+    return vol, built
+
+
+class VolumeLRU:
+    """Thread-safe LRU of opened volumes with a byte budget."""
+
+    def __init__(self, root: Path, cache_dir: Path = VOLUME_CACHE, max_bytes: int = MAX_RESIDENT_MB * 1024 ** 2):
+        self.root = Path(root)
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._vols = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading = {}   # rel -> Event, so one thread inflates a scan
+        self.hits = self.misses = self.inflated = self.evicted = 0
+
+    @property
+    def resident_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, rel: str) -> np.ndarray:
+        while True:
+            with self._lock:
+                vol = self._vols.get(rel)
+                if vol is not None:
+                    self._vols.move_to_end(rel)
+                    self.hits += 1
+                    return vol
+                event = self._loading.get(rel)
+                if event is None:
+                    event = self._loading[rel] = threading.Event()
+                    self.misses += 1
+                    break
+            event.wait()
+        try:
+            vol, built = decompressed(self.root / rel, rel, self.cache_dir)
+            with self._lock:
+                self.inflated += built
+                self._vols[rel] = vol
+                self._bytes += vol.nbytes
+                while self._bytes > self.max_bytes and len(self._vols) > 1:
+                    _, old = self._vols.popitem(last=False)
+                    self._bytes -= old.nbytes
+                    self.evicted += 1
+            return vol
+        finally:
+            with self._lock:
+                self._loading.pop(rel).set()
+
+# ── Sampling ─────────────────────────────────────────────────────────────────
+
+def sample_patch(vol: np.ndarray, rng, patch=PATCH) -> np.ndarray:
+    """Random patch (zero-padded where the volume is smaller) as float32."""
+    out = np.zeros(patch, dtype=np.float32)
+    src, dst = [], []
+    for n, p in zip(vol.shape[:3], patch):
+        if n >= p:
+            s = int(rng.integers(0, n - p + 1))
+            src.append(slice(s, s + p))
+            dst.append(slice(0, p))
+        else:
+            o = (p - n) // 2
+            src.append(slice(0, n))
+            dst.append(slice(o, o + n))
+    out[tuple(dst)] = vol[tuple(src)]
+    return out
+
+
+def sample_slice(vol: np.ndarray, rng, axis: int = SLICE_AXIS, size=PATCH[:2]) -> np.ndarray:
+    """Random slice along `axis`, centre-cropped/padded to `size`."""
+    k = int(rng.integers(0, vol.shape[axis]))
+    plane = np.take(vol, k, axis=axis)
+    out = np.zeros(size, dtype=np.float32)
+    src, dst = [], []
+    for n, p in zip(plane.shape, size):
+        c = min(n, p)
+        src.append(slice((n - c) // 2, (n - c) // 2 + c))
+        dst.append(slice((p - c) // 2, (p - c) // 2 + c))
+    out[tuple(dst)] = plane[tuple(src)]
+    return out
+
+
+class PatchLoader:
+    """Endless iterator of (x, y, item index) batches; stop after as many as you need."""
+
+    def __init__(self, items: list, root: Path = MRI_ROOT, cache_dir: Path = VOLUME_CACHE,
+                 mode: str = MODE, patch=PATCH, slice_axis: int = SLICE_AXIS,
+                 batch_size: int = BATCH_SIZE, balanced: bool = BALANCED,
+                 max_resident_mb: float = MAX_RESIDENT_MB, workers: int = WORKERS,
+                 prefetch: int = PREFETCH, seed: int = SEED):
+        if mode not in ("patch", "slice"):
+            raise ValueError(f"unknown mode {mode!r}")
+        self.items = list(items)
+        self.labels = np.array([LABEL_CODES[it["diagnosis"]] for it in self.items], dtype=np.int64)
+        self.volumes = VolumeLRU(root, cache_dir, int(max_resident_mb * 1024 ** 2))
+        self.mode, self.patch, self.slice_axis = mode, tuple(patch), slice_axis
+        self.batch_size, self.workers, self.prefetch = batch_size, workers, prefetch
+        self.seed = seed
+        if balanced and len(set(self.labels.tolist())) > 1:
+            counts = np.bincount(self.labels, minlength=len(LABEL_CODES))
+            w = 1.0 / counts[self.labels]
+        else:
+            w = np.ones(len(self.items))
+        self.weights = w / w.sum()
+        self.stats = {"samples": 0, "batches": 0, "elapsed": 0.0}
+
+    @property
+    def samples_per_s(self) -> float:
+        return self.stats["samples"] / self.stats["elapsed"] if self.stats["elapsed"] else 0.0
+
+    def make_batch(self, seed) -> tuple:
+        rng = np.random.default_rng(seed)
+        idx = np.sort(rng.choice(len(self.items), self.batch_size, p=self.weights))
+        xs = []
+        for i in idx:   # sorted: repeated subjects hit the LRU back to back
+            vol = self.volumes.get(self.items[i]["path"])
+            if self.mode == "patch":
+                xs.append(sample_patch(vol, rng, self.patch))
+            else:
+                xs.append(sample_slice(vol, rng, self.slice_axis, self.patch[:2]))
+        order = rng.permutation(len(idx))
+        return np.stack(xs)[order], self.labels[idx][order], idx[order]
+
+    def __iter__(self):
+        seeds = np.random.SeedSequence(self.seed)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="patch") as pool:
+            pending = [pool.submit(self.make_batch, s) for s in seeds.spawn(self.prefetch)]
+            try:
+                while True:
+                    batch = pending.pop(0).result()
+                    pending.append(pool.submit(self.make_batch, seeds.spawn(1)[0]))
+                    self.stats["samples"] += len(batch[1])
+                    self.stats["batches"] += 1
+                    self.stats["elapsed"] = time.perf_counter() - t0
+                    yield batch
+            finally:
+                for fut in pending:
+                    fut.cancel()
+
+
+def main():
+    if not MRI_ROOT.exists():
+        print("ERROR: MRI_ANAT_CLASSIFIED not found:", MRI_ROOT)
+        return
+
+    items = t1_items()
+    loader = PatchLoader(items)
+    shape = PATCH if MODE == "patch" else PATCH[:2]
+    print("=" * 90)
+    print(f"MRI PATCH LOADER ({MODE} {'x'.join(map(str, shape))}, batch {BATCH_SIZE}, "
+          f"{WORKERS} workers, LRU {MAX_RESIDENT_MB} MB)")
+    print("=" * 90)
+    for dx in LABEL_CODES:
+        sites = sorted({it["site"] for it in items if it["diagnosis"] == dx})
+        print(f"{dx}: {sum(it['diagnosis'] == dx for it in items)} subjects ({', '.join(sites)})")
+
+    pd_frac = []
+    for n, (x, y, _) in enumerate(loader, 1):
+        pd_frac.append(y.mean())
+        if n % 20 == 0 or n == BENCH_BATCHES:
+            v = loader.volumes
+            print(f"  {n:>4} batches  {loader.samples_per_s:8.1f} samples/s  "
+                  f"hits {v.hits} misses {v.misses} inflated {v.inflated} evicted {v.evicted}  "
+                  f"resident {v.resident_bytes / 1024 ** 2:.0f} MB")
+        if n >= BENCH_BATCHES:
+            break
+    print(f"\n{loader.stats['samples']} samples in {loader.stats['elapsed']:.1f}s "
+          f"({loader.samples_per_s:.1f} samples/s), PD fraction {np.mean(pd_frac):.2f}")
+
+
+if __name__ == "__main__":
+    main()
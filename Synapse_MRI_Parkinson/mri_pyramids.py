@@ -0,0 +1,236 @@
+"""
+Multi-resolution pyramids for the classified T1s
+================================================
+For every scan in MRI_ANAT_CLASSIFIED, builds 2x / 4x / 8x downsampled
+copies by block-mean (one reshape + mean per level, each level from the
+previous one) and stores them next to the scan:
+
+    sub-X_T1w.nii.gz
+    sub-X_T1w_pyramid.npz     x2, x4, x8 (float32) + affine
+    sub-X_T1w_pyramid.json    source size/mtime/md5, shapes
+
+A pyramid is rebuilt only when the source content changes: an unchanged
+size+mtime skips at once, and a touched file whose MD5 still matches only
+gets its stamp refreshed.
+
+The cohort mosaic (mid-axial slice of every scan at one level) is then
+rendered from the small levels in seconds, as a grayscale PNG written
+with zlib alone.
+"""
+
+import json
+import math
+import os
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+from nifti_header_scan import read_volume
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from dataset_inventory import MRI_IMAGE_KINDS, open_inventory
+from integrity_manifest import hash_file
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+MRI_ROOT = Path(r"D:\Datasets\Synapse\Synapse_MRI_Parkinson\MRI_ANAT_CLASSIFIED").resolve()
+MOSAIC_PNG = MRI_ROOT.parent / "mri_t1_mosaic.png"
+INVENTORY_MODE = "incremental"   # how to refresh the index: "reuse" | "incremental" | "full"
+FACTORS = (2, 4, 8)
+MOSAIC_LEVEL = 4
+MOSAIC_COLUMNS = 16
+WORKERS = max(1, (os.cpu_count() or 2) - 1)
+PYRAMID_SUFFIX = "_pyramid"
+
+# ── Pyramid ──────────────────────────────────────────────────────────────────
+
+def block_mean(vol: np.ndarray, f: int = 2) -> np.ndarray:
+    """Mean over f x f x f blocks; odd edges are padded by repeating the last voxel."""
+    spatial = vol.shape[:3]
+    pad = [(0, (-n) % f) for n in spatial] + [(0, 0)] * (vol.ndim - 3)
+    if any(p[1] for p in pad):
+        vol = np.pad(vol, pad, mode="edge")
+    nx, ny, nz = (n // f for n in vol.shape[:3])
+    blocks = vol.reshape((nx, f, ny, f, nz, f) + vol.shape[3:])
+    return blocks.mean(axis=(1, 3, 5), dtype=np.float32)
+
+
+def build_pyramid(vol: np.ndarray, factors=FACTORS) -> dict:
+    """{"x2": ..., "x4": ...}; each level is computed from the previous one."""
+    levels, cur, have = {}, vol, 1
+    for f in sorted(factors):
+        step = f // have
+        if step * have != f:
+            raise ValueError(f"factors must divide each other: {factors}")
+        cur = block_mean(cur, step) if step > 1 else cur
+        levels[f"x{f}"] = cur.astype(np.float32, copy=False)
+        have = f
+    return levels
+
+
+def pyramid_paths(scan: Path):
+    name = scan.name
+    for ext in (".nii.gz", ".nii", ".gz"):
+        if name.lower().endswith(ext):
+            name = name[: -len(ext)]
+            break
+    base = name + PYRAMID_SUFFIX
+    return scan.with_name(base + ".npz"), scan.with_name(base + ".json")
+
+
+def _stamp(path: Path) -> dict:
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _write_json(path: Path, obj):
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, path)
+
+
+def pyramid_status(scan: Path) -> str:
+    """"fresh" | "touched" (same content, new stamp) | "stale" | "missing"."""
+    npz, meta_path = pyramid_paths(scan)
+    if not npz.exists() or not meta_path.exists():
+        return "missing"
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("factors") != list(FACTORS):
+        return "stale"
+    if meta.get("source_stamp") == _stamp(scan):
+        return "fresh"
+    if meta.get("source_md5") == hash_file(scan):
+        meta["source_stamp"] = _stamp(scan)
+        _write_json(meta_path, meta)
+        return "touched"
+    return "stale"
+
+
+def make_pyramid(scan: Path, factors=FACTORS) -> dict:
+    """Worker: read the scan, write <scan>_pyramid.npz/.json; returns summary."""
+    t0 = time.perf_counter()
+    scan = Path(scan)
+    stamp, md5 = _stamp(scan), hash_file(scan)
+    hdr, vol = read_volume(scan)
+    levels = build_pyramid(vol, factors)
+    npz, meta_path = pyramid_paths(scan)
+    affine = np.asarray(hdr.affine, dtype=np.float64)
+
+    tmp = npz.with_suffix(".tmp.npz")
+    np.savez_compressed(tmp, affine=affine, **levels)
+    os.replace(tmp, npz)
+    _write_json(meta_path, {
+        "source": scan.name, "source_stamp": stamp, "source_md5": md5,
+        "factors": list(factors), "shape": list(vol.shape),
+        "levels": {k: list(v.shape) for k, v in levels.items()},
+        "pixdim": list(hdr.pixdim), "orientation": hdr.orientation,
+    })
+    return {"scan": str(scan), "shape": vol.shape, "elapsed": time.perf_counter() - t0}
+
+
+def load_level(scan: Path, factor: int = MOSAIC_LEVEL) -> np.ndarray:
+    npz, _ = pyramid_paths(Path(scan))
+    with np.load(npz) as z:
+        return z[f"x{factor}"]
+
+# ── Mosaic ───────────────────────────────────────────────────────────────────
+
+def write_png(path: Path, img: np.ndarray):
+    """8-bit grayscale PNG (no imaging library needed)."""
+    img = np.ascontiguousarray(img, dtype=np.uint8)
+    h, w = img.shape
+    raw = np.hstack([np.zeros((h, 1), dtype=np.uint8), img]).tobytes()   # filter 0 per row
+
+    def chunk(tag, data):
+        body = tag + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 0, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+def mid_axial(vol: np.ndarray) -> np.ndarray:
+    """Middle z slice, rotated so the second voxel axis points up."""
+    if vol.ndim > 3:
+        vol = vol[..., 0]
+    return np.rot90(vol[:, :, vol.shape[2] // 2])
+
+
+def render_mosaic(scans, out_png: Path, factor: int = MOSAIC_LEVEL,
+                  columns: int = MOSAIC_COLUMNS) -> tuple:
+    """Grid of mid-axial slices at one pyramid level; returns (n tiles, (h, w))."""
+    tiles = []
+    for scan in scans:
+        try:
+            sl = mid_axial(load_level(scan, factor)).astype(np.float32)
+        except (OSError, KeyError, ValueError):
+            continue
+        lo, hi = np.percentile(sl, (1, 99))
+        tiles.append(np.clip((sl - lo) / (hi - lo) * 255 if hi > lo else sl * 0, 0, 255))
+    if not tiles:
+        return 0, (0, 0)
+    th = max(t.shape[0] for t in tiles)
+    tw = max(t.shape[1] for t in tiles)
+    rows = math.ceil(len(tiles) / columns)
+    canvas = np.zeros((rows * th, min(columns, len(tiles)) * tw), dtype=np.uint8)
+    for i, t in enumerate(tiles):
+        r, c = divmod(i, columns)
+        canvas[r * th:r * th + t.shape[0], c * tw:c * tw + t.shape[1]] = t.astype(np.uint8)
+    write_png(out_png, canvas)
+    return len(tiles), canvas.shape
+
+
+def main():
+    if not MRI_ROOT.exists():
+        print("ERROR: MRI_ANAT_CLASSIFIED not found:", MRI_ROOT)
+        return
+
+    inv = open_inventory(MRI_ROOT, mode=INVENTORY_MODE)
+    scans = [MRI_ROOT / r["path"] for r in inv.files(kinds=MRI_IMAGE_KINDS)]
+    inv.close()
+
+    status = {scan: pyramid_status(scan) for scan in scans}
+    todo = [s for s in scans if status[s] in ("missing", "stale")]
+    print("=" * 90)
+    print("T1 PYRAMIDS (" + "/".join(f"{f}x" for f in FACTORS) + ")")
+    print(f"Scans: {len(scans)} | up to date: {sum(v == 'fresh' for v in status.values())} "
+          f"| touched, same content: {sum(v == 'touched' for v in status.values())} "
+          f"| to build: {len(todo)}")
+    print("=" * 90)
+
+    t0 = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+        futures = {pool.submit(make_pyramid, scan): scan for scan in todo}
+        for fut in as_completed(futures):
+            scan = futures[fut]
+            try:
+                res = fut.result()
+                print(f"  Done: {scan.relative_to(MRI_ROOT)}  {res['shape']}  ({res['elapsed']:.1f}s)")
+            except Exception as e:
+                failed += 1
+                print(f"  [FAIL] {scan.relative_to(MRI_ROOT)}: {e}")
+    build_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    n_tiles, shape = render_mosaic(scans, MOSAIC_PNG)
+    mosaic_s = time.perf_counter() - t0
+    print("-" * 90)
+    print(f"Built: {len(todo) - failed} | failed: {failed} | {build_s:.1f}s")
+    print(f"Mosaic: {n_tiles} scans at {MOSAIC_LEVEL}x -> {MOSAIC_PNG} "
+          f"({shape[1]}x{shape[0]} px, {mosaic_s:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Cohort voxel statistics (streaming Welford)
+===========================================
+Voxelwise count / mean / variance of the PD and CN T1s in
+MRI_ANAT_CLASSIFIED, accumulated one volume at a time with Welford's
+update. Uncompressed .nii files are read slab by slab through a memmap,
+so peak memory is the accumulators plus one volume (or one slab) per worker,
+never the cohort.
+
+The cohort is split across processes. Each builds partial accumulators, and
+the partials are merged with the pairwise (Chan et al.) formula, which gives
+the same result as one serial pass.
+
+Voxelwise statistics only make sense on a common grid, so accumulators are
+keyed by (group, volume shape). Scans of different geometry are kept apart
+instead of being mixed (see nifti_header_scan.py for the geometry
+table). VOLUME_LEVEL can point at the 2x/4x/8x pyramids (mri_pyramids.py)
+for quick runs.
+
+Output per (group, shape): <OUT_DIR>/<group>_<shape>.npz with count, mean,
+var. For shapes shared by PD and CN, a Welch t map is written too.
+"""
+
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from mri_pyramids import load_level
+from nifti_header_scan import DATATYPES, read_header, read_volume
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from dataset_inventory import MRI_IMAGE_KINDS, open_inventory
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+MRI_ROOT = Path(r"D:\Datasets\Synapse\Synapse_MRI_Parkinson\MRI_ANAT_CLASSIFIED").resolve()
+OUT_DIR = MRI_ROOT.parent / "voxel_stats"
+INVENTORY_MODE = "incremental"   # how to refresh the index: "reuse" | "incremental" | "full"
+GROUPS = ("PD", "CN")
+T1_PATTERN = "t1w"               # case-insensitive substring of the file name
+VOLUME_LEVEL = 1                 # 1 = full resolution, 2/4/8 = pyramid level
+SLAB = 16                        # z-slices per memmap slab
+WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+
+class Welford:
+    """Voxelwise running count, mean and sum of squared deviations (M2)."""
+
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        self.count = np.zeros(self.shape, dtype=np.int32)
+        self.mean = np.zeros(self.shape, dtype=np.float64)
+        self.m2 = np.zeros(self.shape, dtype=np.float64)
+        self.n_volumes = 0
+
+    def update(self, x: np.ndarray, region=(...,)):
+        """Add one observation per voxel of `region`; NaNs are skipped."""
+        x = np.asarray(x, dtype=np.float64)
+        n, mean, m2 = self.count[region], self.mean[region], self.m2[region]
+        valid = ~np.isnan(x)
+        n += valid
+        delta = np.where(valid, x - mean, 0.0)
+        mean += np.divide(delta, n, out=np.zeros_like(delta), where=n > 0)
+        m2 += delta * np.where(valid, x - mean, 0.0)
+
+    def merge(self, other: "Welford") -> "Welford":
+        if other.shape != self.shape:
+            raise ValueError(f"cannot merge shapes {self.shape} and {other.shape}")
+        na, nb = self.count.astype(np.float64), other.count.astype(np.float64)
+        n = na + nb
+        delta = other.mean - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.mean = np.where(n > 0, self.mean + delta * nb / n, 0.0)
+            self.m2 = np.where(n > 0, self.m2 + other.m2 + delta ** 2 * na * nb / n, 0.0)
+        self.count = (na + nb).astype(np.int32)
+        self.n_volumes += other.n_volumes
+        return self
+
+    @property
+    def var(self) -> np.ndarray:
+        """Sample variance (ddof=1); NaN where fewer than two values."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 1, self.m2 / (self.count - 1), np.nan)
+
+    def save(self, path: Path, **meta):
+        np.savez_compressed(path, count=self.count, mean=self.mean.astype(np.float32),
+                            var=self.var.astype(np.float32), n_volumes=self.n_volumes,
+                            **meta)
+
+# ── Volume access ────────────────────────────────────────────────────────────
+
+def volume_shape(path: Path, level: int = VOLUME_LEVEL) -> tuple:
+    if level > 1:
+        return tuple(load_level(path, level).shape[:3])
+    dims = read_header(path).dims
+    return tuple(dims[:3])
+
+
+def iter_slabs(path: Path, level: int = VOLUME_LEVEL, slab: int = SLAB):
+    """Yield (region, array) covering the 3-D volume in z slabs.
+
+    Plain .nii files are memory-mapped, so only one slab is in memory;
+    gzipped files have to be inflated whole first.
+    """
+    if level > 1:
+        vol = load_level(path, level)
+    else:
+        hdr = read_header(path)
+        plain = (not hdr.compressed and hdr.datatype in DATATYPES and hdr.datatype != 128
+                 and hdr.scl_slope in (0.0, 1.0) and not hdr.scl_inter)
+        if plain:
+            dtype = np.dtype(DATATYPES[hdr.datatype][0]).newbyteorder(hdr.endian)
+            vol = np.memmap(path, dtype=dtype, mode="r", offset=hdr.vox_offset,
+                            shape=hdr.dims, order="F")
+        else:
+            vol = read_volume(path)[1]
+    if vol.ndim > 3:
+        vol = vol[..., 0]   # first frame of 4-D scans
+    for z0 in range(0, vol.shape[2], slab):
+        region = (slice(None), slice(None), slice(z0, min(z0 + slab, vol.shape[2])))
+        yield region, np.asarray(vol[region])
+
+
+def accumulate(scans, level: int = VOLUME_LEVEL):
+    """Worker: ({(group, shape): Welford}, [(path, error)]) over (group, path) pairs.
+
+    Each scan goes into its own accumulator that is merged only once the
+    whole volume has been read, so a scan failing halfway leaves no partial
+    counts behind.
+    """
+    accs, failures = {}, []
+    for group, path in scans:
+        try:
+            shape = volume_shape(path, level)
+            one = Welford(shape)
+            for region, block in iter_slabs(path, level):
+                one.update(block, region)
+            one.n_volumes = 1
+        except Exception as e:
+            failures.append((str(path), f"{type(e).__name__}: {e}"))
+            continue
+        key = (group, shape)
+        accs[key] = accs[key].merge(one) if key in accs else one
+    return accs, failures
+
+
+def merge_partials(partials) -> dict:
+    merged = {}
+    for part in partials:
+        for key, acc in part.items():
+            merged[key] = merged[key].merge(acc) if key in merged else acc
+    return merged
+
+
+def welch_t(a: Welford, b: Welford) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        se = np.sqrt(a.var / a.count + b.var / b.count)
+        return (a.mean - b.mean) / se
+
+
+def shape_tag(shape) -> str:
+    return "x".join(map(str, shape))
+
+
+def split(items, n):
+    """Round-robin split into n lists (balances sites/groups across workers)."""
+    parts = [[] for _ in range(max(1, n))]
+    for i, item in enumerate(items):
+        parts[i % len(parts)].append(item)
+    return [p for p in parts if p]
+
+
+def peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:   # Windows
+        return float("nan")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def main():
+    if not MRI_ROOT.exists():
+        print("ERROR: MRI_ANAT_CLASSIFIED not found:", MRI_ROOT)
+        return
+
+    inv = open_inventory(MRI_ROOT, mode=INVENTORY_MODE)
+    scans = [(r["grp"], MRI_ROOT / r["path"]) for r in inv.files(kinds=MRI_IMAGE_KINDS)
+             if r["grp"] in GROUPS and T1_PATTERN in r["name"].lower()]
+    inv.close()
+
+    print("=" * 90)
+    print(f"VOXEL STATISTICS (Welford, level {VOLUME_LEVEL}x, {WORKERS} workers)")
+    print(f"T1 scans: {len(scans)}  " + "  ".join(
+        f"{g}={sum(1 for s in scans if s[0] == g)}" for g in GROUPS))
+    print("=" * 90)
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+        results = list(pool.map(accumulate, split(scans, WORKERS)))
+    accs = merge_partials(part for part, _ in results)
+    failures = [f for _, fails in results for f in fails]
+    elapsed = time.perf_counter() - t0
+
+    for path, error in failures:
+        print(f"  [FAIL] {path}: {error}")
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    by_shape = defaultdict(dict)
+    print(f"{'group':<6} {'shape':<16} {'scans':>6} {'mean':>10} {'mean sd':>10}")
+    for (group, shape), acc in sorted(accs.items(), key=lambda kv: (kv[0][1], kv[0][0])):
+        by_shape[shape][group] = acc
+        acc.save(OUT_DIR / f"{group}_{shape_tag(shape)}.npz", shape=np.array(shape))
+        inside, spread = acc.count > 0, acc.count > 1
+        mean = float(acc.mean[inside].mean()) if inside.any() else math.nan
+        sd = float(np.sqrt(acc.var[spread].mean())) if spread.any() else math.nan
+        print(f"{group:<6} {shape_tag(shape):<16} {acc.n_volumes:>6} {mean:>10.2f} {sd:>10.2f}")
+
+    for shape, groups in by_shape.items():
+        if all(g in groups for g in GROUPS[:2]):
+            t = welch_t(groups[GROUPS[0]], groups[GROUPS[1]])
+            np.savez_compressed(OUT_DIR / f"t_{GROUPS[0]}_vs_{GROUPS[1]}_{shape_tag(shape)}.npz",
+                                t=t.astype(np.float32))
+            n_sig = int(np.sum(np.abs(t) > 3.0))
+            print(f"\nWelch t ({GROUPS[0]} - {GROUPS[1]}) on {shape_tag(shape)}: "
+                  f"{n_sig} voxels with |t| > 3")
+
+    print("-" * 90)
+    print(f"Failed scans: {len(failures)}")
+    print(f"Elapsed: {elapsed:.1f}s | main-process peak RSS: {peak_rss_mb():.0f} MB")
+    print(f"Saved: {OUT_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+NIfTI header-only scanner
+=========================
+Reads only the NIfTI-1 (348-byte) or NIfTI-2 (540-byte) header of every
+scan in MRI_ANAT_CLASSIFIED and writes one row per scan: dimensions, voxel
+size, datatype, orientation, qform/sform codes, and expected vs actual payload.
+
+Gzipped files are recognised by their magic bytes, not by their name (so
+legacy *_t1w.gz files are covered). Only the first deflate block is
+inflated, so each file costs a few kilobytes of I/O instead of a full
+decompression. Files are scanned on a thread pool.
+
+Afterwards every T1 is compared with the most common geometry (per site and
+cohort-wide), and scans that differ are listed.
+
+`read_volume()` loads a whole volume with numpy for the later pipeline stages.
+"""
+
+import gzip
+import math
+import struct
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from dataset_inventory import MRI_IMAGE_KINDS, open_inventory
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+MRI_ROOT = Path(r"D:\Datasets\Synapse\Synapse_MRI_Parkinson\MRI_ANAT_CLASSIFIED").resolve()
+OUT_CSV = MRI_ROOT.parent / "mri_scan_headers.csv"
+INVENTORY_MODE = "incremental"   # how to refresh the index: "reuse" | "incremental" | "full"
+SCAN_WORKERS = 16
+VOXEL_DECIMALS = 2               # voxel sizes are compared after rounding
+
+GZIP_MAGIC = b"\x1f\x8b"
+DATATYPES = {
+    2: ("uint8", 8), 4: ("int16", 16), 8: ("int32", 32), 16: ("float32", 32),
+    32: ("complex64", 64), 64: ("float64", 64), 128: ("rgb24", 24), 256: ("int8", 8),
+    512: ("uint16", 16), 768: ("uint32", 32), 1024: ("int64", 64), 1280: ("uint64", 64),
+}
+
+
+class NiftiHeaderError(ValueError):
+    pass
+
+
+@dataclass
+class NiftiHeader:
+    path: Path
+    format: str = ""              # "nifti1" | "nifti2"
+    compressed: bool = False
+    endian: str = "<"
+    dims: tuple = ()              # spatial/temporal sizes, dim[1..dim[0]]
+    pixdim: tuple = ()            # voxel sizes matching dims
+    datatype: int = 0
+    bitpix: int = 0
+    vox_offset: int = 0
+    scl_slope: float = 0.0
+    scl_inter: float = 0.0
+    qform_code: int = 0
+    sform_code: int = 0
+    affine: list = field(default_factory=list)   # 3x4 rows (sform, else qform, else pixdim)
+
+    @property
+    def dtype_name(self) -> str:
+        return DATATYPES.get(self.datatype, (f"code{self.datatype}", 0))[0]
+
+    @property
+    def data_bytes(self) -> int:
+        return math.prod(self.dims) * self.bitpix // 8 if self.dims else 0
+
+    @property
+    def orientation(self) -> str:
+        return axcodes(self.affine)
+
+# ── Header parsing ───────────────────────────────────────────────────────────
+
+def _open(path: Path):
+    with open(path, "rb") as f:
+        compressed = f.read(2) == GZIP_MAGIC
+    return (gzip.open(path, "rb") if compressed else open(path, "rb")), compressed
+
+
+def _quaternion_affine(b, c, d, qx, qy, qz, pixdim, qfac):
+    a = math.sqrt(max(0.0, 1.0 - (b * b + c * c + d * d)))
+    r = [
+        [a * a + b * b - c * c - d * d, 2 * (b * c - a * d), 2 * (b * d + a * c)],
+        [2 * (b * c + a * d), a * a + c * c - b * b - d * d, 2 * (c * d - a * b)],
+        [2 * (b * d - a * c), 2 * (c * d + a * b), a * a + d * d - c * c - b * b],
+    ]
+    scale = [pixdim[0], pixdim[1], pixdim[2] * (-1.0 if qfac < 0 else 1.0)]
+    return [[r[i][j] * scale[j] for j in range(3)] + [off]
+            for i, off in enumerate((qx, qy, qz))]
+
+
+def parse_header(raw: bytes, path: Path = Path(), compressed: bool = False) -> NiftiHeader:
+    """Parse NIfTI-1/2 header bytes (at least 348, or 540 for NIfTI-2)."""
+    if len(raw) < 348:
+        raise NiftiHeaderError("file shorter than a NIfTI header")
+    for endian in "<>":
+        size = struct.unpack(endian + "i", raw[:4])[0]
+        if size in (348, 540):
+            break
+    else:
+        raise NiftiHeaderError("not a NIfTI file (bad sizeof_hdr)")
+    e = endian
+    hdr = NiftiHeader(Path(path), compressed=compressed, endian=e)
+
+    if size == 348:
+        if raw[344:347] not in (b"n+1", b"ni1"):
+            raise NiftiHeaderError("bad NIfTI-1 magic")
+        hdr.format = "nifti1"
+        dim = struct.unpack(e + "8h", raw[40:56])
+        hdr.datatype, hdr.bitpix = struct.unpack(e + "2h", raw[70:74])
+        pixdim = struct.unpack(e + "8f", raw[76:108])
+        hdr.vox_offset = int(struct.unpack(e + "f", raw[108:112])[0])
+        hdr.scl_slope, hdr.scl_inter = struct.unpack(e + "2f", raw[112:120])
+        hdr.qform_code, hdr.sform_code = struct.unpack(e + "2h", raw[252:256])
+        quat = struct.unpack(e + "6f", raw[256:280])
+        srow = struct.unpack(e + "12f", raw[280:328])
+    else:
+        if len(raw) < 540:
+            raise NiftiHeaderError("truncated NIfTI-2 header")
+        if raw[4:7] not in (b"n+2", b"ni2"):
+            raise NiftiHeaderError("bad NIfTI-2 magic")
+        hdr.format = "nifti2"
+        hdr.datatype, hdr.bitpix = struct.unpack(e + "2h", raw[12:16])
+        dim = struct.unpack(e + "8q", raw[16:80])
+        pixdim = struct.unpack(e + "8d", raw[104:168])
+        hdr.vox_offset = struct.unpack(e + "q", raw[168:176])[0]
+        hdr.scl_slope, hdr.scl_inter = struct.unpack(e + "2d", raw[176:192])
+        hdr.qform_code, hdr.sform_code = struct.unpack(e + "2i", raw[344:352])
+        quat = struct.unpack(e + "6d", raw[352:400])
+        srow = struct.unpack(e + "12d", raw[400:496])
+
+    ndim = dim[0]
+    if not 1 <= ndim <= 7:
+        raise NiftiHeaderError(f"invalid dim[0]={ndim}")
+    hdr.dims = tuple(int(d) for d in dim[1:ndim + 1])
+    hdr.pixdim = tuple(round(float(p), 6) for p in pixdim[1:ndim + 1])
+
+    if hdr.sform_code > 0:
+        hdr.affine = [list(srow[0:4]), list(srow[4:8]), list(srow[8:12])]
+    elif hdr.qform_code > 0:
+        hdr.affine = _quaternion_affine(*quat, pixdim[1:4], pixdim[0])
+    else:
+        hdr.affine = [[pixdim[1], 0, 0, 0], [0, pixdim[2], 0, 0], [0, 0, pixdim[3], 0]]
+    return hdr
+
+
+def read_header(path) -> NiftiHeader:
+    """Header of one .nii / .nii.gz (or misnamed gzip) file; only the header is read."""
+    path = Path(path)
+    f, compressed = _open(path)
+    with f:
+        raw = f.read(540)
+    return parse_header(raw, path, compressed)
+
+
+def axcodes(affine) -> str:
+    """Orientation letters ('RAS', 'LPI', ...) of the voxel axes in world space."""
+    if not affine:
+        return ""
+    letters = (("L", "R"), ("P", "A"), ("I", "S"))
+    used, out = set(), []
+    for j in range(3):
+        col = [affine[i][j] for i in range(3)]
+        order = sorted(range(3), key=lambda i: -abs(col[i]))
+        i = next((k for k in order if k not in used), order[0])
+        used.add(i)
+        out.append(letters[i][col[i] > 0] if col[i] else "?")
+    return "".join(out)
+
+
+def read_volume(path):
+    """(header, numpy array) with scaling applied; the array is x, y, z[, t] (Fortran order)."""
+    import numpy as np
+
+    hdr = read_header(path)
+    if hdr.datatype not in DATATYPES or hdr.datatype == 128:
+        raise NiftiHeaderError(f"{path}: unsupported datatype {hdr.datatype}")
+    dtype = np.dtype(DATATYPES[hdr.datatype][0]).newbyteorder(hdr.endian)
+    f, _ = _open(Path(path))
+    with f:
+        f.seek(hdr.vox_offset)
+        buf = f.read(hdr.data_bytes)
+    if len(buf) < hdr.data_bytes:
+        raise NiftiHeaderError(f"{path}: truncated image data")
+    data = np.frombuffer(buf, dtype=dtype).reshape(hdr.dims, order="F")
+    if hdr.scl_slope not in (0.0, 1.0) or hdr.scl_inter:
+        data = data * np.float32(hdr.scl_slope or 1.0) + np.float32(hdr.scl_inter)
+    return hdr, data
+
+# ── Scan ─────────────────────────────────────────────────────────────────────
+
+def scan_row(rel: str, root: Path) -> dict:
+    parts = rel.split("/")
+    row = {"label": parts[0] if len(parts) > 2 else "", "subject": "", "site": "",
+           "file": parts[-1], "path": rel, "file_size": 0, "error": ""}
+    subj = next((p for p in parts if "_sub-" in p.lower()), "")
+    if subj:
+        row["site"], row["subject"] = subj.split("_", 1)
+    try:
+        row["file_size"] = (root / rel).stat().st_size
+        hdr = read_header(root / rel)
+    except (OSError, EOFError, gzip.BadGzipFile, NiftiHeaderError, struct.error) as e:
+        row["error"] = str(e) or type(e).__name__
+        return row
+    row.update({
+        "format": hdr.format, "compressed": hdr.compressed,
+        "nx": hdr.dims[0] if len(hdr.dims) > 0 else 1,
+        "ny": hdr.dims[1] if len(hdr.dims) > 1 else 1,
+        "nz": hdr.dims[2] if len(hdr.dims) > 2 else 1,
+        "nt": math.prod(hdr.dims[3:]) if len(hdr.dims) > 3 else 1,
+        "dx": hdr.pixdim[0] if len(hdr.pixdim) > 0 else 0.0,
+        "dy": hdr.pixdim[1] if len(hdr.pixdim) > 1 else 0.0,
+        "dz": hdr.pixdim[2] if len(hdr.pixdim) > 2 else 0.0,
+        "datatype": hdr.dtype_name, "bitpix": hdr.bitpix,
+        "orientation": hdr.orientation, "qform_code": hdr.qform_code,
+        "sform_code": hdr.sform_code, "vox_offset": hdr.vox_offset,
+        "data_bytes": hdr.data_bytes,
+    })
+    if not hdr.compressed and row["file_size"] < hdr.vox_offset + hdr.data_bytes:
+        row["error"] = "truncated image data"
+    return row
+
+
+def scan_tree(root: Path, workers: int = SCAN_WORKERS) -> pd.DataFrame:
+    """One row per image file under `root` (file list from the inventory)."""
+    inv = open_inventory(root, mode=INVENTORY_MODE)
+    rels = [r["path"] for r in inv.files(kinds=MRI_IMAGE_KINDS)]
+    inv.close()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        rows = list(pool.map(lambda rel: scan_row(rel, root), rels))
+    return pd.DataFrame(rows)
+
+
+def geometry_key(df: pd.DataFrame) -> pd.Series:
+    dec = VOXEL_DECIMALS
+    return (df["nx"].astype(int).astype(str) + "x" + df["ny"].astype(int).astype(str) + "x"
+            + df["nz"].astype(int).astype(str) + " @ "
+            + df["dx"].round(dec).astype(str) + "x" + df["dy"].round(dec).astype(str) + "x"
+            + df["dz"].round(dec).astype(str) + " " + df["orientation"].astype(str))
+
+
+def main():
+    if not MRI_ROOT.exists():
+        print("ERROR: MRI_ANAT_CLASSIFIED not found:", MRI_ROOT)
+        return
+
+    t0 = time.perf_counter()
+    df = scan_tree(MRI_ROOT)
+    elapsed = time.perf_counter() - t0
+    df.to_csv(OUT_CSV, index=False)
+
+    print("=" * 90)
+    print("NIfTI HEADER SCAN")
+    print("=" * 90)
+    per_file = elapsed / len(df) * 1000 if len(df) else 0.0
+    print(f"Scans: {len(df)} in {elapsed:.2f}s ({per_file:.1f} ms per file)")
+
+    bad = df[df["error"] != ""] if len(df) else df
+    if len(bad):
+        print(f"\n[UNREADABLE] {len(bad)} file(s) rejected by the header check")
+        for r in bad.itertuples(index=False):
+            print(f"  {r.path}: {r.error}")
+
+    good = df[df["error"] == ""].copy() if len(df) else df
+    if len(good):
+        good["geometry"] = geometry_key(good)
+        print("\nGeometries (cohort-wide):")
+        for geom, n in good["geometry"].value_counts().items():
+            print(f"  {n:>4}  {geom}")
+
+        print("\nScans differing from their site's most common geometry:")
+        n_out = 0
+        for site, g in good.groupby("site"):
+            mode = g["geometry"].mode().iloc[0]
+            for r in g[g["geometry"] != mode].itertuples(index=False):
+                print(f"  {site}: {r.label}/{r.site}_{r.subject}/{r.file}  {r.geometry}  (site: {mode})")
+                n_out += 1
+        if not n_out:
+            print("  None — every site is internally consistent")
+        print("\nDatatypes:", dict(Counter(good["datatype"])))
+    print(f"\nSaved: {OUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Typed BrainLat CSV tables with an on-disk cache
+===============================================
+Each BrainLat CSV (MRI demographics/cognition, EEG demographics/cognition/
+records for PD and HC) is parsed once into one canonical frame:
+
+  - column names normalized ("id EEG" / "id_EEG" / "EEG_ID" -> id_eeg,
+    "MRI_ID" -> id_mri, "Age" -> age, ...)
+  - subject ids stripped of stray whitespace
+  - diagnosis upper-cased; diagnosis, country and sex as categoricals
+  - scores, ages and record flags as numbers (unparseable cells -> NaN)
+  - country from the path column ("3_PD/AR" -> AR) or from the MRI id
+    ("sub-CLB00012" -> CLB)
+
+The typed frame is written to CACHE_DIR (Parquet when pyarrow/fastparquet is
+installed, pickle otherwise) with a JSON stamp of the source. A stamp that still
+matches the CSV's size+mtime is used as is; a touched CSV with an unchanged
+MD5 only gets its stamp refreshed; anything else is re-parsed.
+
+    from brainlat_tables import load_table
+    demo = load_table("mri_demographic")
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from integrity_manifest import hash_file
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+REPO_ROOT = Path(__file__).resolve().parent
+CACHE_DIR = REPO_ROOT / ".table_cache"
+SCHEMA_VERSION = 1   # bump when the typing rules below change
+
+TABLES = {
+    "mri_demographic": "Synapse_MRI_Parkinson/BrainLat_Demographic_MRI.csv",
+    "mri_cognition":   "Synapse_MRI_Parkinson/BrainLat_Cognition_MRI.csv",
+    "eeg_cog_hc":      "Synapse_EEG_Parkinson/cognition_hc_eeg_data.csv",
+    "eeg_cog_pd":      "Synapse_EEG_Parkinson/Cognition_PD_EEG_data.csv",
+    "eeg_demo_hc":     "Synapse_EEG_Parkinson/demographics_hc_eeg_data.csv",
+    "eeg_demo_pd":     "Synapse_EEG_Parkinson/Demographics_PD_EEG_data.csv",
+    "eeg_rec_hc":      "Synapse_EEG_Parkinson/records_hc_eeg_data.csv",
+    "eeg_rec_pd":      "Synapse_EEG_Parkinson/Records_PD_EEG_data.csv",
+}
+
+COLUMN_ALIASES = {
+    "ideeg": "id_eeg", "id_eeg_": "id_eeg", "id__eeg": "id_eeg", "eeg_id": "id_eeg",
+    "mri_id": "id_mri",
+}
+ID_COLUMNS = ("id_eeg", "id_mri", "id")
+CATEGORY_COLUMNS = ("diagnosis", "country", "sex")
+NUMERIC_COLUMNS = {
+    "age", "years_education", "sex", "laterality", "mmse",
+    "t1", "rest", "dwi", "mf", "eeg", "emotion_recog",
+}
+NUMERIC_PREFIXES = ("moca_", "ifs_", "mini_sea_")
+
+# ── Normalization ────────────────────────────────────────────────────────────
+
+def normalize_colname(c: str) -> str:
+    c = str(c).strip().replace("\ufeff", "")
+    c = re.sub(r"\s+", "_", c)          # spaces -> _
+    c = c.replace("/", "_")
+    c = re.sub(r"[^0-9a-zA-Z_]+", "", c)
+    c = c.strip("_").lower()
+    return COLUMN_ALIASES.get(c, c)
+
+
+def normalize_id(x):
+    if pd.isna(x):
+        return np.nan
+    s = re.sub(r"\s+", "", str(x))      # fixes " sub-40005  "
+    return s or np.nan
+
+
+def country_from_path(p):
+    """'5_HC/AR' or '3_PD\\CL' -> 'AR' / 'CL'."""
+    if pd.isna(p):
+        return np.nan
+    last = str(p).strip().replace("\\", "/").split("/")[-1]
+    last = re.sub(r"[^A-Za-z]+", "", last)
+    return last.upper() or np.nan
+
+
+def country_from_mri_id(ids: pd.Series) -> pd.Series:
+    """'sub-CLB00012' -> 'CLB' (2- and 3-letter site codes)."""
+    return ids.str.extract(r"sub-([A-Z]+)", expand=False)
+
+
+def read_csv_any(path: Path) -> pd.DataFrame:
+    """Read with UTF-8, falling back to latin1 for the hand-edited files."""
+    try:
+        return pd.read_csv(path)
+    except UnicodeDecodeError:
+        return pd.read_csv(path, encoding="latin1")
+
+
+def type_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Canonical names and dtypes for one raw BrainLat table."""
+    df = df.copy()
+    df.columns = [normalize_colname(c) for c in df.columns]
+
+    for c in ID_COLUMNS:
+        if c in df.columns:
+            df[c] = df[c].map(normalize_id).astype(object)
+    if "id_eeg" not in df.columns and "id" in df.columns:
+        df["id_eeg"] = df["id"]
+
+    if "diagnosis" in df.columns:
+        df["diagnosis"] = df["diagnosis"].astype("string").str.strip().str.upper()
+    if "path" in df.columns:
+        df["country"] = df["path"].map(country_from_path)
+    elif "id_mri" in df.columns:
+        df["country"] = country_from_mri_id(df["id_mri"].astype("string"))
+
+    for c in df.columns:
+        if c in NUMERIC_COLUMNS or c.startswith(NUMERIC_PREFIXES):
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+    for c in CATEGORY_COLUMNS:
+        if c in df.columns:
+            df[c] = df[c].astype(object).where(df[c].notna(), np.nan).astype("category")
+    return df
+
+# ── Cache ────────────────────────────────────────────────────────────────────
+
+def _parquet_engine():
+    for mod in ("pyarrow", "fastparquet"):
+        try:
+            __import__(mod)
+            return mod
+        except ImportError:
+            continue
+    return None
+
+
+def cache_paths(name: str, cache_dir: Path = CACHE_DIR):
+    fmt = "parquet" if _parquet_engine() else "pkl"
+    return cache_dir / f"{name}.{fmt}", cache_dir / f"{name}.json"
+
+
+def _stamp(path: Path) -> dict:
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _write_json(path: Path, obj):
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _read_cached(data_path: Path) -> pd.DataFrame:
+    if data_path.suffix == ".parquet":
+        return pd.read_parquet(data_path)
+    return pd.read_pickle(data_path)
+
+
+def _write_cached(df: pd.DataFrame, data_path: Path):
+    tmp = data_path.with_name(data_path.name + ".partial")
+    if data_path.suffix == ".parquet":
+        df.to_parquet(tmp, index=False, engine=_parquet_engine())
+    else:
+        df.to_pickle(tmp)
+    os.replace(tmp, data_path)
+
+
+def cache_status(name: str, cache_dir: Path = CACHE_DIR) -> str:
+    """"fresh" | "touched" (same content, new stamp) | "stale" | "missing"."""
+    source = REPO_ROOT / TABLES[name]
+    data_path, meta_path = cache_paths(name, cache_dir)
+    if not data_path.exists() or not meta_path.exists():
+        return "missing"
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("schema") != SCHEMA_VERSION:
+        return "stale"
+    if meta.get("source_stamp") == _stamp(source):
+        return "fresh"
+    if meta.get("source_md5") == hash_file(source):
+        meta["source_stamp"] = _stamp(source)
+        _write_json(meta_path, meta)
+        return "touched"
+    return "stale"
+
+
+def load_table(name: str, cache_dir: Path = CACHE_DIR, refresh: bool = False) -> pd.DataFrame:
+    """Typed frame for TABLES[name], re-parsing the CSV only when it changed."""
+    if name not in TABLES:
+        raise KeyError(f"unknown table {name!r}; known: {', '.join(TABLES)}")
+    source = REPO_ROOT / TABLES[name]
+    if not source.exists():
+        raise FileNotFoundError(f"Missing BrainLat table: {source}")
+
+    data_path, meta_path = cache_paths(name, cache_dir)
+    if not refresh and cache_status(name, cache_dir) in ("fresh", "touched"):
+        try:
+            return _read_cached(data_path)
+        except Exception:
+            pass   # unreadable cache -> rebuild below
+
+    stamp, md5 = _stamp(source), hash_file(source)
+    df = type_frame(read_csv_any(source))
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        _write_cached(df, data_path)
+        _write_json(meta_path, {"source": TABLES[name], "source_stamp": stamp,
+                                "source_md5": md5, "schema": SCHEMA_VERSION,
+                                "rows": len(df), "columns": list(df.columns)})
+    except OSError as e:
+        print(f"[WARN] table cache not written for {name}: {e}", file=sys.stderr)
+    return df
+
+
+def load_tables(names=None, cache_dir: Path = CACHE_DIR) -> dict:
+    return {name: load_table(name, cache_dir) for name in (names or TABLES)}
+
+
+def main():
+    print("=" * 90)
+    print(f"BRAINLAT TABLES (cache: {CACHE_DIR}, format: "
+          f"{'parquet' if _parquet_engine() else 'pickle'})")
+    print("=" * 90)
+    print(f"{'table':<16} {'status':<8} {'rows':>6} {'cols':>5} {'load ms':>9}  source")
+    for name, rel in TABLES.items():
+        if not (REPO_ROOT / rel).exists():
+            print(f"{name:<16} {'absent':<8} {'':>6} {'':>5} {'':>9}  {rel}")
+            continue
+        status = cache_status(name)
+        t0 = time.perf_counter()
+        df = load_table(name)
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"{name:<16} {status:<8} {len(df):>6} {len(df.columns):>5} {ms:>9.1f}  {rel}")
+
+
+if __name__ == "__main__":
+    main()
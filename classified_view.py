@@ -0,0 +1,198 @@
+"""
+Zero-copy "classified view" materialization
+===========================================
+Builds the MRI_ANAT / MRI_ANAT_CLASSIFIED/{PD,CN} / EEG_CLASSIFIED layouts
+out of links to the downloaded files instead of shutil.copytree copies.
+
+Per file the cheapest available method is used, in this order:
+  reflink   copy-on-write clone (Btrfs/XFS via FICLONE, APFS via clonefile)
+  hardlink  same volume only
+  symlink   may need Developer Mode / admin rights on Windows
+  copy      real copy, last resort
+
+Directories are always real. A view is assembled in a temporary sibling
+folder and renamed into place, so an existing destination is always complete.
+"""
+
+import ctypes
+import errno
+import os
+import shutil
+import sys
+from collections import Counter
+from pathlib import Path
+
+METHODS = ("reflink", "hardlink", "symlink", "copy")
+FICLONE = 0x40049409   # _IOW(0x94, 9, int), Linux
+
+# (method, src device, dest device) combinations the file system cannot do
+_unsupported = set()
+
+# Errors meaning "this method never works here"; anything else (EPERM from
+# protected_hardlinks, EMLINK, EACCES, ENOSPC, a flaky share) only affects the
+# one file, which falls back without disabling the method for the next ones.
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOSYS}
+REFLINK_UNSUPPORTED_ERRNOS = {errno.EINVAL, errno.ENOTTY}   # FICLONE on a non-CoW fs
+WINERROR_UNSUPPORTED = {1, 17, 1314}   # invalid function, not same device, privilege not held
+
+# ── Per-file methods ─────────────────────────────────────────────────────────
+
+def reflink_file(src: Path, dst: Path):
+    """Copy-on-write clone of `src` at `dst`; raises OSError where unsupported."""
+    if sys.platform == "darwin":
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(src))
+        return
+    if not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "reflink not supported on this platform", str(src))
+
+    import fcntl
+    with open(src, "rb") as fs:
+        fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            fcntl.ioctl(fd, FICLONE, fs.fileno())
+        except OSError:
+            os.close(fd)
+            os.unlink(dst)
+            raise
+        os.close(fd)
+    shutil.copystat(src, dst)
+
+
+def _try(method: str, src: Path, dst: Path):
+    if method == "reflink":
+        reflink_file(src, dst)
+    elif method == "hardlink":
+        os.link(src, dst)
+    elif method == "symlink":
+        os.symlink(os.path.abspath(src), dst)
+    elif method == "copy":
+        shutil.copy2(src, dst)
+    else:
+        raise ValueError(f"unknown view method: {method!r}")
+
+
+def link_file(src: Path, dst: Path, mode: str = "auto") -> str:
+    """Place `src` at `dst` with the first method that works; returns the method used.
+
+    mode: "auto" tries every method in METHODS order; a single method name
+    tries only that one and then falls back to "copy".
+    """
+    order = METHODS if mode == "auto" else (mode, "copy")
+    src_dev = os.stat(src).st_dev
+    dst_dev = os.stat(dst.parent).st_dev
+    last_err = None
+    for method in order:
+        key = (method, src_dev, dst_dev)
+        if key in _unsupported:
+            continue
+        try:
+            _try(method, src, dst)
+            return method
+        except (OSError, NotImplementedError) as e:
+            last_err = e
+            if method != "copy" and _never_works(method, e):
+                _unsupported.add(key)
+    raise last_err
+
+
+def _never_works(method: str, err: Exception) -> bool:
+    """True if `err` says the file system lacks `method` (not just this file)."""
+    if isinstance(err, NotImplementedError):
+        return True
+    if getattr(err, "winerror", None) in WINERROR_UNSUPPORTED:
+        return True
+    if err.errno in UNSUPPORTED_ERRNOS:
+        return True
+    return method == "reflink" and err.errno in REFLINK_UNSUPPORTED_ERRNOS
+
+# ── Trees ────────────────────────────────────────────────────────────────────
+
+def materialize_tree(src_dir: Path, dest: Path, mode: str = "auto") -> Counter:
+    """Recreate `src_dir` at `dest` as a view; returns a Counter of methods used.
+
+    `mode="copytree"` keeps the old behaviour of a plain shutil.copytree.
+    """
+    src_dir, dest = Path(src_dir), Path(dest)
+    tmp = dest.with_name(dest.name + ".partial")
+    if tmp.exists():
+        shutil.rmtree(tmp)   # leftover of an interrupted run
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    if mode == "copytree":
+        shutil.copytree(src_dir, tmp)
+        os.replace(tmp, dest)
+        return Counter(copy=sum(len(f) for _, _, f in os.walk(dest)))
+
+    used = Counter()
+    for root, dirs, files in os.walk(src_dir):
+        rel = Path(root).relative_to(src_dir)
+        out_dir = tmp / rel
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for name in files:
+            used[link_file(Path(root) / name, out_dir / name, mode)] += 1
+    tmp.mkdir(parents=True, exist_ok=True)   # empty source folder
+    os.replace(tmp, dest)
+    return used
+
+
+def remove_view(path: Path):
+    """Delete a materialized view (links are removed, never their targets)."""
+    path = Path(path)
+    if path.is_symlink() or path.is_file():
+        path.unlink()
+    elif path.exists():
+        shutil.rmtree(path)
+
+
+def is_link_view(path: Path) -> bool:
+    """True if every file under `path` is a symlink or a hardlink (nlink > 1).
+
+    Reflinks and copies both look like ordinary files, so they are not link
+    views here: removing them could destroy the only copy of the data.
+    """
+    path = Path(path)
+    if path.is_symlink():
+        return True
+    if path.is_file():
+        return path.stat().st_nlink > 1
+    for root, _, files in os.walk(path):
+        for name in files:
+            f = Path(root) / name
+            if not f.is_symlink() and f.stat().st_nlink < 2:
+                return False
+    return True
+
+
+def prune_view(label_root: Path, keep: set, log=print) -> int:
+    """Remove stale subject entries under `label_root`; returns how many were removed.
+
+    `.partial` leftovers are always removed. Entries whose names are not in
+    `keep` are removed only when they are link views (is_link_view); physical
+    copies are reported and left alone.
+    """
+    removed = 0
+    if not label_root.exists():
+        return removed
+    for entry in sorted(label_root.iterdir()):
+        if entry.name.endswith(".partial"):
+            reason = "interrupted build"
+        elif entry.name not in keep:
+            if not is_link_view(entry):
+                if log:
+                    log(f"  [KEEP] stale but holds real files, not removed: {entry}")
+                continue
+            reason = "stale link view"
+        else:
+            continue
+        remove_view(entry)
+        removed += 1
+        if log:
+            log(f"  [PRUNE] {reason}: {entry}")
+    return removed
+
+
+def format_methods(used: Counter) -> str:
+    return ", ".join(f"{m}={used[m]}" for m in METHODS if used.get(m)) or "none"
@@ -0,0 +1,281 @@
+"""
+Reproducible, site-stratified subject splits
+============================================
+Builds k-fold and repeated-holdout splits over the unified cohort
+(subject_master.py) and stores them as integer arrays, so training jobs load
+a split instead of recomputing it:
+
+    from cohort_splits import open_splits
+    splits = open_splits()                      # built on first use, then cached
+    train, test = splits.fold(0)                # row indices into splits.master_id
+    train, test = splits.holdout(3)
+
+Rules:
+  - cohort: DIAGNOSES (None = all) with every availability flag in REQUIRE
+  - strata: diagnosis x site (MRI site, or EEG site for EEG-only subjects)
+  - groups: subjects sharing an MRI id or a bare EEG id are one group, and a
+    group never crosses folds. The same sub-XXXXX under both AR and CL is
+    therefore kept on one side, which errs on the safe side.
+  - optional MATCH_RATIO: keep only the CN controls matched 1:k to the PD
+    subjects on age, exactly on site and sex (control_matching.py)
+
+Folds are balanced per stratum: groups are dealt, largest first, to the fold
+with the fewest members of that stratum. Holdouts take whole groups per stratum
+until TEST_FRACTION is reached. Everything is driven by SEED.
+
+The .npz holds master_id / diagnosis / site per row, `folds` (repeats x n,
+int8 fold number) and `holdouts` (n_holdout x n, int8 1 = test), plus the
+parameters and master signature. It is rebuilt when either changes.
+"""
+
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from brainlat_tables import REPO_ROOT, load_table
+from control_matching import match
+from feature_cache import fingerprint
+from subject_master import open_master, source_signature
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+SPLITS_DIR = REPO_ROOT / "splits"
+SPLIT_NAME = "pd_cn"
+DIAGNOSES = ("PD", "CN")   # None = every diagnosis
+REQUIRE = ()               # availability flags every subject needs, e.g. ("t1",) or ("eeg",)
+N_FOLDS = 5
+KFOLD_REPEATS = 1
+N_HOLDOUTS = 10
+TEST_FRACTION = 0.2
+MATCH_RATIO = None         # 1 or 2: CN controls matched 1:k to PD (age, sex, site)
+MATCH_CALIPER = 1.0        # max age difference in SD units; None = no caliper
+SEED = 0
+SPLITS_VERSION = 2         # bump when the split rules change
+
+COVARIATES = ("age", "sex", "years_education")
+
+# ── Cohort ───────────────────────────────────────────────────────────────────
+
+def covariates() -> tuple:
+    """(by id_mri, by (eeg_site, id_eeg)) frames of age / sex / years_education."""
+    mri = load_table("mri_demographic").dropna(subset=["id_mri"])
+    mri = mri.drop_duplicates("id_mri").set_index("id_mri")[list(COVARIATES)].astype(float)
+    eeg = pd.concat([load_table("eeg_demo_pd"), load_table("eeg_demo_hc")], ignore_index=True, sort=False)
+    eeg = eeg.dropna(subset=["id_eeg"]).astype({"country": object})
+    eeg = eeg.drop_duplicates(["country", "id_eeg"]).set_index(["country", "id_eeg"])[list(COVARIATES)]
+    return mri, eeg.astype(float)
+
+
+def cohort_frame(master=None, diagnoses=DIAGNOSES, require=REQUIRE) -> pd.DataFrame:
+    """Selected master subjects with site and covariates, sorted by master_id."""
+    master = master or open_master()
+    ids = set()
+    for dx in (diagnoses if diagnoses is not None else [None]):
+        ids |= master.ids(dx, require)
+    df = pd.DataFrame([master.rows[m] for m in sorted(ids)],
+                      columns=["master_id", "id_mri", "mri_site", "id_eeg", "eeg_site", "diagnosis"])
+    df = df[df["diagnosis"].notna() & ~df["diagnosis"].str.startswith("MISMATCH:")]
+    df["site"] = df["mri_site"].where(df["mri_site"].fillna("") != "", df["eeg_site"])
+
+    by_mri, by_eeg = covariates()
+    cov = by_mri.reindex(df["id_mri"]).to_numpy()
+    eeg_cov = by_eeg.reindex(pd.MultiIndex.from_arrays([df["eeg_site"], df["id_eeg"]])).to_numpy()
+    cov = np.where(np.isnan(cov), eeg_cov, cov)
+    for j, c in enumerate(COVARIATES):
+        df[c] = cov[:, j]
+    return df.reset_index(drop=True)
+
+
+def subject_groups(df: pd.DataFrame) -> np.ndarray:
+    """Group number per row: rows sharing an MRI id or a bare EEG id are joined."""
+    parent = list(range(len(df)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    first = {}
+    for i, keys in enumerate(zip(df["id_mri"], df["id_eeg"])):
+        for kind, key in zip(("mri", "eeg"), keys):
+            if isinstance(key, str) and key:
+                j = first.setdefault((kind, key), i)
+                parent[find(i)] = find(j)
+    roots = [find(i) for i in range(len(df))]
+    return pd.factorize(pd.Series(roots))[0].astype(np.int32)
+
+
+def match_controls(df: pd.DataFrame, ratio: int, caliper=MATCH_CALIPER) -> np.ndarray:
+    """Row mask keeping non-CN rows and the CN controls matched 1:`ratio` to PD."""
+    res = match(df, df["diagnosis"] == "PD", df["diagnosis"] == "CN", covariates=("age",),
+                exact=("site", "sex"), ratio=ratio, caliper=caliper)
+    keep = df["diagnosis"].to_numpy() != "CN"
+    keep[res.controls] = True
+    return keep
+
+# ── Split generators ─────────────────────────────────────────────────────────
+
+def strata_of(df: pd.DataFrame) -> np.ndarray:
+    return pd.factorize(df["diagnosis"].astype(str) + "|" + df["site"].astype(str))[0]
+
+
+def _group_table(groups, strata):
+    """Per group: its stratum (of its first row) and its size."""
+    n_groups = groups.max() + 1
+    first = np.full(n_groups, -1)
+    first[groups[::-1]] = np.arange(len(groups))[::-1]
+    return strata[first], np.bincount(groups, minlength=n_groups)
+
+
+def stratified_group_kfold(groups, strata, k: int, rng) -> np.ndarray:
+    """Fold number per row; groups are whole, each stratum is spread evenly."""
+    g_stratum, g_size = _group_table(groups, strata)
+    g_fold = np.empty(len(g_size), dtype=np.int8)
+    fold_total = np.zeros(k, dtype=np.int64)
+    for s in np.unique(g_stratum):
+        members = np.flatnonzero(g_stratum == s)
+        members = members[rng.permutation(len(members))]
+        members = members[np.argsort(-g_size[members], kind="stable")]
+        fold_count = np.zeros(k, dtype=np.int64)
+        for g in members:
+            f = np.lexsort((rng.random(k), fold_total, fold_count))[0]
+            g_fold[g] = f
+            fold_count[f] += g_size[g]
+            fold_total[f] += g_size[g]
+    return g_fold[groups]
+
+
+def stratified_group_holdout(groups, strata, test_fraction: float, rng) -> np.ndarray:
+    """1 for test rows, 0 for train; whole groups, ~test_fraction of every stratum."""
+    g_stratum, g_size = _group_table(groups, strata)
+    g_test = np.zeros(len(g_size), dtype=np.int8)
+    for s in np.unique(g_stratum):
+        members = np.flatnonzero(g_stratum == s)
+        members = members[rng.permutation(len(members))]
+        target = int(round(g_size[members].sum() * test_fraction))
+        taken = np.cumsum(g_size[members])
+        g_test[members[:np.searchsorted(taken, target, side="right")]] = 1
+    return g_test[groups]
+
+# ── Build / store ────────────────────────────────────────────────────────────
+
+def split_params() -> dict:
+    return {"version": SPLITS_VERSION, "diagnoses": DIAGNOSES, "require": REQUIRE,
+            "n_folds": N_FOLDS, "kfold_repeats": KFOLD_REPEATS, "n_holdouts": N_HOLDOUTS,
+            "test_fraction": TEST_FRACTION, "match_ratio": MATCH_RATIO,
+            "match_caliper": MATCH_CALIPER, "seed": SEED}
+
+
+def build_splits(params: dict) -> dict:
+    """All arrays of one split file."""
+    rng = np.random.default_rng(params["seed"])
+    df = cohort_frame(diagnoses=params["diagnoses"], require=params["require"])
+    if params["match_ratio"]:
+        df = df[match_controls(df, params["match_ratio"], params["match_caliper"])].reset_index(drop=True)
+    groups, strata = subject_groups(df), strata_of(df)
+    folds = np.stack([stratified_group_kfold(groups, strata, params["n_folds"], rng)
+                      for _ in range(params["kfold_repeats"])])
+    holdouts = np.stack([stratified_group_holdout(groups, strata, params["test_fraction"], rng)
+                         for _ in range(params["n_holdouts"])])
+    arrays = {c: df[c].fillna("").astype(str).to_numpy(dtype=str)
+              for c in ("master_id", "diagnosis", "site", "id_mri", "id_eeg")}
+    arrays.update({c: df[c].to_numpy(np.float32) for c in COVARIATES})
+    arrays.update(groups=groups, folds=folds, holdouts=holdouts)
+    return arrays
+
+
+class CohortSplits:
+    """Split arrays loaded from one .npz."""
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.arrays = arrays
+        self.meta = meta
+        self.master_id = arrays["master_id"]
+        self.folds = arrays["folds"]
+        self.holdouts = arrays["holdouts"]
+
+    @classmethod
+    def load(cls, path: Path) -> "CohortSplits":
+        with np.load(path) as z:
+            arrays = {k: z[k] for k in z.files if k != "meta"}
+            meta = json.loads(str(z["meta"]))
+        return cls(arrays, meta)
+
+    def __len__(self):
+        return len(self.master_id)
+
+    def fold(self, k: int, repeat: int = 0) -> tuple:
+        """(train, test) row indices with fold `k` as the test fold."""
+        f = self.folds[repeat]
+        return np.flatnonzero(f != k), np.flatnonzero(f == k)
+
+    def holdout(self, r: int) -> tuple:
+        h = self.holdouts[r]
+        return np.flatnonzero(h == 0), np.flatnonzero(h == 1)
+
+    def frame(self) -> pd.DataFrame:
+        cols = {k: v for k, v in self.arrays.items() if v.ndim == 1}
+        return pd.DataFrame(cols)
+
+
+def save_splits(path: Path, arrays: dict, meta: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.stem + ".partial.npz")
+    np.savez(tmp, meta=np.array(json.dumps(meta)), **arrays)
+    tmp.replace(path)
+
+
+def open_splits(name: str = SPLIT_NAME, rebuild: bool = False) -> CohortSplits:
+    """Load SPLITS_DIR/<name>.npz, rebuilding it if the parameters or sources changed."""
+    path = SPLITS_DIR / f"{name}.npz"
+    params = split_params()
+    meta = {"params": params, "params_key": fingerprint(params), "master": source_signature()}
+    if not rebuild and path.exists():
+        splits = CohortSplits.load(path)
+        if (splits.meta.get("params_key"), splits.meta.get("master")) == (meta["params_key"], meta["master"]):
+            return splits
+    arrays = build_splits(params)
+    save_splits(path, arrays, {**meta, "built_at": time.time()})
+    return CohortSplits.load(path)
+
+
+def main():
+    t0 = time.perf_counter()
+    splits = open_splits()
+    elapsed = time.perf_counter() - t0
+    df = splits.frame()
+    strata = df["diagnosis"] + "|" + df["site"]
+
+    print("=" * 90)
+    print(f"COHORT SPLITS ({SPLITS_DIR / SPLIT_NAME}.npz, {elapsed * 1000:.0f} ms)")
+    print("=" * 90)
+    print(f"Subjects : {len(splits)} in {df['groups'].nunique()} groups, strata: "
+          + ", ".join(f"{k}={v}" for k, v in strata.value_counts().sort_index().items()))
+    if MATCH_RATIO:
+        print(f"Matched  : 1:{MATCH_RATIO} CN per PD on age (caliper {MATCH_CALIPER} SD), same site and sex")
+
+    print(f"\n{'fold':<6}" + "".join(f"{s:>10}" for s in sorted(strata.unique())) + f"{'total':>8}")
+    for k in range(N_FOLDS):
+        test = splits.fold(k)[1]
+        counts = strata.iloc[test].value_counts()
+        print(f"{k:<6}" + "".join(f"{counts.get(s, 0):>10}" for s in sorted(strata.unique()))
+              + f"{len(test):>8}")
+
+    leaks = 0
+    for r in range(splits.folds.shape[0]):
+        leaks += int((df.assign(f=splits.folds[r]).groupby("groups")["f"].nunique() > 1).sum())
+    for r in range(splits.holdouts.shape[0]):
+        leaks += int((df.assign(h=splits.holdouts[r]).groupby("groups")["h"].nunique() > 1).sum())
+    fractions = splits.holdouts.mean(axis=1)
+    print(f"\nHoldouts : {splits.holdouts.shape[0]} x test fraction "
+          f"{fractions.min():.2f}-{fractions.max():.2f}")
+    print(f"Groups split across folds/holdouts: {leaks}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Covariate-matched control selection
+===================================
+Matches CN controls to cases (PD, or any other diagnosis) on age, sex and
+years of education, the confounds BrainLat_MRI_analysis_PD.py asks to
+control, for the MRI and the EEG demographic tables:
+
+    from control_matching import match
+    res = match(df, df["diagnosis"] == "PD", df["diagnosis"] == "CN", ratio=2)
+    res.pairs        # case, control (index labels of df), distance
+    res.balance      # standardized mean differences before / after
+
+Covariates are scaled by their pooled SD, so distances and CALIPER are in SD
+units. EXACT columns (site by default) split the data into blocks that are
+matched separately. Two methods are available:
+
+    nearest  KD-tree (scipy cKDTree) queries for all cases at once. Without
+             replacement, cases are served hardest first: the case whose
+             nearest control is farthest picks before the easy ones.
+    optimal  minimum total distance per block (linear_sum_assignment on the
+             case x control distance matrix, each case repeated `ratio` times)
+
+Cases with no control inside the caliper stay unmatched; rows with a
+missing covariate are left out and reported. Balance is the standardized mean
+difference (mean_case - mean_control) / sqrt((var_case + var_control) / 2)
+before and after matching, with controls weighted by how often they are used.
+"""
+
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+from scipy.spatial import cKDTree
+
+from brainlat_tables import load_table
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+CASE_DIAGNOSES = ("PD",)     # None = every diagnosis except CONTROL
+CONTROL = "CN"
+COVARIATES = ("age", "sex", "years_education")
+EXACT = ("site",)
+RATIO = 1
+CALIPER = 1.0                # max distance in pooled-SD units; None = no caliper
+REPLACE = False
+METHOD = "nearest"           # "nearest" | "optimal"
+
+
+@dataclass
+class MatchResult:
+    pairs: pd.DataFrame                         # case, control, distance
+    unmatched: list = field(default_factory=list)
+    dropped: list = field(default_factory=list)  # rows with a missing covariate
+    balance: pd.DataFrame = None
+
+    @property
+    def cases(self) -> list:
+        return list(dict.fromkeys(self.pairs["case"]))
+
+    @property
+    def controls(self) -> list:
+        return list(dict.fromkeys(self.pairs["control"]))
+
+    def matched_index(self) -> list:
+        return self.cases + self.controls
+
+# ── Balance ──────────────────────────────────────────────────────────────────
+
+def _weighted_stats(x: np.ndarray, w: np.ndarray):
+    w = w / w.sum()
+    mean = (w[:, None] * x).sum(axis=0)
+    var = (w[:, None] * (x - mean) ** 2).sum(axis=0)
+    return mean, var
+
+
+def smd(cases: np.ndarray, controls: np.ndarray, control_weights=None) -> np.ndarray:
+    """Standardized mean difference per column."""
+    if not len(cases) or not len(controls):
+        return np.full(cases.shape[1], np.nan)
+    wt = np.ones(len(cases))
+    wc = np.ones(len(controls)) if control_weights is None else np.asarray(control_weights, float)
+    mt, vt = _weighted_stats(cases, wt)
+    mc, vc = _weighted_stats(controls, wc)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (mt - mc) / np.sqrt((vt + vc) / 2)
+
+
+def balance_table(df: pd.DataFrame, case_mask, control_mask, pairs: pd.DataFrame,
+                  covariates=COVARIATES) -> pd.DataFrame:
+    x = df[list(covariates)].astype(float)
+    before = smd(x[case_mask].dropna().to_numpy(), x[control_mask].dropna().to_numpy())
+    used = pairs["control"].value_counts()
+    after = smd(x.loc[list(dict.fromkeys(pairs["case"]))].to_numpy(),
+                x.loc[used.index].to_numpy(), used.to_numpy())
+    return pd.DataFrame({"smd_before": before, "smd_after": after}, index=list(covariates))
+
+# ── Matchers (one exact block) ───────────────────────────────────────────────
+
+def _nearest(xt, xc, ratio, caliper, replace):
+    """[(case row, control row, distance)] by KD-tree, greedy hardest-first without replacement."""
+    tree = cKDTree(xc)
+    bound = np.inf if caliper is None else caliper + 1e-12
+    if replace:
+        k = min(ratio, len(xc))
+        d, j = tree.query(xt, k=k, distance_upper_bound=bound)
+        d, j = d.reshape(len(xt), -1), j.reshape(len(xt), -1)
+        return [(i, j[i, r], d[i, r]) for i in range(len(xt)) for r in range(k) if np.isfinite(d[i, r])]
+
+    k = min(len(xc), ratio * 4)
+    d, j = tree.query(xt, k=k, distance_upper_bound=bound)
+    d, j = d.reshape(len(xt), -1), j.reshape(len(xt), -1)
+    used = np.zeros(len(xc), dtype=bool)
+    out = []
+    for i in np.argsort(-np.where(np.isfinite(d[:, 0]), d[:, 0], -1.0), kind="stable"):
+        di, ji, got = d[i], j[i], 0
+        if k < len(xc) and np.isfinite(di[-1]) and used[ji].sum() > k - ratio:
+            # the cached neighbours may all be taken: ask for every control
+            di, ji = tree.query(xt[i], k=len(xc), distance_upper_bound=bound)
+        for dist, c in zip(di, ji):
+            if not np.isfinite(dist) or got == ratio:
+                break
+            if not used[c]:
+                used[c] = True
+                out.append((i, c, dist))
+                got += 1
+    return out
+
+
+def _optimal(xt, xc, ratio, caliper, replace):
+    """[(case row, control row, distance)] minimizing the total distance."""
+    cost = np.sqrt(((xt[:, None, :] - xc[None, :, :]) ** 2).sum(axis=-1))
+    if replace:
+        order = np.argsort(cost, axis=1, kind="stable")[:, :ratio]
+        pairs = [(i, c, cost[i, c]) for i in range(len(xt)) for c in order[i]]
+    else:
+        big = cost.max() * len(xt) * ratio + 1.0 if cost.size else 1.0
+        rep = np.repeat(cost, ratio, axis=0)
+        if caliper is not None:
+            rep = np.where(rep <= caliper, rep, big)
+        rows, cols = linear_sum_assignment(rep)
+        pairs = [(r // ratio, c, cost[r // ratio, c]) for r, c in zip(rows, cols)]
+    if caliper is not None:
+        pairs = [p for p in pairs if p[2] <= caliper]
+    return pairs
+
+
+METHODS = {"nearest": _nearest, "optimal": _optimal}
+
+
+def match(df: pd.DataFrame, case_mask, control_mask, covariates=COVARIATES, exact=EXACT,
+          ratio: int = RATIO, caliper=CALIPER, replace: bool = REPLACE,
+          method: str = METHOD) -> MatchResult:
+    """Match control rows of `df` to case rows; labels in the result are df's index."""
+    if method not in METHODS:
+        raise ValueError(f"unknown method {method!r}")
+    case_mask = np.asarray(case_mask, dtype=bool)
+    control_mask = np.asarray(control_mask, dtype=bool)
+    x = df[list(covariates)].astype(float)
+    complete = x.notna().all(axis=1).to_numpy().copy()
+    for c in exact:
+        complete &= df[c].notna().to_numpy()
+    dropped = df.index[(case_mask | control_mask) & ~complete].tolist()
+
+    both = (case_mask | control_mask) & complete
+    scale = x[both].std(ddof=1).replace(0, 1).fillna(1).to_numpy()
+    z = x.to_numpy() / scale
+
+    blocks = (df[list(exact)].astype(str).agg("|".join, axis=1) if exact
+              else pd.Series("", index=df.index)).to_numpy()
+    rows = []
+    for b in pd.unique(blocks[both]):
+        t = np.flatnonzero(case_mask & complete & (blocks == b))
+        c = np.flatnonzero(control_mask & complete & (blocks == b))
+        if not len(t) or not len(c):
+            continue
+        for i, j, d in METHODS[method](z[t], z[c], ratio, caliper, replace):
+            rows.append((df.index[t[i]], df.index[c[j]], float(d)))
+    pairs = pd.DataFrame(rows, columns=["case", "control", "distance"])
+    matched = set(pairs["case"])
+    unmatched = [i for i in df.index[case_mask & complete] if i not in matched]
+    result = MatchResult(pairs, unmatched, dropped)
+    result.balance = balance_table(df, case_mask & complete, control_mask & complete, pairs, covariates)
+    return result
+
+# ── Cohorts ──────────────────────────────────────────────────────────────────
+
+def cohort_tables() -> dict:
+    """MRI and EEG demographics as id / diagnosis / site + covariates."""
+    mri = load_table("mri_demographic").dropna(subset=["id_mri"]).drop_duplicates("id_mri")
+    mri = mri.rename(columns={"id_mri": "id", "country": "site"})
+    eeg = pd.concat([load_table("eeg_demo_pd"), load_table("eeg_demo_hc")], ignore_index=True, sort=False)
+    eeg = eeg.dropna(subset=["id_eeg"]).astype({"country": object})
+    eeg = eeg.drop_duplicates(["country", "id_eeg"]).rename(columns={"id_eeg": "id", "country": "site"})
+    out = {}
+    for name, t in (("MRI", mri), ("EEG", eeg)):
+        t = t[["id", "diagnosis", "site"] + list(COVARIATES)]
+        out[name] = t.astype({"diagnosis": object, "site": object, "sex": float}).reset_index(drop=True)
+    return out
+
+
+def main():
+    print("=" * 90)
+    print(f"CONTROL MATCHING ({METHOD}, 1:{RATIO}, caliper {CALIPER} SD, "
+          f"{'with' if REPLACE else 'without'} replacement, exact on {', '.join(EXACT) or '-'})")
+    print("=" * 90)
+    for cohort, df in cohort_tables().items():
+        diagnoses = CASE_DIAGNOSES or sorted(set(df["diagnosis"].dropna()) - {CONTROL})
+        for dx in diagnoses:
+            cases, controls = df["diagnosis"] == dx, df["diagnosis"] == CONTROL
+            if not cases.any():
+                continue
+            t0 = time.perf_counter()
+            res = match(df, cases, controls)
+            ms = (time.perf_counter() - t0) * 1000
+            print(f"\n{cohort} {dx} vs {CONTROL}: {int(cases.sum())} cases, {int(controls.sum())} controls "
+                  f"-> {len(res.cases)} matched cases, {len(res.controls)} controls, "
+                  f"{len(res.unmatched)} unmatched, {len(res.dropped)} dropped (missing) [{ms:.0f} ms]")
+            print(res.balance.round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
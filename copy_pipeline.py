@@ -0,0 +1,177 @@
+"""
+Parallel, checksummed bulk copy pipeline
+========================================
+For when a physical copy is really needed (e.g. onto external scratch).
+
+Each subject folder is copied into a temporary "<dest>.partial" sibling
+and renamed into place only after every file is written (and fsynced), so a
+destination that exists is always complete: an interrupted run leaves only a
+.partial folder, which the next run discards.
+
+Files are streamed through one large reusable buffer while a SHA-256 is
+computed on the same bytes, so the checksum costs no extra read. With
+checksum=None the copy goes through the kernel instead (copy_file_range,
+then sendfile, then a large-buffer copyfileobj).
+"""
+
+import csv
+import hashlib
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+
+CHUNK_SIZE = 8 * 1024 * 1024
+PARTIAL_SUFFIX = ".partial"
+
+
+@dataclass
+class CopyResult:
+    src: Path
+    dest: Path
+    ok: bool = False
+    skipped: bool = False
+    bytes: int = 0
+    files: dict = field(default_factory=dict)   # relative path -> (size, sha256 or None)
+    error: str = ""
+    elapsed: float = 0.0
+
+# ── Single files ─────────────────────────────────────────────────────────────
+
+def copy_file_checksummed(src: Path, dst: Path, algo: str = "sha256",
+                          chunk_size: int = CHUNK_SIZE, fsync: bool = True):
+    """Copy `src` to `dst` hashing the bytes on the way; returns (size, hexdigest)."""
+    h = hashlib.new(algo)
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    size = 0
+    with open(src, "rb", buffering=0) as fin, open(dst, "wb", buffering=0) as fout:
+        while True:
+            n = fin.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+            written = 0
+            while written < n:
+                written += fout.write(view[written:n])
+            size += n
+        if fsync:
+            os.fsync(fout.fileno())
+    shutil.copystat(src, dst)
+    return size, h.hexdigest()
+
+
+def copy_file_fast(src: Path, dst: Path, chunk_size: int = CHUNK_SIZE, fsync: bool = True) -> int:
+    """Kernel-side copy (copy_file_range / sendfile) without checksumming; returns size."""
+    size = os.stat(src).st_size
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        fi, fo = fin.fileno(), fout.fileno()
+        done = 0
+        try:
+            if hasattr(os, "copy_file_range"):
+                while done < size:
+                    n = os.copy_file_range(fi, fo, min(chunk_size, size - done))
+                    if n == 0:
+                        break
+                    done += n
+            elif hasattr(os, "sendfile"):
+                while done < size:
+                    n = os.sendfile(fo, fi, done, min(chunk_size, size - done))
+                    if n == 0:
+                        break
+                    done += n
+        except OSError:
+            # e.g. EXDEV on older kernels or unsupported file systems: restart plainly
+            fin.seek(0)
+            fout.seek(0)
+            fout.truncate()
+            done = 0
+        if done < size:
+            fin.seek(done)
+            fout.seek(done)
+            shutil.copyfileobj(fin, fout, chunk_size)
+        if fsync:
+            os.fsync(fo)
+    shutil.copystat(src, dst)
+    return size
+
+# ── Folders ──────────────────────────────────────────────────────────────────
+
+def copy_tree_atomic(src_dir: Path, dest: Path, checksum: str = "sha256",
+                     fsync: bool = True) -> CopyResult:
+    """Copy a folder into place atomically; skips if `dest` already exists."""
+    src_dir, dest = Path(src_dir), Path(dest)
+    res = CopyResult(src_dir, dest)
+    t0 = time.perf_counter()
+    if dest.exists():
+        res.ok = res.skipped = True
+        return res
+
+    tmp = dest.with_name(dest.name + PARTIAL_SUFFIX)
+    try:
+        if tmp.exists():
+            shutil.rmtree(tmp)   # leftover of an interrupted run
+        for root, dirs, files in os.walk(src_dir):
+            rel_root = Path(root).relative_to(src_dir)
+            (tmp / rel_root).mkdir(parents=True, exist_ok=True)
+            for name in files:
+                src, dst = Path(root) / name, tmp / rel_root / name
+                if checksum:
+                    size, digest = copy_file_checksummed(src, dst, checksum, fsync=fsync)
+                else:
+                    size, digest = copy_file_fast(src, dst, fsync=fsync), None
+                res.files[(rel_root / name).as_posix()] = (size, digest)
+                res.bytes += size
+        tmp.mkdir(parents=True, exist_ok=True)   # empty source folder
+        os.replace(tmp, dest)
+        res.ok = True
+    except Exception as e:
+        res.error = str(e)
+        shutil.rmtree(tmp, ignore_errors=True)
+        # rolled back: nothing of this folder exists at `dest`
+        res.files.clear()
+        res.bytes = 0
+    res.elapsed = time.perf_counter() - t0
+    return res
+
+
+def run_copy_jobs(jobs, max_workers: int = 4, checksum: str = "sha256",
+                  fsync: bool = True, log=print):
+    """Copy (src_dir, dest) pairs on a thread pool; returns CopyResults in job order."""
+    jobs = [(Path(s), Path(d)) for s, d in jobs]
+    for _, dest in jobs:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+    results = [None] * len(jobs)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(copy_tree_atomic, s, d, checksum, fsync): i
+                   for i, (s, d) in enumerate(jobs)}
+        for fut in as_completed(futures):
+            res = fut.result()
+            results[futures[fut]] = res
+            if not res.ok:
+                log(f"  [FAIL] {res.src} -> {res.dest}: {res.error}")
+    return results
+
+
+def write_manifest(results, out_csv: Path):
+    """One row per copied file: destination, relative path, size, checksum.
+
+    Failed copies are left out. Rows from earlier runs are kept unless this
+    run copied the same destination.
+    """
+    out_csv = Path(out_csv)
+    results = [res for res in results if res.ok]
+    fresh = {str(res.dest) for res in results if res.files}
+    rows = []
+    if out_csv.exists():
+        with open(out_csv, newline="", encoding="utf-8") as f:
+            rows = [r for r in csv.DictReader(f) if r["dest"] not in fresh]
+    for res in results:
+        for rel, (size, digest) in sorted(res.files.items()):
+            rows.append({"dest": str(res.dest), "file": rel, "size": size, "checksum": digest or ""})
+    with open(out_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["dest", "file", "size", "checksum"])
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,378 @@
+"""
+Dataset inventory index
+=======================
+Walks a data root once with os.scandir and records every file (path, size,
+mtime, extension class, parsed group/site/subject/modality) and every
+directory in a small SQLite index stored next to the root. The verify/check
+scripts query that index instead of each doing its own rglob/os.walk, so a
+full verification sweep costs one directory walk per root.
+
+Layouts understood (relative to the root):
+  MRI_data/<SITE>/<sub-X>/<anat|dwi|func>/...
+  MRI_ANAT_CLASSIFIED/<PD|CN>/<SITE>_<sub-X>/anat/...
+  EEG_data/<3_PD|5_HC>/<AR|CL>/<sub-X>/eeg/...
+  EEG_CLASSIFIED/<PD|CN>/<AR|CL>/<sub-X>/...
+
+Incremental mode keeps each directory's mtime and entry count from the
+previous scan and re-lists only directories whose mtime moved (or whose
+subdirectory count, read from st_nlink where the file system keeps it, no
+longer matches), reusing the stored rows for everything else; on an
+unchanged tree that is one stat per directory. The full entry count
+(n_entries) would need a listing to compare, so files are guarded by the
+mtime check with its racy window only. Files rewritten in place (same name, parent mtime untouched) are
+only picked up by a full rebuild.
+
+Build (or update) the indexes for a sweep:
+    python dataset_inventory.py
+"""
+
+import os
+import sqlite3
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+SWEEP_ROOTS = [
+    Path(r"D:\Datasets\Synapse\Synapse_MRI_Parkinson\MRI_data"),
+    Path(r"D:\Datasets\Synapse\Synapse_MRI_Parkinson\MRI_ANAT_CLASSIFIED"),
+    Path(r"D:\Datasets\Synapse\Synapse_EEG_Parkinson\EEG_data"),
+    Path(r"D:\Datasets\Synapse\Synapse_EEG_Parkinson\EEG_CLASSIFIED"),
+]
+SWEEP_MODE = "incremental"   # "reuse" | "incremental" | "full"
+
+# A directory modified this close to the previous scan may have changed again
+# within the same mtime tick (2 s on FAT/exFAT), so it is always re-listed.
+RACY_WINDOW_S = 2.0
+
+MODALITIES = {"anat", "dwi", "func", "eeg", "fmap", "perf"}
+MRI_IMAGE_KINDS = ("nifti", "mri_gz")
+EEG_KINDS = ("eeg_set", "eeg_fdt", "eeg_raw")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta  (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, parent TEXT, name TEXT, size INTEGER, mtime_ns INTEGER,
+    ext TEXT, kind TEXT, grp TEXT, site TEXT, subject TEXT, subject_dir TEXT, modality TEXT
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY, parent TEXT, mtime_ns INTEGER, n_entries INTEGER, depth INTEGER,
+    grp TEXT, site TEXT, subject TEXT, subject_dir TEXT, modality TEXT
+);
+CREATE INDEX IF NOT EXISTS files_parent  ON files(parent);
+CREATE INDEX IF NOT EXISTS files_subject ON files(subject_dir, kind);
+"""
+
+# ── Classification ───────────────────────────────────────────────────────────
+
+def ext_key(filename: str) -> str:
+    name = filename.lower()
+    if name.endswith(".nii.gz"):
+        return ".nii.gz"
+    ext = os.path.splitext(name)[1]
+    return ext if ext else "[no extension]"
+
+
+def file_kind(filename: str) -> str:
+    """Coarse class of a data file, used by every verification report."""
+    name = filename.lower()
+    if name.endswith(".nii") or name.endswith(".nii.gz"):
+        return "nifti"
+    if name.endswith(".set"):
+        return "eeg_set"
+    if name.endswith(".fdt"):
+        return "eeg_fdt"
+    if name.endswith((".edf", ".bdf")):
+        return "eeg_raw"
+    if name.endswith((".json", ".json.gz", ".tsv", ".bval", ".bvec")):
+        return "sidecar"
+    # Legacy/misnamed compressed image (e.g., *_t1w.gz)
+    if name.endswith(".gz"):
+        if any(tag in name for tag in [".bval", ".bvec", ".tsv", "events", "physio"]):
+            return "sidecar"
+        return "mri_gz"
+    return "other"
+
+
+def parse_parts(parts) -> dict:
+    """Pull group/site/subject/modality out of the directory parts of a path."""
+    info = {"grp": "", "site": "", "subject": "", "subject_dir": "", "modality": ""}
+    for i, p in enumerate(parts):
+        low = p.lower()
+        if low.startswith("sub-"):
+            info["subject"] = p
+            info["site"] = parts[i - 1] if i >= 1 else ""
+            info["grp"] = parts[i - 2] if i >= 2 else ""
+        elif "_sub-" in low:
+            # classified layout: <SITE>_<sub-X>
+            info["site"], info["subject"] = p.split("_", 1)
+            info["grp"] = parts[i - 1] if i >= 1 else ""
+        else:
+            continue
+        info["subject_dir"] = "/".join(parts[: i + 1])
+        if i + 1 < len(parts) and parts[i + 1].lower() in MODALITIES:
+            info["modality"] = parts[i + 1].lower()
+        break
+    return info
+
+
+def index_path_for(root: Path) -> Path:
+    """Index lives beside the root so writing it never touches the scanned tree."""
+    root = Path(root)
+    return root.parent / f".{root.name}.inventory.sqlite"
+
+# ── Scanning ─────────────────────────────────────────────────────────────────
+
+def _scan_dir(root: Path, rel: str, file_rows: list, dir_rows: list, dir_stat=None):
+    """Scan one directory level; returns the relative paths of its subdirectories."""
+    parts = rel.split("/") if rel else []
+    info = parse_parts(parts)
+    subdirs = []
+    n_entries = 0
+    with os.scandir(root / rel if rel else root) as it:
+        for entry in it:
+            n_entries += 1
+            child = f"{rel}/{entry.name}" if rel else entry.name
+            if entry.is_dir():
+                subdirs.append(child)
+            elif entry.is_file():
+                st = entry.stat()
+                file_rows.append((
+                    child, rel, entry.name, st.st_size, st.st_mtime_ns,
+                    ext_key(entry.name), file_kind(entry.name),
+                    info["grp"], info["site"], info["subject"],
+                    info["subject_dir"], info["modality"],
+                ))
+    if dir_stat is None:
+        dir_stat = os.stat(root / rel if rel else root)
+    parent = "/".join(parts[:-1]) if parts else None
+    dir_rows.append((
+        rel, parent, dir_stat.st_mtime_ns, n_entries, len(parts),
+        info["grp"], info["site"], info["subject"], info["subject_dir"], info["modality"],
+    ))
+    return subdirs
+
+
+def _same_subdir_count(st, n_subdirs: int) -> bool:
+    """Entry-count check that costs no listing.
+
+    On POSIX file systems that count links (ext4, XFS, NTFS via WSL, ...) a
+    directory's st_nlink is 2 + its number of subdirectories, so a stat
+    already tells whether subdirectories were added or removed. File systems
+    reporting nlink < 2 (Btrfs, Windows) give no count and always pass.
+    """
+    return st.st_nlink < 2 or st.st_nlink - 2 == n_subdirs
+
+
+def scan_tree(root: Path):
+    """Walk `root` once; returns (file_rows, dir_rows)."""
+    root = Path(root)
+    file_rows, dir_rows = [], []
+    if not root.is_dir():
+        return file_rows, dir_rows
+    stack = [""]
+    while stack:
+        rel = stack.pop()
+        stack.extend(_scan_dir(root, rel, file_rows, dir_rows))
+    return file_rows, dir_rows
+
+# ── Index ────────────────────────────────────────────────────────────────────
+
+class Inventory:
+    """Query interface over the SQLite index of one data root."""
+
+    def __init__(self, root: Path, index_path: Path = None):
+        self.root = Path(root).resolve()
+        self.index_path = Path(index_path) if index_path else index_path_for(self.root)
+        self.con = sqlite3.connect(self.index_path)
+        self.con.row_factory = sqlite3.Row
+        self.con.executescript(SCHEMA)
+        self.last_update = None
+
+    def rebuild(self) -> float:
+        """Full rescan of the root; returns elapsed seconds."""
+        t0 = time.perf_counter()
+        started = time.time()
+        file_rows, dir_rows = scan_tree(self.root)
+        with self.con:
+            self.con.execute("DELETE FROM files")
+            self.con.execute("DELETE FROM dirs")
+            self.con.executemany("INSERT INTO files VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", file_rows)
+            self.con.executemany("INSERT INTO dirs VALUES (?,?,?,?,?,?,?,?,?,?)", dir_rows)
+            self.con.execute("INSERT OR REPLACE INTO meta VALUES ('root', ?)", (str(self.root),))
+            self.con.execute("INSERT OR REPLACE INTO meta VALUES ('scanned_at', ?)", (str(started),))
+        elapsed = time.perf_counter() - t0
+        self.last_update = {"full": True, "changed": [r[0] for r in dir_rows],
+                            "removed": [], "elapsed": elapsed}
+        return elapsed
+
+    def update(self) -> dict:
+        """Incremental rescan: only directories whose mtime (or subdir count) moved are re-listed.
+
+        Returns {"full", "changed", "removed", "elapsed"} where `changed` are
+        re-listed (or new) directories and `removed` are directories that no
+        longer exist.
+        """
+        if not self.is_built():
+            self.rebuild()
+            return self.last_update
+
+        t0 = time.perf_counter()
+        started = time.time()
+        scanned_at = float(self.query("SELECT value FROM meta WHERE key='scanned_at'")[0]["value"])
+        racy_ns = int((scanned_at - RACY_WINDOW_S) * 1e9)
+
+        stored = {}
+        children = defaultdict(list)
+        for r in self.query("SELECT path, parent, mtime_ns, n_entries FROM dirs"):
+            stored[r["path"]] = (r["mtime_ns"], r["n_entries"])
+            if r["parent"] is not None:
+                children[r["parent"]].append(r["path"])
+
+        file_rows, dir_rows = [], []
+        changed, seen = [], set()
+        stack = [""] if self.root.is_dir() else []
+        while stack:
+            rel = stack.pop()
+            try:
+                st = os.stat(self.root / rel if rel else self.root)
+            except FileNotFoundError:
+                continue
+            seen.add(rel)
+            old = stored.get(rel)
+            if (old is not None and old[0] == st.st_mtime_ns and st.st_mtime_ns < racy_ns
+                    and _same_subdir_count(st, len(children[rel]))):
+                # unchanged listing: keep its rows, but its subdirectories may
+                # still have moved, so check them too
+                stack.extend(children[rel])
+                continue
+            changed.append(rel)
+            stack.extend(_scan_dir(self.root, rel, file_rows, dir_rows, dir_stat=st))
+
+        removed = sorted(set(stored) - seen)
+        with self.con:
+            for rel in changed + removed:
+                self.con.execute("DELETE FROM files WHERE parent=?", (rel,))
+                self.con.execute("DELETE FROM dirs WHERE path=?", (rel,))
+            self.con.executemany("INSERT INTO files VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", file_rows)
+            self.con.executemany("INSERT INTO dirs VALUES (?,?,?,?,?,?,?,?,?,?)", dir_rows)
+            self.con.execute("INSERT OR REPLACE INTO meta VALUES ('scanned_at', ?)", (str(started),))
+
+        self.last_update = {"full": False, "changed": changed, "removed": removed,
+                            "elapsed": time.perf_counter() - t0}
+        return self.last_update
+
+    def changed_subjects(self) -> set:
+        """Subject dirs touched by the last rebuild/update (new, changed or removed)."""
+        if self.last_update is None:
+            return set()
+        out = set()
+        for rel in self.last_update["changed"] + self.last_update["removed"]:
+            subject_dir = parse_parts(rel.split("/") if rel else [])["subject_dir"]
+            if subject_dir:
+                out.add(subject_dir)
+        return out
+
+    def is_built(self) -> bool:
+        return self.con.execute("SELECT 1 FROM meta WHERE key='scanned_at'").fetchone() is not None
+
+    def query(self, sql: str, params=()):
+        return self.con.execute(sql, params).fetchall()
+
+    # -- common report queries ------------------------------------------------
+
+    def dir_exists(self, rel: str) -> bool:
+        return self.con.execute("SELECT 1 FROM dirs WHERE path=?", (rel,)).fetchone() is not None
+
+    def subject_dirs(self, grp: str = None):
+        """Subject directories (rows of `dirs`), optionally within one group folder."""
+        sql = "SELECT * FROM dirs WHERE subject != '' AND path = subject_dir"
+        params = ()
+        if grp is not None:
+            sql += " AND grp = ?"
+            params = (grp,)
+        return self.query(sql + " ORDER BY path", params)
+
+    def modality_dirs(self) -> set:
+        """{(subject_dir, modality)} for every existing modality folder."""
+        rows = self.query(
+            "SELECT subject_dir, modality FROM dirs "
+            "WHERE modality != '' AND path = subject_dir || '/' || modality"
+        )
+        return {(r["subject_dir"], r["modality"]) for r in rows}
+
+    def subjects_with(self, kinds, modality: str = None) -> set:
+        """Subject dirs holding at least one file of the given kinds (anywhere below)."""
+        kinds = tuple(kinds)
+        sql = (f"SELECT DISTINCT subject_dir FROM files WHERE subject_dir != '' "
+               f"AND kind IN ({','.join('?' * len(kinds))})")
+        params = kinds
+        if modality is not None:
+            sql += " AND modality = ?"
+            params += (modality,)
+        return {r["subject_dir"] for r in self.query(sql, params)}
+
+    def files(self, kinds=None, under: str = None):
+        sql = "SELECT * FROM files WHERE 1=1"
+        params = ()
+        if kinds is not None:
+            kinds = tuple(kinds)
+            sql += f" AND kind IN ({','.join('?' * len(kinds))})"
+            params += kinds
+        if under:
+            sql += " AND (path LIKE ? ESCAPE '\\')"
+            params += (under.replace("%", "\\%").replace("_", "\\_") + "/%",)
+        return self.query(sql + " ORDER BY path", params)
+
+    def ext_counts(self) -> Counter:
+        return Counter({r["ext"]: r["n"] for r in
+                        self.query("SELECT ext, COUNT(*) AS n FROM files GROUP BY ext")})
+
+    def frame(self):
+        """All file rows as a pandas DataFrame."""
+        import pandas as pd
+        return pd.read_sql_query("SELECT * FROM files", self.con)
+
+    def close(self):
+        self.con.close()
+
+
+def open_inventory(root: Path, mode: str = "incremental") -> Inventory:
+    """Open the index for `root`.
+
+    mode: "reuse" scans only if no index exists, "incremental" re-lists changed
+    directories, "full" rescans everything.
+    """
+    if mode not in ("reuse", "incremental", "full"):
+        raise ValueError(f"unknown inventory mode: {mode!r}")
+    inv = Inventory(root)
+    if mode == "full" or not inv.is_built():
+        inv.rebuild()
+    elif mode == "incremental":
+        inv.update()
+    return inv
+
+
+def main():
+    print("=" * 80)
+    print("DATASET INVENTORY SWEEP")
+    print("=" * 80)
+    for root in SWEEP_ROOTS:
+        if not root.exists():
+            print(f"  [SKIP] not found: {root}")
+            continue
+        inv = open_inventory(root, mode=SWEEP_MODE)
+        upd = inv.last_update or {"full": False, "changed": [], "elapsed": 0.0}
+        n_files = inv.query("SELECT COUNT(*) AS n FROM files")[0]["n"]
+        n_dirs = inv.query("SELECT COUNT(*) AS n FROM dirs")[0]["n"]
+        how = "full" if upd["full"] else f"{len(upd['changed'])} dirs re-listed"
+        print(f"  {root.name:<22} files={n_files:>6} dirs={n_dirs:>5} "
+              f"({how}, {upd['elapsed']:.2f}s) -> {inv.index_path}")
+        inv.close()
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Content-keyed cache for derived features
+========================================
+Keeps the results of per-subject computations (band powers, volume
+statistics, ...) on disk, keyed by
+
+    namespace + parameter fingerprint + content hashes of the input files
+
+so a rerun only recomputes subjects whose files changed or whose parameters
+(band edges, Welch window, ...) differ. Renaming or re-linking a subject
+folder does not invalidate anything because file names are not part of the key.
+
+Content hashes are memoized by (file identity, size, mtime), so unchanged
+recordings are not re-read. The identity is the resolved path, or the
+(device, inode) pair for files with several hard links, so symlink and
+hardlink views built by classified_view.py hash once together with the
+downloaded data. Reflinked and copied views are separate files and are
+hashed once on their own.
+
+Values are pickled one file per entry. An SQLite index tracks size and last
+access, and the least recently used entries are evicted once the cache grows
+past `max_bytes`. Each FeatureCache counts its hits, misses and evictions.
+
+Works on the subject folders written by classify_eeg_pd_cn.py
+(EEG_CLASSIFIED/<label>/<country>/<subject>) and classify_anat_pd_cn.py
+(MRI_ANAT_CLASSIFIED/<label>/<SITE>_<subject>); see subject_files().
+
+    python feature_cache.py      # show what the configured caches hold
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from dataset_inventory import file_kind
+from integrity_manifest import hash_file
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+CACHE_DIRS = [
+    Path(r"D:\Datasets\Synapse\Synapse_EEG_Parkinson\EEG_CLASSIFIED\.feature_cache"),
+    Path(r"D:\Datasets\Synapse\Synapse_MRI_Parkinson\MRI_ANAT_CLASSIFIED\.feature_cache"),
+]
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+HASH_WORKERS = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT
+);
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY, namespace TEXT, file TEXT, bytes INTEGER,
+    created REAL, last_access REAL
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_access);
+"""
+
+_MISSING = object()
+
+
+def fingerprint(params) -> str:
+    """Stable short hash of a JSON-able parameter set (dict order does not matter)."""
+    blob = json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(blob).hexdigest()[:16]
+
+
+def subject_files(subject_dir: Path, kinds) -> list:
+    """Data files of one classified subject folder whose file_kind() is in `kinds`."""
+    out = []
+    for root, dirs, files in os.walk(subject_dir, followlinks=True):
+        dirs.sort()
+        out.extend(Path(root) / f for f in sorted(files) if file_kind(f) in kinds)
+    return out
+
+
+def _file_id(path: Path, st) -> str:
+    """Memo key of a file: its path, or device + inode when it has hard links."""
+    if st.st_nlink > 1 and st.st_ino:
+        return f"inode:{st.st_dev}:{st.st_ino}"
+    return str(path)
+
+
+class FeatureCache:
+    """On-disk, size-bounded LRU cache keyed by input content and parameters."""
+
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_MAX_BYTES,
+                 hash_workers: int = HASH_WORKERS):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hash_workers = hash_workers
+        self.con = sqlite3.connect(self.root / "index.sqlite")
+        self.con.executescript(SCHEMA)
+        self.hits = self.misses = self.evictions = 0
+
+    # -- keys -----------------------------------------------------------------
+
+    def content_hashes(self, paths) -> list:
+        """Content digest per path (memoized by size + mtime, new ones hashed in parallel)."""
+        resolved = [Path(os.path.realpath(p)) for p in paths]
+        stats = [p.stat() for p in resolved]
+        ids = [_file_id(p, st) for p, st in zip(resolved, stats)]
+        digests, todo = [None] * len(resolved), []
+        for i, st in enumerate(stats):
+            row = self.con.execute("SELECT size, mtime_ns, digest FROM hashes WHERE path=?",
+                                   (ids[i],)).fetchone()
+            if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+                digests[i] = row[2]
+            else:
+                todo.append(i)
+        if todo:
+            with ThreadPoolExecutor(max_workers=self.hash_workers) as pool:
+                for i, digest in zip(todo, pool.map(lambda i: hash_file(resolved[i]), todo)):
+                    digests[i] = digest
+            self.con.executemany(
+                "INSERT OR REPLACE INTO hashes VALUES (?,?,?,?)",
+                [(ids[i], stats[i].st_size, stats[i].st_mtime_ns, digests[i]) for i in todo])
+            self.con.commit()
+        return digests
+
+    def key(self, namespace: str, inputs, params) -> str:
+        h = hashlib.sha256(f"{namespace}\0{fingerprint(params)}".encode("utf-8"))
+        for digest in sorted(self.content_hashes(inputs)):
+            h.update(digest.encode("ascii"))
+        return h.hexdigest()
+
+    # -- entries --------------------------------------------------------------
+
+    def _file(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.pkl"
+
+    def get(self, key: str, default=None):
+        path = self._file(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.con.execute("DELETE FROM entries WHERE key=?", (key,))
+            self.misses += 1
+            return default
+        self.con.execute("UPDATE entries SET last_access=? WHERE key=?", (time.time(), key))
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value, namespace: str = ""):
+        path = self._file(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        now = time.time()
+        self.con.execute("INSERT OR REPLACE INTO entries VALUES (?,?,?,?,?,?)",
+                         (key, namespace, str(path.relative_to(self.root)),
+                          path.stat().st_size, now, now))
+        self._evict()
+        self.con.commit()
+
+    def get_or_compute(self, namespace: str, inputs, params, fn, *args, **kwargs):
+        """Cached `fn(*args, **kwargs)` for these inputs and parameters."""
+        key = self.key(namespace, inputs, params)
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = fn(*args, **kwargs)
+            self.put(key, value, namespace)
+        return value
+
+    def _evict(self):
+        total = self.con.execute("SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, rel, size in self.con.execute(
+                "SELECT key, file, bytes FROM entries ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                (self.root / rel).unlink()
+            except FileNotFoundError:
+                pass
+            self.con.execute("DELETE FROM entries WHERE key=?", (key,))
+            total -= size
+            self.evictions += 1
+
+    # -- reporting ------------------------------------------------------------
+
+    def contents(self) -> dict:
+        """{namespace: (entries, bytes)}"""
+        return {ns: (n, b) for ns, n, b in self.con.execute(
+            "SELECT namespace, COUNT(*), SUM(bytes) FROM entries GROUP BY namespace ORDER BY namespace")}
+
+    def summary(self) -> str:
+        return f"cache hits={self.hits} misses={self.misses} evicted={self.evictions}"
+
+    def close(self):
+        self.con.commit()
+        self.con.close()
+
+
+def main():
+    print("=" * 90)
+    print("FEATURE CACHES")
+    print("=" * 90)
+    for cache_dir in CACHE_DIRS:
+        if not (cache_dir / "index.sqlite").exists():
+            print(f"[EMPTY] {cache_dir}")
+            continue
+        cache = FeatureCache(cache_dir)
+        contents = cache.contents()
+        total = sum(b for _, b in contents.values())
+        print(f"\n{cache_dir}  ({total / 1e6:.1f} MB of {cache.max_bytes / 1e6:.0f} MB)")
+        for ns, (n, b) in contents.items():
+            print(f"   {ns or '(none)':<24} {n:>6} entries  {b / 1e6:8.1f} MB")
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Content-hash manifest and integrity verifier
+============================================
+"Downloaded" used to mean that a subject folder held any .set/.fdt or
+.nii.gz, so a truncated 300 MB .fdt still passed. This script hashes every
+data file (MD5, the digest Synapse stores as contentMd5) on a thread pool
+with chunked reads. It compares each file against
+
+  1. the stored manifest from the previous run, and
+  2. the Synapse MD5 recorded by the download engine's journal, when present.
+
+Files whose size and mtime match the manifest are not re-hashed. File lists
+come from the shared inventory index (dataset_inventory.py), so no extra
+directory walk is needed; each listed file is still stat'ed, because the
+index keeps old sizes for files rewritten in place. Subjects whose files are
+all new (and not all covered by a Synapse MD5) have nothing to be checked
+against yet and are reported UNVERIFIED.
+
+Outputs per root (next to the root folder):
+  <root>_manifest.csv    path,size,mtime_ns,md5  (the accepted baseline)
+  <root>_integrity.csv   one row per subject
+"""
+
+import csv
+import hashlib
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from dataset_inventory import MRI_IMAGE_KINDS, EEG_KINDS, file_kind, open_inventory, parse_parts
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+ROOTS = [
+    Path(r"D:\Datasets\Synapse\Synapse_MRI_Parkinson\MRI_data"),
+    Path(r"D:\Datasets\Synapse\Synapse_EEG_Parkinson\EEG_data"),
+]
+# Journals written by synapse_download_engine (carry Synapse contentMd5 per file)
+SYNAPSE_JOURNALS = [
+    Path(r"D:\Datasets\Synapse\Synapse_MRI_Parkinson\data\.download_journal.jsonl"),
+]
+DATA_KINDS = MRI_IMAGE_KINDS + EEG_KINDS + ("sidecar",)
+HASH_WORKERS = 8
+CHUNK_SIZE = 4 * 1024 * 1024
+ACCEPT_CHANGES = False   # True = take current hashes of changed files as the new baseline
+
+SUBJECT_COLUMNS = ["group", "site", "subject", "n_files", "bytes", "n_ok", "n_new", "n_changed",
+                   "n_missing", "n_synapse_checked", "n_synapse_mismatch", "status"]
+
+# ── Hashing ──────────────────────────────────────────────────────────────────
+
+def hash_file(path: Path, algo: str = "md5", chunk_size: int = CHUNK_SIZE) -> str:
+    """Chunked digest of one file (hashlib releases the GIL, so threads scale)."""
+    h = hashlib.new(algo)
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+def manifest_path(root: Path) -> Path:
+    return Path(root).parent / f"{Path(root).name}_manifest.csv"
+
+
+def load_manifest(path: Path) -> dict:
+    """{relative path: {"size", "mtime_ns", "md5"}} from a manifest CSV."""
+    out = {}
+    if not Path(path).exists():
+        return out
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            out[row["path"]] = {"size": int(row["size"]), "mtime_ns": int(row["mtime_ns"]),
+                                "md5": row["md5"]}
+    return out
+
+
+def save_manifest(path: Path, entries: dict):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["path", "size", "mtime_ns", "md5"])
+        for rel in sorted(entries):
+            e = entries[rel]
+            writer.writerow([rel, e["size"], e["mtime_ns"], e["md5"]])
+
+
+def tail_key(rel: str) -> str:
+    """Path from the site folder down (e.g. 'AR/sub-AR00401/anat/x.nii.gz').
+
+    Lets journal paths (./data/AR/...) be matched with inventory paths
+    (MRI_data/AR/..., EEG_data/3_PD/AR/...).
+    """
+    parts = rel.replace("\\", "/").split("/")
+    for i, p in enumerate(parts):
+        if p.lower().startswith("sub-"):
+            return "/".join(parts[max(i - 1, 0):])
+    return "/".join(parts)
+
+
+def load_synapse_md5(journals) -> dict:
+    """{tail key: contentMd5} from download journals (last record per file wins)."""
+    out = {}
+    for journal in journals:
+        if not Path(journal).exists():
+            continue
+        with open(journal, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if rec.get("status") == "done" and rec.get("md5"):
+                    out[tail_key(rec["path"])] = rec["md5"]
+    return out
+
+# ── Verification ─────────────────────────────────────────────────────────────
+
+def verify_root(root: Path, synapse_md5: dict, workers: int = HASH_WORKERS):
+    """Hash/compare every data file under `root`; returns (file rows, subject rows, stats)."""
+    root = Path(root)
+    inv = open_inventory(root)
+    files = inv.files(kinds=DATA_KINDS)
+    inv.close()
+
+    mpath = manifest_path(root)
+    manifest = load_manifest(mpath)
+
+    # The index can hold stale sizes (a file rewritten in place does not move
+    # its parent's mtime), so the reuse check runs on a fresh stat of each file.
+    current, vanished = [], []
+    for row in files:
+        try:
+            st = os.stat(root / row["path"])
+        except FileNotFoundError:
+            vanished.append(row)
+            continue
+        current.append(dict(row, size=st.st_size, mtime_ns=st.st_mtime_ns))
+
+    to_hash, reused = [], {}
+    for row in current:
+        prev = manifest.get(row["path"])
+        if prev and prev["size"] == row["size"] and prev["mtime_ns"] == row["mtime_ns"]:
+            reused[row["path"]] = prev["md5"]
+        else:
+            to_hash.append(row)
+
+    def digest(row):
+        try:
+            return hash_file(root / row["path"])
+        except FileNotFoundError:
+            return None
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = dict(zip((r["path"] for r in to_hash), pool.map(digest, to_hash)))
+    hash_time = time.perf_counter() - t0
+
+    records = []
+    new_manifest = dict(manifest)
+    seen = set()
+    for row in current:
+        rel = row["path"]
+        md5 = reused.get(rel) or digests[rel]
+        if md5 is None:
+            # removed between the stat and the read
+            vanished.append(row)
+            continue
+        seen.add(rel)
+        prev = manifest.get(rel)
+        if prev is None:
+            status = "new"
+        elif prev["md5"] == md5:
+            status = "ok"
+        else:
+            status = "changed"
+
+        syn = synapse_md5.get(tail_key(rel))
+        if syn is not None and syn != md5:
+            status = "synapse_mismatch"
+
+        if status in ("new", "ok") or ACCEPT_CHANGES:
+            new_manifest[rel] = {"size": row["size"], "mtime_ns": row["mtime_ns"], "md5": md5}
+
+        records.append({
+            "path": rel, "grp": row["grp"], "site": row["site"], "subject": row["subject"],
+            "kind": row["kind"], "size": row["size"], "md5": md5,
+            "hashed": rel in digests, "synapse_checked": syn is not None, "status": status,
+        })
+
+    for row in vanished:
+        if row["path"] in manifest:
+            continue   # reported below with the other manifest files that are gone
+        records.append({
+            "path": row["path"], "grp": row["grp"], "site": row["site"], "subject": row["subject"],
+            "kind": row["kind"], "size": 0, "md5": "",
+            "hashed": False, "synapse_checked": False, "status": "missing",
+        })
+
+    for rel in sorted(set(manifest) - seen):
+        p = parse_parts(rel.split("/"))
+        records.append({
+            "path": rel, "grp": p["grp"], "site": p["site"], "subject": p["subject"],
+            "kind": file_kind(rel), "size": 0, "md5": "",
+            "hashed": False, "synapse_checked": False, "status": "missing",
+        })
+        if ACCEPT_CHANGES:
+            del new_manifest[rel]
+
+    save_manifest(mpath, new_manifest)
+
+    stats = {"files": len(seen), "hashed": len(to_hash), "reused": len(reused),
+             "bytes_hashed": sum(r["size"] for r in to_hash), "hash_time": hash_time}
+    return records, subject_table(records), stats
+
+
+def subject_table(records) -> list:
+    """Collapse per-file statuses into one integrity row per subject."""
+    per = defaultdict(lambda: defaultdict(int))
+    for r in records:
+        d = per[(r["grp"], r["site"], r["subject"])]
+        d["n_files"] += r["status"] != "missing"
+        d["bytes"] += r["size"]
+        d[f"n_{r['status']}"] += 1
+        d["n_synapse_checked"] += r["synapse_checked"]
+    rows = []
+    for (grp, site, subject), d in sorted(per.items()):
+        if d["n_synapse_mismatch"]:
+            status = "CORRUPT"
+        elif d["n_missing"]:
+            status = "MISSING_FILES"
+        elif d["n_changed"]:
+            status = "CHANGED"
+        elif d["n_new"] and not d["n_ok"] and not d["n_synapse_checked"]:
+            # nothing to compare against yet: baseline recorded, content unverified
+            status = "UNVERIFIED"
+        else:
+            status = "OK"
+        rows.append({
+            "group": grp, "site": site, "subject": subject,
+            "n_files": d["n_files"], "bytes": d["bytes"],
+            "n_ok": d["n_ok"], "n_new": d["n_new"], "n_changed": d["n_changed"],
+            "n_missing": d["n_missing"], "n_synapse_checked": d["n_synapse_checked"],
+            "n_synapse_mismatch": d["n_synapse_mismatch"], "status": status,
+        })
+    return rows
+
+
+def save_table(rows, out_csv: Path):
+    with open(out_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SUBJECT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    synapse_md5 = load_synapse_md5(SYNAPSE_JOURNALS)
+    print("=" * 90)
+    print("INTEGRITY VERIFICATION (content hashes)")
+    print(f"Synapse MD5s available: {len(synapse_md5)}")
+    print("=" * 90)
+
+    for root in ROOTS:
+        if not root.exists():
+            print(f"[SKIP] not found: {root}")
+            continue
+        _, subjects, stats = verify_root(root, synapse_md5)
+        out_csv = root.parent / f"{root.name}_integrity.csv"
+        save_table(subjects, out_csv)
+
+        mb = stats["bytes_hashed"] / 1e6
+        rate = mb / stats["hash_time"] if stats["hash_time"] else 0.0
+        print(f"\n{root.name}")
+        print("-" * len(root.name))
+        print(f"   Files: {stats['files']} | hashed: {stats['hashed']} ({mb:.0f} MB, {rate:.0f} MB/s) "
+              f"| unchanged (size+mtime): {stats['reused']}")
+        for status, n in Counter(r["status"] for r in subjects).most_common():
+            print(f"   {status:<14} {n:>4} subjects")
+        for r in subjects:
+            if r["status"] != "OK":
+                print(f"   [WARN] {r['group']}/{r['site']}/{r['subject']}: {r['status']}")
+        print(f"   Saved: {out_csv}")
+
+    print("\n" + "=" * 90)
+    print("INTEGRITY VERIFICATION COMPLETE")
+    print("=" * 90)
+
+
+if __name__ == "__main__":
+    main()
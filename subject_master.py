@@ -0,0 +1,254 @@
+"""
+Subject master index (MRI <-> EEG crosswalk)
+============================================
+One row per BrainLat subject across both ID spaces:
+
+    master_id   "MRI:sub-AR00401", or "EEG:AR/sub-40015" for EEG-only subjects
+    id_mri      MRI_ID (sub-AR00401)          mri_site  AR, CLB, COA, ...
+    id_eeg      id_EEG (sub-40015)            eeg_site  AR, CL (from the EEG path)
+    diagnosis   PD, CN, ... ("MISMATCH:a|b" if MRI and EEG tables disagree)
+    t1 rest dwi mf eeg   availability flags (NaN = unknown)
+
+Sources (through brainlat_tables.py): MRI demographics (id_mri + EEG_ID) and
+EEG records (id_eeg + site + flags, and id_MRI for the PD cohort). EEG ids are
+only unique per site, so EEG rows are keyed by (eeg_site, id_eeg), and an MRI
+site maps to its EEG site by its first two letters (CLB -> CL).
+When mri_modality_availability.csv (check_mri.py) is present, it fills the
+T1/rest/DWI flags that the records leave empty.
+
+The table is stored in SQLite (indexed on id_mri, (eeg_site, id_eeg) and
+diagnosis) and rebuilt only when a source CSV changes. SubjectMaster
+loads it into dicts and per-flag sets, so lookups and queries like
+"PD subjects with EEG + T1" are hash lookups and set intersections:
+
+    from subject_master import open_master
+    master = open_master()
+    master.select(diagnosis="PD", has=("eeg", "t1"))
+    master.by_eeg("AR", "sub-40001")["id_mri"]
+"""
+
+import json
+import math
+import sqlite3
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from brainlat_tables import REPO_ROOT, TABLES, load_table
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+MASTER_DB = REPO_ROOT / ".subject_master.sqlite"
+MRI_AVAILABILITY_CSV = REPO_ROOT / "Synapse_MRI_Parkinson" / "mri_modality_availability.csv"
+MASTER_VERSION = 1   # bump when the build rules below change
+
+SOURCE_TABLES = ("mri_demographic", "eeg_rec_pd", "eeg_rec_hc")
+FLAGS = ("t1", "rest", "dwi", "mf", "eeg")
+AVAILABILITY_FLAGS = {"t1": "has_anat_nifti", "rest": "has_func_nifti", "dwi": "has_dwi_nifti"}
+COLUMNS = ("master_id", "id_mri", "mri_site", "id_eeg", "eeg_site", "diagnosis") + FLAGS
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS subjects (
+    master_id TEXT PRIMARY KEY, id_mri TEXT, mri_site TEXT, id_eeg TEXT, eeg_site TEXT,
+    diagnosis TEXT, {", ".join(f"{f} REAL" for f in FLAGS)}
+);
+CREATE INDEX IF NOT EXISTS subjects_mri ON subjects(id_mri);
+CREATE INDEX IF NOT EXISTS subjects_eeg ON subjects(eeg_site, id_eeg);
+CREATE INDEX IF NOT EXISTS subjects_dx  ON subjects(diagnosis);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def eeg_site_of(mri_site: str) -> str:
+    """EEG site code of an MRI site (CLB -> CL, AR -> AR)."""
+    return mri_site[:2] if mri_site else ""
+
+
+def _clean(v):
+    if v is None or (isinstance(v, float) and math.isnan(v)) or v is pd.NA:
+        return None
+    return v
+
+
+def _merge_diagnosis(*labels) -> str:
+    seen = list(dict.fromkeys(l for l in labels if l))
+    if len(seen) > 1:
+        return "MISMATCH:" + "|".join(seen)
+    return seen[0] if seen else None
+
+# ── Build ────────────────────────────────────────────────────────────────────
+
+def build_rows(mri_availability: Path = MRI_AVAILABILITY_CSV) -> list:
+    """Crosswalk rows (dicts with COLUMNS) from the typed BrainLat tables."""
+    demo = load_table("mri_demographic")
+    rec = pd.concat([load_table("eeg_rec_pd"), load_table("eeg_rec_hc")],
+                    ignore_index=True, sort=False)
+    rec = rec[rec["id_eeg"].notna()].astype({"country": object, "diagnosis": object})
+    rec = rec.groupby(["country", "id_eeg"], as_index=False, sort=True).first()
+
+    rows, by_mri, by_eeg = [], {}, {}
+    for r in demo.astype({"country": object, "diagnosis": object}).itertuples(index=False):
+        if _clean(r.id_mri) is None or r.id_mri in by_mri:
+            continue
+        site = _clean(r.country) or ""
+        row = dict.fromkeys(COLUMNS)
+        row.update(master_id=f"MRI:{r.id_mri}", id_mri=r.id_mri, mri_site=site,
+                   diagnosis=_clean(r.diagnosis))
+        if _clean(r.id_eeg):
+            row.update(id_eeg=r.id_eeg, eeg_site=eeg_site_of(site))
+            by_eeg.setdefault((row["eeg_site"], r.id_eeg), row)
+        by_mri[r.id_mri] = row
+        rows.append(row)
+
+    for r in rec.to_dict("records"):
+        key = (r["country"], r["id_eeg"])
+        row = by_mri.get(_clean(r.get("id_mri"))) or by_eeg.get(key)
+        if row is None:
+            row = dict.fromkeys(COLUMNS)
+            row.update(master_id=f"EEG:{key[0]}/{key[1]}")
+            rows.append(row)
+        row.update(id_eeg=r["id_eeg"], eeg_site=r["country"])
+        by_eeg[key] = row
+        if _clean(r.get("id_mri")) and not row["id_mri"]:
+            row["id_mri"] = r["id_mri"]
+        row["diagnosis"] = _merge_diagnosis(row["diagnosis"], _clean(r["diagnosis"]))
+        for f in FLAGS:
+            if _clean(r.get(f)) is not None:
+                row[f] = float(r[f])
+
+    if mri_availability and Path(mri_availability).exists():
+        avail = pd.read_csv(mri_availability)
+        for a in avail.to_dict("records"):
+            row = by_mri.get(str(a.get("subject", "")).strip())
+            if row is None:
+                continue
+            for flag, col in AVAILABILITY_FLAGS.items():
+                if row[flag] is None and col in a and _clean(a[col]) is not None:
+                    row[flag] = float(str(a[col]).strip().lower() in ("true", "1", "1.0"))
+    return rows
+
+
+def source_signature(mri_availability: Path = MRI_AVAILABILITY_CSV) -> str:
+    """Size/mtime of every source CSV (plus the build version) as one string."""
+    paths = [REPO_ROOT / TABLES[t] for t in SOURCE_TABLES] + [Path(mri_availability)]
+    stamp = {"version": MASTER_VERSION}
+    for p in paths:
+        st = p.stat() if p.exists() else None
+        stamp[str(p)] = [st.st_size, st.st_mtime_ns] if st else None
+    return json.dumps(stamp, sort_keys=True)
+
+
+def write_master(db_path: Path, rows, signature: str):
+    con = sqlite3.connect(db_path)
+    try:
+        con.executescript(SCHEMA)
+        with con:
+            con.execute("DELETE FROM subjects")
+            con.executemany(f"INSERT INTO subjects VALUES ({','.join('?' * len(COLUMNS))})",
+                            [tuple(r[c] for c in COLUMNS) for r in rows])
+            con.execute("INSERT OR REPLACE INTO meta VALUES ('signature', ?)", (signature,))
+            con.execute("INSERT OR REPLACE INTO meta VALUES ('built_at', ?)", (str(time.time()),))
+    finally:
+        con.close()
+
+
+def _stored_signature(db_path: Path):
+    if not db_path.exists():
+        return None
+    con = sqlite3.connect(db_path)
+    try:
+        con.executescript(SCHEMA)
+        row = con.execute("SELECT value FROM meta WHERE key='signature'").fetchone()
+        return row[0] if row else None
+    finally:
+        con.close()
+
+# ── Index ────────────────────────────────────────────────────────────────────
+
+class SubjectMaster:
+    """In-memory hash indexes over the master table."""
+
+    def __init__(self, rows):
+        self.rows = {r["master_id"]: r for r in rows}
+        self._by_mri = {r["id_mri"]: r for r in rows if r["id_mri"]}
+        self._by_eeg = {(r["eeg_site"], r["id_eeg"]): r for r in rows if r["id_eeg"]}
+        self._by_dx = {}
+        self._with = {f: set() for f in FLAGS}
+        for mid, r in self.rows.items():
+            self._by_dx.setdefault(r["diagnosis"], set()).add(mid)
+            for f in FLAGS:
+                if r[f]:    # 1 (or mf=3); 0 and NaN mean no
+                    self._with[f].add(mid)
+
+    @classmethod
+    def load(cls, db_path: Path = MASTER_DB) -> "SubjectMaster":
+        con = sqlite3.connect(db_path)
+        con.row_factory = sqlite3.Row
+        try:
+            return cls([dict(r) for r in con.execute("SELECT * FROM subjects")])
+        finally:
+            con.close()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def by_mri(self, id_mri: str):
+        return self._by_mri.get(id_mri)
+
+    def by_eeg(self, eeg_site: str, id_eeg: str):
+        return self._by_eeg.get((eeg_site, id_eeg))
+
+    def ids(self, diagnosis: str = None, has=()) -> set:
+        """master_ids with the diagnosis (None = any) and every flag in `has`."""
+        out = set(self.rows) if diagnosis is None else set(self._by_dx.get(diagnosis, ()))
+        for f in has:
+            out &= self._with[f]
+        return out
+
+    def select(self, diagnosis: str = None, has=()) -> list:
+        return [self.rows[m] for m in sorted(self.ids(diagnosis, has))]
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame(list(self.rows.values()), columns=list(COLUMNS))
+
+
+def open_master(db_path: Path = MASTER_DB, rebuild: bool = False) -> SubjectMaster:
+    """Load the master index, rebuilding it first if any source CSV changed."""
+    signature = source_signature()
+    if rebuild or _stored_signature(db_path) != signature:
+        rows = build_rows()
+        write_master(db_path, rows, signature)
+        return SubjectMaster(rows)
+    return SubjectMaster.load(db_path)
+
+
+def main():
+    t0 = time.perf_counter()
+    master = open_master()
+    load_ms = (time.perf_counter() - t0) * 1000
+    df = master.frame()
+
+    print("=" * 90)
+    print(f"SUBJECT MASTER INDEX ({MASTER_DB.name}, {load_ms:.0f} ms)")
+    print("=" * 90)
+    print(f"Subjects           : {len(master)}")
+    print(f"  with MRI id      : {df['id_mri'].notna().sum()}")
+    print(f"  with EEG id      : {df['id_eeg'].notna().sum()}")
+    print(f"  with both        : {(df['id_mri'].notna() & df['id_eeg'].notna()).sum()}")
+    mismatch = df["diagnosis"].fillna("").str.startswith("MISMATCH:")
+    print(f"  label mismatches : {mismatch.sum()}")
+    print("-" * 90)
+    print(f"{'diagnosis':<10} {'total':>6} " + " ".join(f"{f:>6}" for f in FLAGS) + f" {'eeg+t1':>7}")
+    for dx in ("PD", "CN"):
+        counts = [len(master.ids(dx, (f,))) for f in FLAGS]
+        print(f"{dx:<10} {len(master.ids(dx)):>6} " + " ".join(f"{c:>6}" for c in counts)
+              + f" {len(master.ids(dx, ('eeg', 't1'))):>7}")
+    if mismatch.any():
+        print("\nMismatched labels:")
+        print(df.loc[mismatch, ["master_id", "id_eeg", "eeg_site", "diagnosis"]].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
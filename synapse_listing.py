@@ -0,0 +1,195 @@
+"""
+Cached Synapse folder listings
+==============================
+The verify scripts compare CSVs and local data against what Synapse
+actually holds. This module keeps that remote side as a JSON snapshot:
+
+    {"folders": {"AR": {"folder_id": "syn54002190", "etag": ..., "modifiedOn": ...,
+                        "fetched_at": ..., "children": [{"id", "name", "type"}, ...]}}}
+
+`refresh_listing()` fetches the folders concurrently. For each folder it
+first asks only for the folder entity (no download) and re-lists its children
+only when the etag / modifiedOn moved, the folder id changed, or the cached
+listing is older than MAX_AGE_S (a safety net in case adding a child does not
+change the parent's etag). Verification then reads the snapshot alone, so it runs
+offline against a recorded snapshot. The snapshots committed next to the
+verify scripts are such recordings.
+
+Works with `synapseclient.Synapse` or `LocalSynapseClient`. Running this file
+exercises the refresh logic offline:
+
+    python synapse_listing.py
+"""
+
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from synapse_download_engine import LocalSynapseClient, _entity_type
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+LIST_WORKERS = 8
+MAX_AGE_S = 7 * 24 * 3600   # re-list a folder at least this often
+
+
+def _attr(entity, key):
+    value = getattr(entity, key, None)
+    if value is None and hasattr(entity, "get"):
+        value = entity.get(key)
+    return value
+
+
+def connect(fake_root=None):
+    """Synapse client: the local fake tree if given, else a cached-credentials login."""
+    if fake_root:
+        return LocalSynapseClient(fake_root)
+    import synapseclient
+    syn = synapseclient.Synapse()
+    syn.login()   # ~/.synapseConfig or SYNAPSE_AUTH_TOKEN
+    return syn
+
+
+def folder_head(syn, folder_id: str) -> dict:
+    """{"etag", "modifiedOn"} of a folder without listing it."""
+    entity = syn.get(folder_id, downloadFile=False)
+    return {"etag": _attr(entity, "etag"), "modifiedOn": _attr(entity, "modifiedOn")}
+
+
+def list_folder(syn, folder_id: str) -> list:
+    """Direct children as [{"id", "name", "type"}] ("folder" | "file")."""
+    children = []
+    for child in syn.getChildren(folder_id, includeTypes=["folder", "file"]):
+        kind = _entity_type(child)
+        children.append({"id": child["id"], "name": str(child["name"]).strip(),
+                         "type": "folder" if kind == "folder" else "file"})
+    return sorted(children, key=lambda c: c["name"])
+
+# ── Snapshot ─────────────────────────────────────────────────────────────────
+
+class ListingSnapshot:
+    """Folder label -> cached listing, stored as one JSON file."""
+
+    def __init__(self, path: Path, folders: dict = None):
+        self.path = Path(path)
+        self.folders = folders or {}
+
+    @classmethod
+    def load(cls, path: Path) -> "ListingSnapshot":
+        path = Path(path)
+        if not path.exists():
+            return cls(path)
+        with open(path, encoding="utf-8") as f:
+            return cls(path, json.load(f).get("folders", {}))
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".partial")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"folders": self.folders}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def labels(self):
+        return list(self.folders)
+
+    def names(self, label: str, kind: str = "folder") -> list:
+        """Child names of one folder (subject folders by default)."""
+        entry = self.folders.get(label) or {}
+        return [c["name"] for c in entry.get("children", []) if kind is None or c["type"] == kind]
+
+    def fetched_at(self, label: str):
+        return (self.folders.get(label) or {}).get("fetched_at")
+
+
+def refresh_listing(syn, folder_ids: dict, snapshot_path: Path, workers: int = LIST_WORKERS,
+                    max_age_s: float = MAX_AGE_S, log=print):
+    """Re-list the folders that changed; returns (snapshot, {"listed", "unchanged", "failed"})."""
+    snap = ListingSnapshot.load(snapshot_path)
+    now = time.time()
+    stats = {"listed": [], "unchanged": [], "failed": []}
+
+    def work(label, folder_id):
+        cached = snap.folders.get(label) or {}
+        head = folder_head(syn, folder_id)
+        fresh = (cached.get("folder_id") == folder_id
+                 and head["etag"] is not None and cached.get("etag") == head["etag"]
+                 and cached.get("modifiedOn") == head["modifiedOn"]
+                 and now - (cached.get("fetched_at") or 0) < max_age_s)
+        if fresh:
+            return label, None
+        return label, {"folder_id": folder_id, **head, "fetched_at": now,
+                       "children": list_folder(syn, folder_id)}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(work, label, fid): label for label, fid in folder_ids.items()}
+        for fut in as_completed(futures):
+            label = futures[fut]
+            try:
+                _, entry = fut.result()
+            except Exception as e:
+                stats["failed"].append(label)
+                log(f"  [FAIL] listing {label}: {e} (keeping cached listing)")
+                continue
+            if entry is None:
+                stats["unchanged"].append(label)
+            else:
+                snap.folders[label] = entry
+                stats["listed"].append(label)
+                log(f"  Listed {label}: {len(entry['children'])} children")
+    if stats["listed"]:
+        snap.save()
+    return snap, stats
+
+
+def load_listing(snapshot_path: Path, folder_ids: dict = None, refresh: bool = False,
+                 fake_root=None, log=print) -> ListingSnapshot:
+    """Snapshot for the verify scripts; optionally refreshed from Synapse first."""
+    if refresh:
+        snap, stats = refresh_listing(connect(fake_root), folder_ids, snapshot_path, log=log)
+        log(f"Listing refresh: {len(stats['listed'])} re-listed, "
+            f"{len(stats['unchanged'])} unchanged, {len(stats['failed'])} failed")
+        return snap
+    snap = ListingSnapshot.load(snapshot_path)
+    if not snap.folders:
+        raise FileNotFoundError(f"No Synapse listing snapshot at {snapshot_path} "
+                                f"(run once with the listing refresh enabled)")
+    return snap
+
+# ── Offline self-check ───────────────────────────────────────────────────────
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        remote = tmp / "remote"
+        folder_ids = {}
+        for site, n in (("AR", 40), ("CL", 30), ("PE", 10)):
+            for i in range(n):
+                (remote / site / f"sub-{site}{i:05d}").mkdir(parents=True)
+            folder_ids[site] = site
+        snapshot_path = tmp / "listing.json"
+        client = LocalSynapseClient(remote, latency=0.02)
+        quiet = lambda *a: None
+
+        print("=" * 80)
+        print("SYNAPSE LISTING CACHE SELF-CHECK (local fake Synapse, 20 ms latency)")
+        print("=" * 80)
+        for step in ("cold", "warm", "one folder changed"):
+            if step == "one folder changed":
+                (remote / "CL" / "sub-CL99999").mkdir()
+                os.utime(remote / "CL", ns=(time.time_ns() + 10 ** 9,) * 2)
+            t0 = time.perf_counter()
+            snap, stats = refresh_listing(client, folder_ids, snapshot_path, log=quiet)
+            print(f"{step:<20}: listed {sorted(stats['listed'])}, unchanged "
+                  f"{sorted(stats['unchanged'])} ({time.perf_counter() - t0:.2f}s)")
+        counts = {label: len(snap.names(label)) for label in snap.labels()}
+        print(f"snapshot subjects   : {counts}")
+        offline = ListingSnapshot.load(snapshot_path)
+        print("Offline reload OK" if offline.names("CL") == snap.names("CL") else "Offline reload MISMATCH")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Download verification as set algebra
+====================================
+verify_download_mri.py compares three views of every Synapse folder:
+
+    CSV      subjects the demographics table expects there (per diagnosis)
+    website  subject folders in the Synapse listing (synapse_listing.py)
+    local    subject folders present in the data directory
+
+Here each view becomes an index: a subject -> diagnosis dict over the whole
+table (first row wins, as the old mask lookup did), one groupby for the CSV
+expectations of every folder, and one scandir per local folder. A folder's
+report is then a few set intersections and differences. The cost is linear
+in the number of subjects, whereas the old per-subject `in .values` checks
+and boolean masks were quadratic.
+
+`diagnoses=None` keeps every diagnosis instead of a PD/CN subset.
+
+Running this file benchmarks the engine against the previous list scans on a
+synthetic cohort and checks that the reports agree.
+"""
+
+import os
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# =========================
+# CONFIG (no arguments)
+# =========================
+BENCH_FOLDERS = 6
+BENCH_SUBJECTS = 6_000   # per-subject scans make the reference quadratic
+BENCH_SEED = 0
+
+
+@dataclass
+class FolderReport:
+    """CSV vs website vs local for one folder; every id collection is a set."""
+    folder: str
+    diagnoses: tuple
+    csv: dict = field(default_factory=dict)         # dx -> ids of CSV rows (list, rows may repeat)
+    website: set = field(default_factory=set)
+    available: dict = field(default_factory=dict)   # dx -> website subjects with that diagnosis
+    skipped: set = field(default_factory=set)       # website subjects with another diagnosis
+    missing_from_csv: set = field(default_factory=set)
+    downloaded: dict = field(default_factory=dict)  # dx -> available subjects present locally
+    not_downloaded: set = field(default_factory=set)
+
+    @property
+    def csv_total(self) -> int:
+        return sum(len(v) for v in self.csv.values())
+
+    @property
+    def available_total(self) -> int:
+        return sum(len(v) for v in self.available.values())
+
+    @property
+    def downloaded_total(self) -> int:
+        return sum(len(v) for v in self.downloaded.values())
+
+    def counts(self) -> dict:
+        out = {"csv_total": self.csv_total, "synapse_total": len(self.website),
+               "synapse_available": self.available_total, "synapse_skipped": len(self.skipped),
+               "synapse_missing": len(self.missing_from_csv),
+               "downloaded_total": self.downloaded_total, "not_downloaded": len(self.not_downloaded)}
+        for dx in self.diagnoses:
+            out[f"csv_{dx}"] = len(self.csv.get(dx, ()))
+            out[f"synapse_{dx}"] = len(self.available[dx])
+            out[f"downloaded_{dx}"] = len(self.downloaded[dx])
+        return out
+
+# ── Indexes ──────────────────────────────────────────────────────────────────
+
+def diagnosis_index(df: pd.DataFrame, id_col: str, dx_col: str = "diagnosis") -> dict:
+    """Subject id -> diagnosis of its first row."""
+    sub = df[[id_col, dx_col]].dropna(subset=[id_col]).astype(object)
+    sub = sub[~sub[id_col].duplicated()]
+    return dict(zip(sub[id_col], sub[dx_col]))
+
+
+def csv_expected(df: pd.DataFrame, folder_col: str, id_col: str, dx_col: str = "diagnosis",
+                 diagnoses=None) -> dict:
+    """{folder: {dx: [ids of the CSV rows]}} for every folder in one groupby."""
+    sub = df[[folder_col, id_col, dx_col]].dropna().astype(object)
+    if diagnoses is not None:
+        sub = sub[sub[dx_col].isin(diagnoses)]
+    out = {}
+    for (folder, dx), ids in sub.groupby([folder_col, dx_col], sort=False)[id_col]:
+        out.setdefault(folder, {})[dx] = ids.tolist()
+    return out
+
+
+def local_subjects(folder) -> set:
+    """Names of the subject directories directly under `folder` (empty if absent)."""
+    try:
+        with os.scandir(folder) as it:
+            return {e.name for e in it if e.is_dir()}
+    except (FileNotFoundError, NotADirectoryError):
+        return set()
+
+
+def resolve_diagnoses(dx_of: dict, diagnoses=None) -> tuple:
+    if diagnoses is not None:
+        return tuple(diagnoses)
+    return tuple(sorted({d for d in dx_of.values() if isinstance(d, str)}))
+
+# ── Comparison ───────────────────────────────────────────────────────────────
+
+def compare_folder(folder: str, website, csv_by_dx: dict, dx_of: dict, local: set,
+                   diagnoses: tuple) -> FolderReport:
+    """One folder's report from the indexes above."""
+    website = {str(s).strip() for s in website if str(s).strip()}
+    known = website & dx_of.keys()
+    report = FolderReport(folder, diagnoses,
+                          csv={dx: csv_by_dx.get(dx, []) for dx in diagnoses},
+                          website=website, missing_from_csv=website - known)
+    by_dx = {}
+    for s in known:
+        by_dx.setdefault(dx_of[s], set()).add(s)
+    report.available = {dx: by_dx.pop(dx, set()) for dx in diagnoses}
+    report.skipped = set().union(*by_dx.values()) if by_dx else set()
+    report.downloaded = {dx: ids & local for dx, ids in report.available.items()}
+    report.not_downloaded = set().union(*report.available.values()) - local
+    return report
+
+
+def verify_folders(website: dict, df: pd.DataFrame, local_root, folder_col: str, id_col: str,
+                   dx_col: str = "diagnosis", diagnoses=None) -> dict:
+    """{folder: FolderReport} for every folder of the website listing."""
+    dx_of = diagnosis_index(df, id_col, dx_col)
+    diagnoses = resolve_diagnoses(dx_of, diagnoses)
+    expected = csv_expected(df, folder_col, id_col, dx_col, diagnoses)
+    return {folder: compare_folder(folder, subjects, expected.get(folder, {}), dx_of,
+                                   local_subjects(os.path.join(local_root, folder)), diagnoses)
+            for folder, subjects in website.items()}
+
+
+def totals(reports: dict) -> dict:
+    """Column sums of FolderReport.counts() over all folders."""
+    out = {}
+    for report in reports.values():
+        for k, v in report.counts().items():
+            out[k] = out.get(k, 0) + v
+    return out
+
+# ── List-scan reference (previous implementation, kept for the benchmark) ────
+
+def _listscan_folder(folder, subjects, df, id_col, folder_col, local_root, diagnoses):
+    csv = df[(df[folder_col] == folder) & (df["diagnosis"].isin(list(diagnoses)))]
+    available, skipped, missing = [], [], []
+    for subj in sorted(subjects):
+        if subj in df[id_col].values:
+            dx = df[df[id_col] == subj]["diagnosis"].values[0]
+            (available if dx in diagnoses else skipped).append((subj, dx))
+        else:
+            missing.append(subj)
+    downloaded, not_downloaded = [], []
+    for subj, dx in available:
+        p = os.path.join(local_root, folder, subj)
+        (downloaded if os.path.isdir(p) else not_downloaded).append((subj, dx))
+    return {"csv_total": len(csv), "synapse_available": len(available),
+            "synapse_skipped": len(skipped), "synapse_missing": len(missing),
+            "downloaded_total": len(downloaded), "not_downloaded": len(not_downloaded)}
+
+
+def synthetic_cohort(n: int = BENCH_SUBJECTS, folders: int = BENCH_FOLDERS, seed: int = BENCH_SEED):
+    """(demographics, website listing) with missing, extra and duplicate subjects."""
+    rng = np.random.default_rng(seed)
+    sites = [f"S{i}" for i in range(folders)]
+    site = rng.choice(sites, n)
+    ids = np.array([f"sub-{s}{i:06d}" for i, s in enumerate(site)], dtype=object)
+    df = pd.DataFrame({"id_mri": ids, "country": site,
+                       "diagnosis": rng.choice(["PD", "CN", "AD", "FTD", "MS"], n)})
+    df = pd.concat([df, df.sample(frac=0.01, random_state=seed)], ignore_index=True)
+    on_site = rng.random(n) < 0.9
+    website = {s: [i for i, keep, t in zip(ids, on_site, site) if keep and t == s] for s in sites}
+    for s in sites:
+        website[s] += [f"sub-{s}X{j:04d}" for j in range(5)]   # not in the CSV
+    return df, website
+
+
+def main():
+    import tempfile
+    df, website = synthetic_cohort()
+    with tempfile.TemporaryDirectory() as root:
+        rng = np.random.default_rng(BENCH_SEED)
+        for folder, subjects in website.items():
+            for s in subjects:
+                if rng.random() < 0.7:
+                    os.makedirs(os.path.join(root, folder, s))
+
+        print("=" * 90)
+        print(f"VERIFICATION ENGINE BENCHMARK ({len(df):,} CSV rows, "
+              f"{sum(map(len, website.values())):,} website subjects, {len(website)} folders)")
+        print("=" * 90)
+        t0 = time.perf_counter()
+        reports = verify_folders(website, df, root, "country", "id_mri", diagnoses=("PD", "CN"))
+        fast_s = time.perf_counter() - t0
+        print(f"Set algebra : {fast_s:8.3f}s")
+
+        t0 = time.perf_counter()
+        slow = {f: _listscan_folder(f, s, df, "id_mri", "country", root, ("PD", "CN"))
+                for f, s in website.items()}
+        slow_s = time.perf_counter() - t0
+        print(f"List scans  : {slow_s:8.3f}s")
+
+        same = all(all(reports[f].counts()[k] == v for k, v in slow[f].items()) for f in slow)
+        print("-" * 90)
+        print(f"Speedup     : {slow_s / fast_s:8.1f}x")
+        print(f"Identical   : {same}")
+        print(f"Totals      : {totals(reports)}")
+
+
+if __name__ == "__main__":
+    main()
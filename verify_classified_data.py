@@ -1,68 +1,41 @@
 from pathlib import Path
 import pandas as pd
 
+from dataset_inventory import EEG_KINDS, MRI_IMAGE_KINDS, file_kind, open_inventory
+
 # =========================
 # CONFIG (no arguments)
 # =========================
 MRI_ROOT = Path(r"D:\Datasets\Synapse\MRI_ANAT_CLASSIFIED").resolve()
 EEG_ROOT = Path(r"D:\Datasets\Synapse\EEG_CLASSIFIED").resolve()
 
-EEG_EXT = (".set", ".fdt", ".edf", ".bdf")
+INVENTORY_MODE = "incremental"   # how to refresh each root's index: "reuse" | "incremental" | "full"
 
 # -------------------------
 # MRI detection (robust)
 # -------------------------
 def is_mri_image_file(p: Path) -> bool:
-    name = p.name.lower()
-
-    # Standard NIfTI
-    if name.endswith(".nii") or name.endswith(".nii.gz"):
-        return True
-
-    # Legacy/misnamed compressed image (e.g., *_t1w.gz)
-    if name.endswith(".gz"):
-        if name.endswith(".json.gz"):
-            return False
-        if any(tag in name for tag in [".bval", ".bvec", ".tsv", "events", "physio"]):
-            return False
-        return True
-
-    return False
+    # .nii / .nii.gz plus legacy/misnamed compressed images (e.g., *_t1w.gz)
+    return file_kind(p.name) in MRI_IMAGE_KINDS
 
-def has_mri_file(anat_dir: Path) -> bool:
-    for p in anat_dir.rglob("*"):
-        if p.is_file() and is_mri_image_file(p):
-            return True
-    return False
+def verify_mri(inv):
+    anat_dirs = {subj for subj, mod in inv.modality_dirs() if mod == "anat"}
+    with_image = inv.subjects_with(MRI_IMAGE_KINDS, modality="anat")
 
-# -------------------------
-# Generic extension check (EEG)
-# -------------------------
-def has_file_with_ext(root: Path, exts) -> bool:
-    for p in root.rglob("*"):
-        if p.is_file() and p.name.lower().endswith(exts):
-            return True
-    return False
-
-def verify_mri():
     rows = []
     for label in ["PD", "CN"]:
-        label_dir = MRI_ROOT / label
-        if not label_dir.exists():
-            continue
-
-        for subj_dir in label_dir.iterdir():
-            if not subj_dir.is_dir():
+        for d in inv.subject_dirs(grp=label):
+            if d["depth"] != 2:   # <label>/<SITE>_<subject>
                 continue
-
-            anat_dir = subj_dir / "anat"
-            ok = anat_dir.exists() and has_mri_file(anat_dir)
+            has_anat = d["path"] in anat_dirs
+            has_image = d["path"] in with_image
+            ok = has_anat and has_image
 
             rows.append({
                 "label": label,
-                "subject": subj_dir.name,
-                "has_anat_dir": anat_dir.exists(),
-                "has_mri_image": has_mri_file(anat_dir) if anat_dir.exists() else False,
+                "subject": d["path"].split("/")[-1],
+                "has_anat_dir": has_anat,
+                "has_mri_image": has_image,
                 "status": "OK" if ok else "MISSING"
             })
 
@@ -87,30 +60,24 @@ def verify_mri():
     print(f"Missing/invalid: {missing}")
     print("Saved: verify_mri_anat.csv")
 
-def verify_eeg():
+def verify_eeg(inv):
+    with_eeg = inv.subjects_with(EEG_KINDS)
+
     rows = []
     for label in ["PD", "CN"]:
-        label_dir = EEG_ROOT / label
-        if not label_dir.exists():
-            continue
-
-        for site_dir in label_dir.iterdir():  # AR / CL
-            if not site_dir.is_dir():
+        for d in inv.subject_dirs(grp=label):   # <label>/<AR|CL>/<subject>
+            if d["depth"] != 3:
                 continue
 
-            for subj_dir in site_dir.iterdir():
-                if not subj_dir.is_dir():
-                    continue
-
-                ok = has_file_with_ext(subj_dir, EEG_EXT)
+            ok = d["path"] in with_eeg
 
-                rows.append({
-                    "label": label,
-                    "condition": site_dir.name,   # AR / CL
-                    "subject": subj_dir.name,
-                    "has_eeg_file": ok,
-                    "status": "OK" if ok else "MISSING"
-                })
+            rows.append({
+                "label": label,
+                "condition": d["site"],   # AR / CL
+                "subject": d["subject"],
+                "has_eeg_file": ok,
+                "status": "OK" if ok else "MISSING"
+            })
 
     df = pd.DataFrame(rows)
     df.to_csv("verify_eeg.csv", index=False)
@@ -148,8 +115,14 @@ def main():
         print("ERROR: EEG_CLASSIFIED not found:", EEG_ROOT)
         return
 
-    verify_mri()
-    verify_eeg()
+    # At most one directory walk per root (only changed dirs when incremental); every
+    # check below is a query against the inventory.
+    mri_inv = open_inventory(MRI_ROOT, mode=INVENTORY_MODE)
+    eeg_inv = open_inventory(EEG_ROOT, mode=INVENTORY_MODE)
+    verify_mri(mri_inv)
+    verify_eeg(eeg_inv)
+    mri_inv.close()
+    eeg_inv.close()
 
     print("=" * 80)
     print("VERIFICATION COMPLETE")